@@ -1,81 +1,37 @@
 ###### Packages Used ######
 import streamlit as st # core package used in this project
-import pandas as pd
-import base64, random
+import random
 import time,datetime
-import sqlite3
 import os
-import socket
-import platform
-import geocoder
-import glob
 import secrets
 import io,random
-import plotly.express as px # to create visualisations at the admin session
-import plotly.graph_objects as go
-from geopy.geocoders import Nominatim
-# libraries used to parse the pdf files
-from pdfminer3.layout import LAParams, LTTextBox
-from pdfminer3.pdfpage import PDFPage
-from pdfminer3.pdfinterp import PDFResourceManager
-from pdfminer3.pdfinterp import PDFPageInterpreter
-from pdfminer3.converter import TextConverter
+from extraction_store import get_extraction_store, write_sidecar
+from pdf_viewer import show_pdf
+from candidate_profiles import get_profile_store
+from stage_metrics import StageRecorder, stage_summary
+from db import init_db, get_writer
+from session_metadata import SessionMetadataCollector
+from feedback_analytics import rating_summary, comments_page, COMMENTS_PAGE_SIZE
+from scoring_engine import Leaderboard, DEFAULT_MAX_WORKERS, DEFAULT_TIMEOUT, DEFAULT_MAX_RETRIES
+from session_budget import (CompactRanking, compact_ranking, page_in, enforce_budget, budget_bytes,
+                            session_stats, RESULTS_PAGE_SIZE)
 from PIL import Image
-# pre stored data for prediction purposes
+# Heavy modules (pandas, plotly, the pdfminer3 stack, google.generativeai and the
+# NumPy-backed keyword index) are imported inside the pages that use them, so a cold
+# start or a visit to the About page doesn't pay for all of them.
+# NLTK stopwords are read from the bundled App/nltk_data corpus (see lexical_index.py).
 
-import nltk
-nltk.download('stopwords')
-# Add this line
-from gemini_helper import get_job_match_analysis, get_recruiter_match_score, generate_tailored_bullets
 ###### Preprocessing functions ######
 
 
-# Generates a link allowing the data in a given panda dataframe to be downloaded in csv format 
-def get_csv_download_link(df,filename,text):
-    csv = df.to_csv(index=False)
-    ## bytes conversions
-    b64 = base64.b64encode(csv.encode()).decode()      
-    href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">{text}</a>'
-    return href
-
-
-# Reads Pdf file and check_extractable
-def pdf_reader(file):
-    resource_manager = PDFResourceManager()
-    fake_file_handle = io.StringIO()
-    converter = TextConverter(resource_manager, fake_file_handle, laparams=LAParams())
-    page_interpreter = PDFPageInterpreter(resource_manager, converter)
-    with open(file, 'rb') as fh:
-        for page in PDFPage.get_pages(fh,
-                                      caching=True,
-                                      check_extractable=True):
-            page_interpreter.process_page(page)
-            print(page)
-        text = fake_file_handle.getvalue()
-
-    ## close open handles
-    converter.close()
-    fake_file_handle.close()
-    return text
-
-
-# show uploaded file path to view pdf_display
-def show_pdf(file_path):
-    with open(file_path, "rb") as f:
-        base64_pdf = base64.b64encode(f.read()).decode('utf-8')
-    pdf_display = F'<iframe src="data:application/pdf;base64,{base64_pdf}" width="700" height="1000" type="application/pdf"></iframe>'
-    st.markdown(pdf_display, unsafe_allow_html=True)
-
-
 # course recommendations which has data already loaded from Courses.py
 
 
 ###### Database Stuffs ######
 
 
-# sql connector
-connection = sqlite3.connect('cv.db')
-cursor = connection.cursor()
+# per-thread connections, WAL mode and schema migrations live in db.py
+init_db()
 
 # inserting feedback data into user_feedback table
 def insertf_data(feed_name,feed_email,feed_score,comments,Timestamp):
@@ -83,8 +39,8 @@ def insertf_data(feed_name,feed_email,feed_score,comments,Timestamp):
     insertfeed_sql = "insert into " + DBf_table_name + """
     values (NULL,?,?,?,?,?)"""
     rec_values = (feed_name, feed_email, feed_score, comments, Timestamp)
-    cursor.execute(insertfeed_sql, rec_values)
-    connection.commit()
+    # queued and group-committed with other sessions' writes; returns once it is stored
+    get_writer().submit(insertfeed_sql, rec_values)
 
 
 ###### Setting Page Configuration (favicon, Logo, Title) ######
@@ -104,6 +60,8 @@ def run():
     if 'ranked_candidates' not in st.session_state:
         st.session_state.ranked_candidates = None
     # ===============================
+    # Drops paged-in details this session no longer needs once it is over its memory budget
+    session_bytes = enforce_budget(st.session_state)
 
     # (Logo, Heading, Sidebar etc)
     # ... rest of the run function
@@ -115,51 +73,27 @@ def run():
     choice = st.sidebar.selectbox("Choose among the given options:", activities)
 
 
-    # Create table user_data and user_feedback
-    DBf_table_name = 'user_feedback'
-    tablef_sql = "CREATE TABLE IF NOT EXISTS " + DBf_table_name + """
-                (ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    feed_name varchar(50) NOT NULL,
-                    feed_email VARCHAR(50) NOT NULL,
-                    feed_score VARCHAR(5) NOT NULL,
-                    comments VARCHAR(100) NULL,
-                    Timestamp VARCHAR(50) NOT NULL
-                );
-            """
-    cursor.execute(tablef_sql)
-
-
     ###### CODE FOR CLIENT SIDE (USER) ######
 
     if choice == 'User':
+        from corpus_store import get_corpus_store
+        from embedding_index import get_embedding_index
+        from gemini_helper import get_job_match_analysis
+        from lexical_index import get_lexical_index
+        from llm_backends import backend_problems
+        from rate_limiter import request_priority, INTERACTIVE
+        for problem in backend_problems():
+            st.error(problem)
         
         # Collecting Miscellaneous Information
         act_name = st.text_input('Name*')
         act_mail = st.text_input('Mail*')
         act_mob  = st.text_input('Mobile Number*')
         sec_token = secrets.token_urlsafe(12)
-        host_name = socket.gethostname()
-        ip_add = socket.gethostbyname(host_name)
-        dev_user = os.getlogin()
-        os_name_ver = platform.system() + " " + platform.release()
-        city = 'Not Found'
-        state = 'Not Found'
-        country = 'Not Found'
-        latlong = None
-        try:
-            g = geocoder.ip('me')
-            latlong = g.latlng
-            geolocator = Nominatim(user_agent="http")
-            if latlong:
-                location = geolocator.reverse(latlong, language='en')
-                if location and 'address' in location.raw:
-                    address = location.raw['address']
-                    city = address.get('city', '')
-                    state = address.get('state', '')
-                    country = address.get('country', '')
-        except Exception as e:
-            # If there's any error during geocoding, just pass silently
-            pass
+        # Device and location details are looked up once per session in the background,
+        # so a slow or failing lookup never holds up the uploader
+        if 'session_metadata' not in st.session_state:
+            st.session_state.session_metadata = SessionMetadataCollector().start()
 
         # Upload Resume
         st.markdown('''<h5 style='text-align: left; color: white;'> Upload Your Resume, And Get Smart Recommendations</h5>''',unsafe_allow_html=True)
@@ -174,18 +108,54 @@ def run():
                 st.session_state.resume_data = None  # Clear previous data
         
         if pdf_file is not None:
-            # 1. --- Original Code (Saving and Reading) ---
+            # 1. --- Saving and Reading (parsed once per unique file content) ---
             pdf_name = pdf_file.name
             save_image_path = os.path.join('./Uploaded_Resumes/', pdf_name)
-            
-            with open(save_image_path, "wb") as f:
-                f.write(pdf_file.getbuffer())
+            file_bytes = pdf_file.getvalue()
+            upload_key = (pdf_name, pdf_file.size, pdf_file.file_id)
+
+            if st.session_state.get('resume_upload_key') != upload_key:
+                upload_progress = st.progress(0, text="Reading your resume...")
+                upload_stages = {
+                    "pdf_extraction": (10, "Extracting Resume Data..."),
+                    "txt_persistence": (70, "Saving Resume Text..."),
+                    "profile_extraction": (90, "Profiling Your Experience..."),
+                }
+                recorder = StageRecorder("resume_upload",
+                                         on_stage=lambda name: upload_progress.progress(*upload_stages[name]))
+                # Extraction is keyed by the content hash, so a re-upload is never re-parsed
+                with recorder.stage("pdf_extraction"):
+                    resume_record = get_extraction_store().extract(file_bytes, pdf_name)
+                try:
+                    with recorder.stage("txt_persistence"):
+                        with open(save_image_path, "wb") as f:
+                            f.write(file_bytes)
+                        txt_save_path = write_sidecar(resume_record, './Uploaded_Resumes/')
+                        # Keep the recruiter's indexes and corpus in step with the new .txt, so
+                        # ranking doesn't have to rescan the folder for it
+                        get_lexical_index().add_document(resume_record['txt_name'], resume_record['text'],
+                                                         mtime=os.path.getmtime(txt_save_path))
+                        get_embedding_index().add_document(resume_record['txt_name'], resume_record['text'],
+                                                           mtime=os.path.getmtime(txt_save_path))
+                        get_corpus_store().put(resume_record['txt_name'], resume_record['text'],
+                                               mtime=os.path.getmtime(txt_save_path))
+                    with recorder.stage("profile_extraction"):
+                        # Structured skills/experience for the recruiter's hard-requirement filters
+                        get_profile_store().put(resume_record['txt_name'], resume_record['content_hash'],
+                                                resume_record['text'])
+                except Exception as e:
+                    st.warning(f"Could not save .txt resume file: {e}")
+                recorder.save()
+                upload_progress.empty()
+                st.session_state.resume_upload_key = upload_key
+                # Only the hash stays in the session; the text is paged in from the store when needed
+                st.session_state.resume_content_hash = resume_record['content_hash']
             
             # Show the PDF
-            show_pdf(save_image_path)
+            if pdf_name.lower().endswith('.pdf'):
+                show_pdf(save_image_path)
 
-            # Get the whole resume text
-            resume_text = pdf_reader(save_image_path)
+            resume_content_hash = st.session_state.resume_content_hash
                     
             
             
@@ -198,28 +168,22 @@ def run():
                 else:
                     with st.spinner('Our AI Coach is analyzing your resume... This may take a moment.'):
                         progress = st.progress(0, text="Initializing...")
-
-                        txt_filename = os.path.splitext(pdf_name)[0] + ".txt"
-                        txt_save_path = os.path.join('./Uploaded_Resumes/', txt_filename)
-                        time.sleep(0.9)
-                        progress.progress(30, text="Extracting Resume Data...")
-                        time.sleep(1.9)
-                        # your resume parsing code here
-                        
-
-                        try:
-                            with open(txt_save_path, "w", encoding="utf-8") as f:
-                                f.write(resume_text)
-                                progress.progress(60, text="Analyzing Skills Match...")
-                                time.sleep(1.5)
-                        # skill extraction and matching
-                        except Exception as e:
-                            st.warning(f"Could not save .txt resume file: {e}")
-
-                        progress.progress(97, text="Finalizing...")
-                        time.sleep(1.9)
+                        # The bar advances as each real stage starts; durations go to stage_metrics
+                        analysis_stages = {
+                            "cache_lookup": (10, "Checking for a previous analysis..."),
+                            "model_call": (30, "Analyzing Skills Match..."),
+                            "json_parse": (95, "Finalizing..."),
+                            "json_repair": (97, "Tidying up the AI response..."),
+                        }
+                        recorder = StageRecorder("user_analysis",
+                                                 on_stage=lambda name: progress.progress(*analysis_stages[name]))
                         # --- Call the AI Engine (Step 2) ---
-                        analysis_json = get_job_match_analysis(resume_text, job_description)
+                        # A user is waiting on this one, so it goes ahead of any bulk ranking
+                        resume_text = page_in(st.session_state, ('resume_text', resume_content_hash),
+                                              lambda: get_extraction_store().get(resume_content_hash)['text'])
+                        with request_priority(INTERACTIVE):
+                            analysis_json = get_job_match_analysis(resume_text, job_description, recorder=recorder)
+                        recorder.save()
                     
                     st.success("Analysis Complete!")
                     progress.progress(100, text="Complete!")
@@ -281,6 +245,8 @@ def run():
                 
     ###### CODE FOR FEEDBACK SIDE ######
     elif choice == 'Feedback':   
+        import plotly.express as px # to create visualisations at the admin session
+        import pandas as pd
         
         # timestamp 
         ts = time.time()
@@ -306,14 +272,10 @@ def run():
                 st.balloons()    
 
 
-        # query to fetch data from user feedback table
-        query = 'select * from user_feedback'        
-        plotfeed_data = pd.read_sql(query, connection)                        
-
-
-        # fetching feed_score from the query and getting the unique values and total value count 
-        labels = plotfeed_data.feed_score.unique()
-        values = plotfeed_data.feed_score.value_counts()
+        # rating counts are aggregated in SQL and cached until the next feedback insert
+        _, rating_counts = rating_summary()
+        labels = list(rating_counts.keys())
+        values = list(rating_counts.values())
 
 
         # plotting pie chart for user ratings
@@ -322,11 +284,13 @@ def run():
         st.plotly_chart(fig)
 
 
-        #  Fetching Comment History
-        cursor.execute('select feed_name, comments from user_feedback')
-        plfeed_cmt_data = cursor.fetchall()
-
+        #  Fetching Comment History, one page at a time
         st.subheader("**User Comment's**")
+        total_comments = sum(values)
+        page_count = max((total_comments + COMMENTS_PAGE_SIZE - 1) // COMMENTS_PAGE_SIZE, 1)
+        comment_page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+        plfeed_cmt_data = [tuple(row) for row in comments_page(int(comment_page))]
+
         dff = pd.DataFrame(plfeed_cmt_data, columns=['User', 'Comment'])
         st.dataframe(dff, width=1000)
 
@@ -388,7 +352,19 @@ def run():
         
         # --- Show Recruiter Tools ONLY if logged in ---
         if st.session_state.logged_in:
+            import pandas as pd
+            from gemini_helper import get_job_match_analysis, analysis_cache
+            from lexical_index import DEFAULT_TOP_K, DEFAULT_MIN_SCORE_RATIO
+            from llm_backends import backend_problems
+            from ranking_pipeline import build_shortlist, ranking_fingerprint, score_resumes, SHORTLIST_METHODS
+            from corpus_store import get_corpus_store
+            from ranking_jobs import get_job_queue, start_app_worker, QUEUED, RUNNING, DONE
+            from ranking_store import get_ranking_store, text_hash
+            from prompt_compaction import compaction_stats
+            from rate_limiter import request_priority, scheduler_stats, INTERACTIVE
             st.success("Login Successful!") # Good feedback
+            for problem in backend_problems():
+                st.error(problem)
 
             # --- Initialize ranked_candidates state if needed ---
             if 'ranked_candidates' not in st.session_state:
@@ -398,48 +374,250 @@ def run():
             st.header("🔎 Find Top Talent")
             jd_recruiter = st.text_area("Paste a Job Description here to find the best candidates:", height=300)
 
-            if st.button("Rank Candidates"):
+            # --- Ranking Settings ---
+            with st.expander("⚙️ Ranking Settings"):
+                scoring_mode = st.radio("Scoring mode", ["Detailed analysis (one request per resume)",
+                                                         "Batched quick score (many resumes per request)"])
+                max_workers = st.number_input("Parallel AI requests", min_value=1, max_value=64, value=DEFAULT_MAX_WORKERS)
+                request_timeout = st.number_input("Timeout per resume (seconds)", min_value=5, max_value=600, value=DEFAULT_TIMEOUT)
+                max_retries = st.number_input("Retries per resume", min_value=0, max_value=5, value=DEFAULT_MAX_RETRIES)
+                shortlist_method = st.radio("Shortlist by", SHORTLIST_METHODS,
+                                            format_func=lambda method: {'keyword': "Keywords (BM25)",
+                                                                        'semantic': "Meaning (local embeddings)"}[method])
+                shortlist_size = st.number_input("Shortlist size sent to the AI (0 = all resumes)", min_value=0, value=DEFAULT_TOP_K)
+                min_score_ratio = st.slider("Shortlist cutoff (fraction of the best pre-ranking score)", 0.0, 1.0, DEFAULT_MIN_SCORE_RATIO)
+                apply_requirements = st.checkbox("Only rank candidates meeting the job's hard requirements "
+                                                 "(e.g. \"5+ years Python\", required degree)", value=True)
+                run_in_background = st.checkbox("Run as a background job (keeps going if you leave the page "
+                                                "or the connection drops)", value=False)
+                cache_stats = analysis_cache.stats()
+                cache_hits = sum(ns['hits'] for ns in cache_stats['namespaces'].values())
+                cache_misses = sum(ns['misses'] for ns in cache_stats['namespaces'].values())
+                st.caption(f"AI result cache: {cache_stats['entries']} entries, "
+                           f"{cache_stats['size_bytes'] / 1024:.0f} KB, {cache_hits} hits / {cache_misses} misses")
+                savings = compaction_stats()
+                st.caption(f"Prompt compaction: {savings['tokens_saved']} of {savings['original_tokens']} "
+                           f"input tokens saved over {savings['calls']} requests")
+                for task, task_savings in sorted(savings['tasks'].items()):
+                    st.caption(f"  {task}: {task_savings['tokens_saved']} of {task_savings['original_tokens']} "
+                               f"tokens saved over {task_savings['calls']} requests")
+                for backend_name, queue in scheduler_stats().items():
+                    cooldown = f", paused {queue['cooldown_seconds']:.0f}s for rate limits" if queue['cooldown_seconds'] else ""
+                    st.caption(f"Model request queue ({backend_name}): {queue['queued']['interactive']} interactive "
+                               f"and {queue['queued']['bulk']} bulk waiting, {queue['in_flight']} in flight, "
+                               f"{queue['rate_limited']} rate-limit retries so far{cooldown}")
+                sessions = session_stats()
+                st.caption(f"Session memory: this session {session_bytes / 1024:.0f} KB of a {budget_bytes() / 1024:.0f} KB "
+                           f"budget; {sessions['sessions']} active sessions hold {sessions['total_bytes'] / 1024:.0f} KB "
+                           f"(largest {sessions['max_bytes'] / 1024:.0f} KB, {sessions['over_budget']} over budget)")
+                timings = stage_summary()
+                if timings:
+                    st.caption("Where the time goes (all recorded runs):")
+                    st.dataframe(pd.DataFrame(timings).round(1), width=700)
+
+            rank_col, search_col = st.columns(2)
+            rank_clicked = rank_col.button("Rank Candidates")
+            search_clicked = search_col.button("Semantic Search (no AI calls)")
+
+            if search_clicked:
+                if not jd_recruiter:
+                    st.error("Please paste a job description to find candidates.")
+                else:
+                    with st.spinner('Searching resumes by meaning...'):
+                        # Cosine similarity of local embeddings only, so results come back
+                        # in well under a second and cost no API quota
+                        shortlist = build_shortlist(jd_recruiter, "./Uploaded_Resumes/", top_k=int(shortlist_size),
+                                                    min_score_ratio=min_score_ratio,
+                                                    apply_requirements=apply_requirements, method='semantic')
+                        if shortlist.requirements is not None:
+                            st.caption(f"Hard requirements: {', '.join(shortlist.requirements.describe())} "
+                                       f"({shortlist.qualified} of {shortlist.corpus_size} resumes qualify)")
+                        st.session_state.ranked_candidates = CompactRanking.from_pairs(
+                            (round(score * 100), candidate_id) for candidate_id, score in shortlist.scores.items())
+                        st.session_state.ranking_fingerprint = None
+                        st.session_state.unscored_candidates = []
+                        st.session_state.ranking_complete = True
+                        if not st.session_state.ranked_candidates:
+                            st.warning("No resumes matched this job description.")
+
+            if rank_clicked and run_in_background:
+                if not jd_recruiter:
+                    st.error("Please paste a job description to find candidates.")
+                else:
+                    # Scored by a worker outside this script run; progress is read back from cv.db
+                    start_app_worker()
+                    get_job_queue().submit(jd_recruiter, resume_dir="./Uploaded_Resumes/", top_k=int(shortlist_size),
+                                           min_score_ratio=min_score_ratio, apply_requirements=apply_requirements,
+                                           method=shortlist_method, batched=scoring_mode.startswith("Batched"),
+                                           max_workers=int(max_workers), timeout=request_timeout,
+                                           max_retries=int(max_retries))
+                    st.info("Ranking queued. Follow its progress under Background Rankings below.")
+
+            elif rank_clicked:
                 if not jd_recruiter:
                     st.error("Please paste a job description to find candidates.")
                 else:
                     with st.spinner('Analyzing all resumes in the database... This may take a few moments.'):
                         resume_dir = "./Uploaded_Resumes/"
-                        all_resume_files = glob.glob(os.path.join(resume_dir, "*.txt"))
+                        # Score the whole corpus locally first (hard requirements in SQL, then
+                        # keywords or embeddings), and only send the shortlist to the AI
+                        shortlist = build_shortlist(jd_recruiter, resume_dir, top_k=int(shortlist_size),
+                                                    min_score_ratio=min_score_ratio,
+                                                    apply_requirements=apply_requirements,
+                                                    method=shortlist_method)
+                        if shortlist.requirements is not None:
+                            st.caption(f"Hard requirements: {', '.join(shortlist.requirements.describe())} "
+                                       f"({shortlist.qualified} of {shortlist.corpus_size} resumes qualify)")
+                        for txt_filename, e in shortlist.read_errors:
+                            st.error(f"Error reading {txt_filename}: {e}")
                         
                         st.session_state.ranked_candidates = [] # Initialize/clear results
+                        st.session_state.unscored_candidates = []
 
-                        if not all_resume_files:
+                        if not shortlist.resumes and shortlist.requirements is not None and shortlist.corpus_size:
+                            st.warning("No resumes meet the job's hard requirements.")
+                        elif not shortlist.resumes:
                             st.warning("No resumes (.txt files) found in the Uploaded_Resumes folder.")
                         else:
-                            for txt_file_path in all_resume_files:
-                                try:
-                                    with open(txt_file_path, 'r', encoding='utf-8') as f:
-                                        resume_text = f.read()
-
-                                    # --- MODIFIED CODE ---
-                                    # Call the main analysis function instead of the simple one
-                                    analysis_json = get_job_match_analysis(resume_text, jd_recruiter)
-                                    # Extract the score from the JSON
-                                    score = analysis_json.get('match_score', 0)
-                                    # --- END MODIFICATION ---
-
-                                    candidate_name = os.path.basename(txt_file_path)
+                            st.caption(f"{shortlist_method.capitalize()} pre-ranking shortlisted {len(shortlist.resumes)} of {shortlist.corpus_size} resumes for AI scoring.")
+
+                            # Reuse scores from earlier runs of the same job description; only
+                            # resumes that are new or changed since then go to the AI
+                            batched = scoring_mode.startswith("Batched")
+                            ranking_store = get_ranking_store()
+                            fingerprint = ranking_fingerprint(jd_recruiter, batched)
+                            st.session_state.ranking_fingerprint = fingerprint
+                            reused, resumes = ranking_store.split(fingerprint, shortlist.resumes)
+                            resume_texts = dict(resumes)
+                            ranking_store.start_run(fingerprint, jd_recruiter)
+                            if reused:
+                                st.caption(f"Reused {len(reused)} scores from an earlier ranking of this job description; "
+                                           f"{len(resumes)} new or changed resumes to score.")
+                            st.session_state.ranked_candidates.extend(reused)
+
+                            ranking_progress = st.progress(0, text="Scoring candidates...")
+                            leaderboard_view = st.empty()
+                            leaderboard = Leaderboard(len(resumes), top_n=10)
+                            for score, candidate_name in reused:
+                                leaderboard.add(score, candidate_name, counted=False)
+                            last_render = [0.0]
+
+                            # Clicking this (or any other widget) asks Streamlit to rerun the script.
+                            # The rerun interrupts this run at its next Streamlit call, which the
+                            # engine's on_tick below makes at least every TICK_INTERVAL; the engine then
+                            # withdraws its queued requests and the scores so far stay in session state
+                            st.button("⏹ Stop Ranking", key="stop_ranking")
+
+                            def show_progress():
+                                eta = leaderboard.eta_seconds()
+                                eta_text = f", about {eta:.0f}s left" if eta is not None and leaderboard.done < leaderboard.total else ""
+                                queued = sum(queue['queued']['bulk'] for queue in scheduler_stats().values())
+                                queued_text = f", {queued} requests waiting on the API quota" if queued else ""
+                                ranking_progress.progress(leaderboard.fraction_done,
+                                                          text=f"Scored {leaderboard.done} of {leaderboard.total} candidates{eta_text}{queued_text}...")
+
+                            # Results are streamed into session state and a live top-N as each candidate finishes
+                            def on_result(score, candidate_name, failed):
+                                if failed:
+                                    # Not stored anywhere, so the next ranking of this job description scores it again
+                                    st.session_state.unscored_candidates.append(candidate_name)
+                                    leaderboard.skip()
+                                else:
                                     st.session_state.ranked_candidates.append((score, candidate_name))
-                                except Exception as e:
-                                    st.error(f"Error analyzing {txt_file_path}: {e}")
-
-                            # Sort results after the loop
-                            if st.session_state.ranked_candidates:
-                                st.session_state.ranked_candidates.sort(reverse=True)
-
+                                    ranking_store.record(fingerprint, candidate_name, resume_texts[candidate_name], score)
+                                    leaderboard.add(score, candidate_name)
+                                show_progress()
+                                # Redraw the leaderboard at most a few times per second
+                                if time.monotonic() - last_render[0] > 0.5 or leaderboard.done == leaderboard.total:
+                                    last_render[0] = time.monotonic()
+                                    leaderboard_view.dataframe(
+                                        pd.DataFrame(leaderboard.top(), columns=['Match %', 'Candidate']), width=700)
+
+                            def on_error(candidate_name, error):
+                                st.error(f"Error analyzing {candidate_name}: {error}")
+
+                            st.session_state.ranking_complete = False
+                            score_resumes(resumes, jd_recruiter, batched=batched, max_workers=int(max_workers),
+                                          timeout=request_timeout, max_retries=int(max_retries),
+                                          on_result=on_result, on_error=on_error, on_tick=show_progress)
+                            # Not reached when the ranking is stopped, so it stays marked incomplete
+                            st.session_state.ranking_complete = True
+                            leaderboard_view.empty()
+
+                            # Only IDs and scores stay in the session, packed and sorted
+                            compact_ranking(st.session_state)
+
+
+            # --- Background Ranking Jobs (polled from cv.db) ---
+            job_queue = get_job_queue()
+            if job_queue.recent(limit=1):
+                # Queued jobs left over from a server restart need a worker too
+                start_app_worker()
+                st.subheader("Background Rankings")
+
+                @st.fragment(run_every=3)
+                def show_ranking_jobs():
+                    for job in job_queue.recent(limit=10):
+                        title = job['job_description'].strip().splitlines()[0][:60] if job['job_description'].strip() else "(empty)"
+                        total = job['total']
+                        scored = f"{job['done']} of {total}" if total is not None else f"{job['done']}"
+                        failed = f", {job['unscored']} not scored" if job['unscored'] else ""
+                        status_col, results_col, cancel_col = st.columns([4, 1, 1])
+                        status_col.progress(min((job['done'] + job['unscored']) / total, 1.0) if total
+                                            else (1.0 if job['status'] == DONE else 0.0),
+                                            text=f"{title}: {job['status']}, {scored} scored{failed}")
+                        if results_col.button("Show results", key=f"job_results_{job['job_id']}", disabled=not (job['done'] or job['unscored'])):
+                            st.session_state.ranked_candidates = CompactRanking.from_pairs(job_queue.results(job['job_id']))
+                            st.session_state.ranking_fingerprint = job['fingerprint']
+                            st.session_state.unscored_candidates = job_queue.failures(job['job_id'])
+                            st.session_state.ranking_complete = job['status'] == DONE
+                            st.rerun()
+                        if job['status'] in (QUEUED, RUNNING) and cancel_col.button("Cancel", key=f"job_cancel_{job['job_id']}"):
+                            job_queue.cancel(job['job_id'])
+
+                show_ranking_jobs()
 
             # --- Display Ranked Results (uses session state) ---
             if st.session_state.ranked_candidates is not None: # Check if analysis has run
-                if st.session_state.ranked_candidates:
-                    st.success(f"Ranking complete! Found {len(st.session_state.ranked_candidates)} candidates.")
-                    st.subheader(f"Top {len(st.session_state.ranked_candidates)} Matches:")
-
-                    for i, (score, txt_filename) in enumerate(st.session_state.ranked_candidates):
+                # A stopped ranking leaves its partial list behind; pack it like a finished one
+                ranked_candidates = compact_ranking(st.session_state)
+                unscored = st.session_state.get('unscored_candidates')
+                if unscored:
+                    st.warning(f"{len(unscored)} candidates could not be scored and are not ranked: "
+                               f"{', '.join(unscored[:10])}{' ...' if len(unscored) > 10 else ''}. "
+                               f"Ranking this job description again scores them.")
+                if ranked_candidates:
+                    if not st.session_state.get('ranking_complete', True):
+                        # The ranking was stopped or interrupted; show what was scored so far
+                        st.warning(f"Ranking stopped early. Showing the {len(ranked_candidates)} candidates scored so far.")
+                    else:
+                        st.success(f"Ranking complete! Found {len(ranked_candidates)} candidates.")
+                    st.subheader(f"Top {len(ranked_candidates)} Matches:")
+
+                    # The export covers every stored score for this job description (earlier
+                    # runs included), joined with corpus metadata from the columnar store. It is
+                    # only built in the run where it is asked for, not on every rerun, and the
+                    # file is served from Streamlit's media store rather than kept in the session
+                    if st.button("Prepare CSV download", key="prepare_ranking_csv"):
+                        corpus_store = get_corpus_store()
+                        export_fingerprint = st.session_state.get('ranking_fingerprint')
+                        export_ranking = (get_ranking_store().ranking(export_fingerprint, corpus_store.content_hashes())
+                                          if export_fingerprint else None) or ranked_candidates
+                        st.download_button("Download ranking as CSV",
+                                           data=pd.DataFrame(corpus_store.export_table(export_ranking)).to_csv(index=False),
+                                           file_name='candidate_ranking.csv', mime='text/csv',
+                                           key="download_ranking_csv")
+
+                    # Only one page of candidates gets widgets (and widget state) at a time
+                    page_count = (len(ranked_candidates) - 1) // RESULTS_PAGE_SIZE + 1
+                    if st.session_state.get("results_page", 1) > page_count:
+                        # A new, shorter ranking starts from its first page
+                        st.session_state.results_page = 1
+                    results_page = st.number_input(f"Results page (of {page_count})", min_value=1, max_value=page_count,
+                                                   key="results_page") if page_count > 1 else 1
+                    first_rank = (results_page - 1) * RESULTS_PAGE_SIZE
+                    for i, (score, txt_filename) in enumerate(
+                            ranked_candidates.page(first_rank, first_rank + RESULTS_PAGE_SIZE), start=first_rank):
                         expander_title = f"#{i+1}: {txt_filename}  (Match: {score}%)"
                         with st.expander(expander_title):
                             base_filename = os.path.splitext(txt_filename)[0]
@@ -447,18 +625,22 @@ def run():
                             pdf_path = os.path.join("./Uploaded_Resumes/", pdf_filename)
                             st.write(f"**Candidate File:** {pdf_filename}")
 
-                            if st.button("View Original Resume", key=f"view_{i}_{txt_filename}"): # Unique key per file
+                            # A checkbox rather than a button, so paging through the resume keeps it open
+                            if st.checkbox("View Original Resume", key=f"view_{i}_{txt_filename}"): # Unique key per file
                                 if os.path.exists(pdf_path):
-                                    show_pdf(pdf_path)
+                                    show_pdf(pdf_path, key=f"{i}_{txt_filename}")
                                 else:
                                     st.error(f"Could not find the original PDF: {pdf_filename}")
 
                             if st.button("Show AI Strengths for this Candidate", key=f"strength_{i}_{txt_filename}"): # Unique key per file
                                 with st.spinner("Asking AI for this candidate's top strengths..."):
-                                    txt_path = os.path.join("./Uploaded_Resumes/", txt_filename)
-                                    with open(txt_path, 'r', encoding='utf-8') as f:
-                                        resume_text_for_strength = f.read()
-                                    analysis_json = get_job_match_analysis(resume_text_for_strength, jd_recruiter)
+                                    # Read from the memory-mapped corpus store, and the analysis is kept
+                                    # in the session's paged details until the budget needs the room
+                                    def load_strength_analysis():
+                                        with request_priority(INTERACTIVE):
+                                            return get_job_match_analysis(get_corpus_store().text(txt_filename), jd_recruiter)
+                                    analysis_json = page_in(st.session_state, ('strengths', txt_filename, text_hash(jd_recruiter)),
+                                                            load_strength_analysis)
                                     st.subheader("✅ Top Strengths for this Role:")
                                     strengths = analysis_json.get('strengths', [])
                                     if strengths:
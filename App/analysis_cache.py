@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# --- Cache Defaults ---
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analysis_cache.db')
+# Entries older than this are treated as misses and purged (seconds)
+DEFAULT_TTL = 7 * 24 * 3600
+# Least recently used entries are evicted once either bound is exceeded
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# The bounds are checked every this many writes (per process), not on every write,
+# so they may be overshot by up to that many entries in between
+EVICTION_CHECK_EVERY = 200
+# Eviction goes on until the cache is under this share of both bounds, so the next
+# few writes don't trigger it again
+EVICTION_LOW_WATER = 0.9
+# Cache hits don't write: their last-access times and the hit/miss counters are
+# buffered in memory and written in one transaction once this many are pending or
+# this many seconds have passed, whichever comes first
+PENDING_FLUSH_EVERY = 100
+PENDING_FLUSH_INTERVAL = 30
+
+
+def make_cache_key(namespace, prompt_version, model_config, *parts):
+    """
+    Builds a content-addressed key from the function name, its prompt version,
+    the model settings and the prompt inputs (resume text, job description, ...).
+    """
+    payload = json.dumps([namespace, prompt_version, model_config, list(parts)],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Disk-backed cache for model responses, shared by every Streamlit session (and
+    process) that points at the same SQLite file. Values are stored as JSON.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        # Unflushed last-access times (cache_key -> time) and counters (namespace -> [hits, misses])
+        self._pending_lock = threading.Lock()
+        self._touches = {}
+        self._counts = {}
+        self._last_flush = time.monotonic()
+        self._init_schema()
+
+    def _connect(self):
+        # SQLite connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_analysis_cache_lru ON analysis_cache (last_accessed)')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_cache_stats (
+                    namespace TEXT PRIMARY KEY,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Entry count and size, kept current by triggers so neither stats() nor
+            # the eviction check has to scan the table
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_cache_totals (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    entries INTEGER NOT NULL,
+                    size_bytes INTEGER NOT NULL
+                )
+            """)
+        with conn:
+            # Seeding the totals and creating the triggers happen in one write
+            # transaction, so no other process can insert in between
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute("""
+                INSERT OR IGNORE INTO analysis_cache_totals (id, entries, size_bytes)
+                SELECT 1, COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analysis_cache
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS analysis_cache_totals_insert
+                AFTER INSERT ON analysis_cache
+                BEGIN
+                    UPDATE analysis_cache_totals
+                    SET entries = entries + 1, size_bytes = size_bytes + NEW.size_bytes
+                    WHERE id = 1;
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS analysis_cache_totals_delete
+                AFTER DELETE ON analysis_cache
+                BEGIN
+                    UPDATE analysis_cache_totals
+                    SET entries = entries - 1, size_bytes = size_bytes - OLD.size_bytes
+                    WHERE id = 1;
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS analysis_cache_totals_update
+                AFTER UPDATE OF size_bytes ON analysis_cache
+                BEGIN
+                    UPDATE analysis_cache_totals
+                    SET size_bytes = size_bytes + NEW.size_bytes - OLD.size_bytes
+                    WHERE id = 1;
+                END
+            """)
+
+    def _record(self, key, namespace, hit, now):
+        with self._pending_lock:
+            counts = self._counts.setdefault(namespace, [0, 0])
+            counts[0 if hit else 1] += 1
+            if hit:
+                self._touches[key] = now
+            due = (len(self._touches) + len(self._counts) >= PENDING_FLUSH_EVERY
+                   or time.monotonic() - self._last_flush >= PENDING_FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered last-access times and hit/miss counters.
+        """
+        with self._pending_lock:
+            touches, self._touches = self._touches, {}
+            counts, self._counts = self._counts, {}
+            self._last_flush = time.monotonic()
+        if not touches and not counts:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                # MAX() so a buffered touch never moves back an entry rewritten since
+                conn.executemany('UPDATE analysis_cache SET last_accessed = MAX(last_accessed, ?) '
+                                 'WHERE cache_key = ?',
+                                 [(accessed, key) for key, accessed in touches.items()])
+                conn.executemany("""
+                    INSERT INTO analysis_cache_stats (namespace, hits, misses) VALUES (?, ?, ?)
+                    ON CONFLICT(namespace) DO UPDATE
+                    SET hits = hits + excluded.hits, misses = misses + excluded.misses
+                """, [(namespace, hits, misses) for namespace, (hits, misses) in counts.items()])
+        except sqlite3.Error as e:
+            # Only bookkeeping is lost: LRU order and the counters, never cached values
+            print(f"Analysis cache flush failed: {e}")
+
+    def get(self, key, namespace='default'):
+        """
+        Returns the cached value for `key`, or None on a miss or an expired entry.
+        Expired entries are left for the next eviction pass to purge.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT value, created_at FROM analysis_cache WHERE cache_key = ?',
+                               (key,)).fetchone()
+        except sqlite3.Error as e:
+            # A broken cache must never break the analysis itself
+            print(f"Analysis cache read failed: {e}")
+            return None
+        hit = row is not None and now - row[1] <= self.ttl
+        self._record(key, namespace, hit, now)
+        return json.loads(row[0]) if hit else None
+
+    def set(self, key, value, namespace='default'):
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False)
+        conn = self._connect()
+        try:
+            with conn:
+                # An upsert rather than INSERT OR REPLACE: the replace's implicit delete
+                # doesn't fire the delete trigger, which would leave the totals high
+                conn.execute("""
+                    INSERT INTO analysis_cache
+                        (cache_key, namespace, value, size_bytes, created_at, last_accessed)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(cache_key) DO UPDATE SET
+                        namespace = excluded.namespace, value = excluded.value,
+                        size_bytes = excluded.size_bytes, created_at = excluded.created_at,
+                        last_accessed = excluded.last_accessed
+                """, (key, namespace, data, len(data.encode('utf-8')), now, now))
+            with self._writes_lock:
+                check = self._writes % EVICTION_CHECK_EVERY == 0
+                self._writes += 1
+            if check:
+                # Eviction goes by last access, so write out the buffered touches first
+                self.flush()
+                # In a transaction of its own, so the write above never waits on it
+                with conn:
+                    self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"Analysis cache write failed: {e}")
+
+    def _totals(self, conn):
+        row = conn.execute('SELECT entries, size_bytes FROM analysis_cache_totals WHERE id = 1').fetchone()
+        return row if row is not None else (0, 0)
+
+    def _evict(self, conn, now):
+        conn.execute('DELETE FROM analysis_cache WHERE created_at < ?', (now - self.ttl,))
+        count, total_bytes = self._totals(conn)
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        # Count the least recently used entries to drop to get under the low-water
+        # mark, then delete them in one statement
+        max_entries = int(self.max_entries * EVICTION_LOW_WATER)
+        max_bytes = int(self.max_bytes * EVICTION_LOW_WATER)
+        doomed = 0
+        cursor = conn.execute('SELECT size_bytes FROM analysis_cache ORDER BY last_accessed')
+        for size, in cursor:
+            if count <= max_entries and total_bytes <= max_bytes:
+                break
+            doomed += 1
+            count -= 1
+            total_bytes -= size
+        cursor.close()
+        conn.execute('DELETE FROM analysis_cache WHERE cache_key IN '
+                     '(SELECT cache_key FROM analysis_cache ORDER BY last_accessed LIMIT ?)', (doomed,))
+
+    def stats(self):
+        """
+        Returns hit/miss counters per namespace plus the current entry count and size.
+        Read-only: counters not yet flushed are added in from memory.
+        """
+        conn = self._connect()
+        totals = {namespace: [hits, misses] for namespace, hits, misses in conn.execute(
+            'SELECT namespace, hits, misses FROM analysis_cache_stats')}
+        with self._pending_lock:
+            for namespace, (hits, misses) in self._counts.items():
+                counts = totals.setdefault(namespace, [0, 0])
+                counts[0] += hits
+                counts[1] += misses
+        per_namespace = {
+            namespace: {'hits': hits, 'misses': misses,
+                        'hit_rate': hits / (hits + misses) if hits + misses else 0.0}
+            for namespace, (hits, misses) in totals.items()
+        }
+        count, total_bytes = self._totals(conn)
+        return {'entries': count, 'size_bytes': total_bytes, 'namespaces': per_namespace}
+
+    def clear(self):
+        with self._pending_lock:
+            self._touches.clear()
+            self._counts.clear()
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM analysis_cache')
+            conn.execute('DELETE FROM analysis_cache_stats')
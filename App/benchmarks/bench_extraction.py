@@ -0,0 +1,150 @@
+"""
+Benchmark for PDF text extraction (resume_parser.py).
+
+    python benchmarks/bench_extraction.py                     # sample PDFs + a synthetic 24-page CV
+    python benchmarks/bench_extraction.py --dir /path/to/pdfs --repeat 3 --workers 4
+
+Each mode extracts every PDF and is compared with the original single-pass
+pdfminer3 code (default LAParams on one core). Reported per mode: total time,
+pages/sec, speedup over that baseline, the slowest page, and how many documents
+came out with exactly the same text. Modes that change the text are listed for
+reference; only exact matches are safe for stored rankings and cached scores.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import resume_parser  # noqa: E402
+from pdfminer3.converter import TextConverter  # noqa: E402
+from pdfminer3.layout import LAParams  # noqa: E402
+from pdfminer3.pdfinterp import PDFResourceManager, PDFPageInterpreter  # noqa: E402
+from pdfminer3.pdfpage import PDFPage  # noqa: E402
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_DIR = os.path.join(APP_DIR, 'Uploaded_Resumes')
+
+
+def legacy_extract(data):
+    # What resume_parser.extract_pdf did before the engine: one pass, default layout
+    resource_manager = PDFResourceManager()
+    out = io.StringIO()
+    converter = TextConverter(resource_manager, out, laparams=LAParams())
+    interpreter = PDFPageInterpreter(resource_manager, converter)
+    for page in PDFPage.get_pages(io.BytesIO(data), caching=True, check_extractable=True):
+        interpreter.process_page(page)
+    converter.close()
+    return out.getvalue()
+
+
+def synthesize_pdf(path, page_count, source_text):
+    """
+    Writes a plain multi-page PDF (Helvetica text lines) from the sample resume
+    text, standing in for the long CVs the page-parallel path is meant for.
+    """
+    lines = [line.strip() for line in source_text.splitlines() if line.strip()] or ["Experience"]
+    lines = [line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)').encode('latin-1', 'replace')
+             for line in lines]
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in range(page_count):
+        stream = [b"BT /F1 10 Tf 50 780 Td 12 TL"]
+        for i in range(60):
+            stream.append(b"(" + lines[(page * 60 + i) % len(lines)][:95] + b") '")
+        stream.append(b"ET")
+        content = b"\n".join(stream)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % i for i in page_ids), page_count)
+
+    body, offsets = b"%PDF-1.4\n", []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(body)
+    body += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    body += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    body += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(body)
+
+
+def run_mode(documents, repeat, **options):
+    """
+    Extracts every document `repeat` times; returns (seconds, page count, page timings, texts).
+    """
+    texts, page_ms, page_total = {}, [], 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for name, data in documents:
+            text, pages = resume_parser.extract_pdf(io.BytesIO(data), **options)
+            texts[name] = text
+            page_total += len(pages)
+            page_ms += [page['extract_ms'] for page in pages]
+    return time.perf_counter() - started, page_total, page_ms, texts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction against the old single-pass code.")
+    parser.add_argument('--dir', default=SAMPLE_DIR, help="folder of PDFs to extract")
+    parser.add_argument('--long-pages', type=int, default=24, help="pages in the synthetic long CV (0 = none)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="processes for the parallel mode")
+    args = parser.parse_args(argv)
+
+    documents = []
+    for name in sorted(os.listdir(args.dir)):
+        if name.lower().endswith('.pdf'):
+            with open(os.path.join(args.dir, name), 'rb') as f:
+                documents.append((name, f.read()))
+    if args.long_pages:
+        source_text = legacy_extract(documents[0][1]) if documents else ""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'long.pdf')
+            synthesize_pdf(path, args.long_pages, source_text)
+            with open(path, 'rb') as f:
+                documents.append((f"synthetic {args.long_pages}-page CV", f.read()))
+    if not documents:
+        sys.exit(f"No PDFs in {args.dir}")
+
+    # Warm up imports, font caches and the process pool so no mode pays for them
+    resume_parser.extract_pdf(io.BytesIO(documents[-1][1]), workers=args.workers)
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        reference = {name: legacy_extract(data) for name, data in documents}
+    baseline = time.perf_counter() - started
+    print(f"{len(documents)} documents x {args.repeat}, {os.cpu_count()} CPUs")
+    print(f"  {'baseline (old code)':28s} {baseline:7.2f}s")
+
+    modes = [
+        ("engine, 1 process", dict(workers=1)),
+        (f"engine, {args.workers} processes", dict(workers=args.workers)),
+        ("engine, auto", dict()),
+        ("layout 'fast'", dict(workers=1, layout='fast')),
+        ("layout 'none'", dict(workers=1, layout='none')),
+    ]
+    try:
+        import fitz  # noqa: F401
+        modes.append(("PyMuPDF backend", dict(backend='pymupdf')))
+    except ImportError:
+        print("  (PyMuPDF not installed, skipping its backend)")
+
+    for label, options in modes:
+        seconds, page_total, page_ms, texts = run_mode(documents, args.repeat, **options)
+        identical = sum(texts[name] == reference[name] for name, _ in documents)
+        print(f"  {label:28s} {seconds:7.2f}s  {page_total / seconds:7.1f} pages/s  "
+              f"speedup {baseline / seconds:4.2f}x  page p50 {statistics.median(page_ms):6.1f} ms / "
+              f"max {max(page_ms):6.1f} ms  identical text {identical}/{len(documents)}")
+
+
+if __name__ == '__main__':
+    main()
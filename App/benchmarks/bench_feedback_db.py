@@ -0,0 +1,92 @@
+"""
+Load benchmark for concurrent feedback submissions against cv.db.
+
+    python benchmarks/bench_feedback_db.py --threads 32 --inserts 200
+
+Compares the old pattern (a connection per session, rollback journal, a commit per
+insert) with db.py's WAL connections and group-committing BatchWriter. Each mode
+runs against its own temporary database.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+INSERT_SQL = "insert into user_feedback values (NULL,?,?,?,?,?)"
+
+
+def _row(thread_id, i):
+    return (f"user{thread_id}", f"user{thread_id}@example.com", str(i % 5 + 1), "benchmark", "2024-01-01_00:00:00")
+
+
+def run_legacy(db_path, threads, inserts):
+    conn = sqlite3.connect(db_path)
+    conn.execute(db.MIGRATIONS[0])
+    conn.close()
+    errors = []
+
+    def worker(thread_id):
+        # what App.py used to do: plain connection, one commit per feedback row
+        conn = sqlite3.connect(db_path, timeout=1)
+        for i in range(inserts):
+            try:
+                conn.execute(INSERT_SQL, _row(thread_id, i))
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+        conn.close()
+
+    return _timed(worker, threads), errors
+
+
+def run_db_layer(db_path, threads, inserts):
+    db.init_db(db_path)
+    writer = db.get_writer(db_path)
+    errors = []
+
+    def worker(thread_id):
+        for i in range(inserts):
+            try:
+                writer.submit(INSERT_SQL, _row(thread_id, i))
+            except (sqlite3.Error, TimeoutError) as e:
+                errors.append(str(e))
+
+    return _timed(worker, threads), errors
+
+
+def _timed(worker, threads):
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32, help="concurrent sessions submitting feedback")
+    parser.add_argument('--inserts', type=int, default=200, help="feedback rows per session")
+    args = parser.parse_args(argv)
+
+    total = args.threads * args.inserts
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, runner in (("legacy (commit per insert)", run_legacy),
+                             ("db.py (WAL + group commit)", run_db_layer)):
+            db_path = os.path.join(tmp, name.split()[0] + '.db')
+            elapsed, errors = runner(db_path, args.threads, args.inserts)
+            stored = sqlite3.connect(db_path).execute('select count(*) from user_feedback').fetchone()[0]
+            print(f"{name:28s} {elapsed:7.2f}s  {stored / elapsed:9.0f} rows/s  "
+                  f"stored {stored}/{total}  errors {len(errors)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+Offline benchmark for the Recruiter ranking pipeline.
+
+    python benchmarks/bench_ranking.py                                # 100 and 1000 resumes
+    python benchmarks/bench_ranking.py --sizes 100 10000 100000 --latency 0.2 --workers 16
+    python benchmarks/bench_ranking.py --mode batched --shortlist 0 --json ranking.json
+    python benchmarks/bench_ranking.py --shortlist-method semantic
+
+Corpora of any size are synthesized from the sample resumes in Uploaded_Resumes/
+(each copy gets a different skill mix and work history, so no two are identical).
+Each corpus goes through the same steps as the page (ranking_pipeline.py): keyword
+index sync, hard-requirement filter, BM25 (or embedding) shortlist and ScoringEngine scoring
+through gemini_helper, with the model replaced by the offline "local" backend
+plus an artificial per-call latency. Each corpus and mode is ranked twice:
+"cold" starts from empty databases and keyword/embedding indexes (the first ranking after a
+bulk load), "warm" reuses them, as the page does on every later ranking. Both
+start with an empty AI result cache.
+
+Reported per run: resumes/sec over the whole pipeline, p50/p99 latency of a
+scoring call, Python memory peak (tracemalloc), model calls per ranking, and
+recall@10 against an exhaustive ranking of the whole corpus by the same stub
+model, which shows what pre-filtering costs in quality.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analysis_cache  # noqa: E402
+import gemini_helper  # noqa: E402
+import llm_backends  # noqa: E402
+from candidate_profiles import ProfileStore, SKILL_ALIASES  # noqa: E402
+from embedding_index import EmbeddingIndex, HashingEmbedder  # noqa: E402
+from corpus_store import CorpusStore  # noqa: E402
+from lexical_index import LexicalIndex  # noqa: E402
+from ranking_pipeline import build_shortlist, score_resumes, SHORTLIST_METHODS  # noqa: E402
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_DIR = os.path.join(APP_DIR, 'Uploaded_Resumes')
+
+DEFAULT_JD = """DevOps Engineer
+We are hiring a DevOps engineer to run our cloud platform.
+- 2+ years of professional experience
+- Python is required
+- Hands-on AWS, Docker, Kubernetes and Terraform
+- Jenkins or other CI/CD tooling
+- Linux administration; Ansible is a plus
+"""
+
+TITLES = ['Software Engineer', 'DevOps Engineer', 'Data Analyst', 'Web Developer', 'Cloud Engineer',
+          'Data Scientist', 'QA Engineer', 'Backend Developer', 'Machine Learning Engineer']
+
+
+# --- Stub Model ---
+
+class BenchBackend(llm_backends.LocalLexicalBackend):
+    """
+    The offline backend with a configurable delay and a count of calls per task.
+    """
+
+    name = "bench"
+    latency_seconds = 0.0
+
+    def __init__(self):
+        super().__init__(latency=self.latency_seconds)
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def generate(self, task, prompt_parts, generation_config, inputs):
+        with self._lock:
+            self.calls[task] = self.calls.get(task, 0) + 1
+        return super().generate(task, prompt_parts, generation_config, inputs)
+
+
+# --- Corpus ---
+
+def load_samples():
+    samples = []
+    for name in sorted(os.listdir(SAMPLE_DIR)):
+        if name.endswith('.txt'):
+            with open(os.path.join(SAMPLE_DIR, name), 'r', encoding='utf-8') as f:
+                text = f.read()
+            if len(text.strip()) > 200:
+                samples.append(text)
+    return samples
+
+
+def synthesize_corpus(resume_dir, size, seed=0):
+    """
+    Writes `size` .txt resumes into `resume_dir`, each a sample resume with its
+    contact details replaced, a random work history and a random skills section.
+    """
+    rng = random.Random(seed)
+    samples = load_samples()
+    skills = list(SKILL_ALIASES)
+    os.makedirs(resume_dir, exist_ok=True)
+    for i in range(size):
+        text = samples[i % len(samples)]
+        text = re.sub(r"[\w.+-]+@[\w-]+\.[\w.]+", f"candidate{i}@example.com", text)
+        text = re.sub(r"\+?\d[\d -]{8,}\d", f"+1 555 {i:07d}", text)
+        history = []
+        year = 2025
+        for _ in range(rng.randint(0, 4)):
+            start = year - rng.randint(1, 4)
+            history.append(f"{rng.choice(TITLES)}\nJan {start} - Dec {year}")
+            year = start
+        extra_skills = ', '.join(rng.sample(skills, rng.randint(3, 12)))
+        text = f"Candidate {i}\n{text}\nExperience\n" + "\n".join(history) + f"\nSkills\n{extra_skills}\n"
+        with open(os.path.join(resume_dir, f"candidate_{i:06d}.txt"), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+# --- Runs ---
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def exhaustive_top(resume_dir, job_description, k=10):
+    """
+    Reference ranking: every resume scored by the stub model, no pre-filtering.
+    """
+    backend = llm_backends.LocalLexicalBackend(latency=0)
+    scored = []
+    for name in os.listdir(resume_dir):
+        with open(os.path.join(resume_dir, name), 'r', encoding='utf-8') as f:
+            scored.append((backend._match(f.read(), job_description)[0], name))
+    scored.sort(reverse=True)
+    # Ties at the cut-off all count as part of the reference top-k
+    cutoff = scored[min(k, len(scored)) - 1][0] if scored else 0
+    return {name for score, name in scored if score >= cutoff}
+
+
+def run_once(work_dir, resume_dir, args, batched, lexical_index, embedding_index, corpus_store, db_path):
+    """
+    One ranking through the page's pipeline. Returns the metrics dict.
+    """
+    # A fresh result cache per run, so no run gets its model answers for free
+    gemini_helper.analysis_cache = analysis_cache.AnalysisCache(
+        os.path.join(work_dir, f"cache-{time.monotonic_ns()}.db"))
+    backend = llm_backends.get_backend('job_match')
+    backend.calls.clear()
+    call_latencies = []
+
+    def timed(fn):
+        def wrapper(*a, **kw):
+            started = time.perf_counter()
+            try:
+                return fn(*a, **kw)
+            finally:
+                call_latencies.append(time.perf_counter() - started)
+        return wrapper
+
+    original_detail = gemini_helper.get_job_match_analysis
+    original_batch = gemini_helper.get_recruiter_match_scores_batch
+    gemini_helper.get_job_match_analysis = timed(original_detail)
+    gemini_helper.get_recruiter_match_scores_batch = timed(original_batch)
+
+    tracemalloc.start()
+    stages = {}
+    started = time.perf_counter()
+    try:
+        # The helpers log every compaction and cache miss; keep the report readable
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            stage_started = time.perf_counter()
+            shortlist = build_shortlist(
+                args.jd, resume_dir, top_k=args.shortlist, min_score_ratio=args.min_score_ratio,
+                apply_requirements=not args.no_requirements, method=args.shortlist_method,
+                lexical_index=lexical_index, corpus_store=corpus_store,
+                profile_store=ProfileStore(db_path), embedding_index=embedding_index)
+            stages['shortlist_s'] = time.perf_counter() - stage_started
+
+            stage_started = time.perf_counter()
+            ranking = score_resumes(shortlist.resumes, args.jd, batched=batched, max_workers=args.workers,
+                                    timeout=args.timeout, max_retries=args.retries)
+            stages['scoring_s'] = time.perf_counter() - stage_started
+    finally:
+        gemini_helper.get_job_match_analysis = original_detail
+        gemini_helper.get_recruiter_match_scores_batch = original_batch
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    elapsed = time.perf_counter() - started
+
+    reference = exhaustive_top(resume_dir, args.jd)
+    found = {name for _, name in ranking[:len(reference)]}
+    return {
+        'mode': 'batched' if batched else 'detailed',
+        'shortlisted': len(shortlist.resumes),
+        'qualified': shortlist.qualified,
+        'elapsed_s': round(elapsed, 3),
+        **{key: round(value, 3) for key, value in stages.items()},
+        'resumes_per_sec': round(shortlist.corpus_size / elapsed, 1) if elapsed else None,
+        'scored_per_sec': round(len(ranking) / stages['scoring_s'], 1) if stages['scoring_s'] else None,
+        'call_p50_ms': round(_percentile(call_latencies, 0.5) * 1000, 1) if call_latencies else None,
+        'call_p99_ms': round(_percentile(call_latencies, 0.99) * 1000, 1) if call_latencies else None,
+        'peak_memory_mb': round(peak / 1e6, 1),
+        'model_calls': dict(backend.calls),
+        'model_calls_total': sum(backend.calls.values()),
+        'recall_at_10': round(len(found & reference) / len(reference), 3) if reference else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Recruiter ranking pipeline against a stub model.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000], help="corpus sizes to synthesize")
+    parser.add_argument('--mode', choices=['detailed', 'batched', 'both'], default='both')
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per stub model call")
+    parser.add_argument('--workers', type=int, default=8, help="parallel scoring calls")
+    parser.add_argument('--rpm', type=float, default=None, help="requests-per-minute quota for the stub model")
+    parser.add_argument('--tpm', type=float, default=None, help="tokens-per-minute quota for the stub model")
+    parser.add_argument('--timeout', type=float, default=90)
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--shortlist', type=int, default=20, help="shortlist size sent to the model (0 = all)")
+    parser.add_argument('--shortlist-method', choices=SHORTLIST_METHODS, default='keyword',
+                        help="pre-rank by BM25 keywords or local embeddings")
+    parser.add_argument('--min-score-ratio', type=float, default=0.0)
+    parser.add_argument('--no-requirements', action='store_true', help="skip the hard-requirement filter")
+    parser.add_argument('--jd', default=DEFAULT_JD, help="job description text, or @path to read it from a file")
+    parser.add_argument('--keep', action='store_true', help="keep the temporary corpora and databases")
+    parser.add_argument('--json', help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+    if args.jd.startswith('@'):
+        with open(args.jd[1:], 'r', encoding='utf-8') as f:
+            args.jd = f.read()
+
+    BenchBackend.latency_seconds = args.latency
+    BenchBackend.requests_per_minute = args.rpm
+    BenchBackend.tokens_per_minute = args.tpm
+    llm_backends.register_backend('bench', BenchBackend)
+    os.environ['LLM_BACKEND'] = 'bench'
+    modes = [False, True] if args.mode == 'both' else [args.mode == 'batched']
+
+    work_dir = tempfile.mkdtemp(prefix='bench-ranking-')
+    results = {'settings': {key: value for key, value in vars(args).items() if key not in ('keep', 'json')},
+               'runs': []}
+    try:
+        for size in args.sizes:
+            resume_dir = os.path.join(work_dir, f"corpus-{size}")
+            started = time.perf_counter()
+            synthesize_corpus(resume_dir, size)
+            print(f"\nCorpus of {size} resumes ({time.perf_counter() - started:.1f}s to generate)")
+            for batched in modes:
+                run_id = f"{size}-{'batched' if batched else 'detailed'}"
+                lexical_index = LexicalIndex(os.path.join(work_dir, f"index-{run_id}.json"))
+                # Always the hashing embedder, so results don't depend on an installed model
+                embedding_index = EmbeddingIndex(os.path.join(work_dir, f"embeddings-{run_id}"), HashingEmbedder())
+                corpus_store = CorpusStore(os.path.join(work_dir, f"corpus-store-{run_id}"))
+                db_path = os.path.join(work_dir, f"bench-{run_id}.db")
+                for phase in ('cold', 'warm'):
+                    run = {'corpus_size': size, 'phase': phase,
+                           **run_once(work_dir, resume_dir, args, batched, lexical_index, embedding_index, corpus_store, db_path)}
+                    results['runs'].append(run)
+                    _print_run(run)
+    finally:
+        if args.keep:
+            print(f"\nKept {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+def _print_run(run):
+    print(f"  {run['mode']:9s}{run['phase']:5s} {run['elapsed_s']:8.2f}s  {run['resumes_per_sec']:9.1f} resumes/s  "
+          f"call p50 {run['call_p50_ms']} ms / p99 {run['call_p99_ms']} ms  "
+          f"peak {run['peak_memory_mb']} MB  {run['model_calls_total']} model calls  "
+          f"recall@10 {run['recall_at_10']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Cold-start import benchmark for the Streamlit app.
+
+    python benchmarks/bench_startup.py                 # table on stdout
+    python benchmarks/bench_startup.py --json out.json # also save the numbers
+
+Every module App.py imports at the top level, plus the heavy libraries that pages
+load lazily, is imported in a fresh interpreter with `python -X importtime`. The
+cumulative import time of each one is reported, so a cold-start regression (say,
+a heavy library creeping back into the top-level imports) shows up as a number.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on demand by individual pages; measured so their cost stays visible
+LAZY_MODULES = [
+    'pandas',
+    'numpy',
+    'plotly.express',
+    'pdfminer3.converter',
+    'google.generativeai',
+    'geopy.geocoders',
+    'geocoder',
+    'nltk',
+    'lexical_index',
+    'resume_parser',
+    'pypdfium2',
+]
+
+
+def top_level_imports(path):
+    """
+    Modules imported at module level (not inside functions) by a source file.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def measure(module):
+    """
+    Cumulative import time of `module` in microseconds, or None if it can't be imported.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=APP_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    # Lines look like: "import time:  self [us] | cumulative | imported package"
+    for line in reversed(proc.stderr.splitlines()):
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report import time per module for App.py's cold start.")
+    parser.add_argument('--json', help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    eager = top_level_imports(os.path.join(APP_DIR, 'App.py'))
+    results = {'eager': {}, 'lazy': {}}
+    for group, modules in (('eager', eager), ('lazy', LAZY_MODULES)):
+        for module in modules:
+            results[group][module] = measure(module)
+
+    for group, title in (('eager', "Imported at App.py startup"), ('lazy', "Imported on demand by pages")):
+        print(f"\n{title}:")
+        for module, micros in sorted(results[group].items(), key=lambda item: -(item[1] or 0)):
+            shown = f"{micros / 1000:9.1f} ms" if micros is not None else "  not installed"
+            print(f"  {module:28s}{shown}")
+    eager_total = sum(micros or 0 for micros in results['eager'].values())
+    # Modules share dependencies, so this sum is an upper bound on the real cold start
+    print(f"\nSum of startup imports (upper bound): {eager_total / 1000:.1f} ms")
+    results['eager_total_ms'] = eager_total / 1000
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
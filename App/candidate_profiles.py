@@ -0,0 +1,456 @@
+import datetime
+import json
+import re
+import threading
+import time
+
+from db import DB_PATH, get_connection, get_writer
+
+# --- Profile Extraction Rules ---
+
+# Bump when the rules below change so existing profiles are rebuilt
+PROFILE_VERSION = "2"
+
+# Canonical skill -> spellings found in resumes and job descriptions
+SKILL_ALIASES = {
+    'python': ['python'],
+    'java': ['java'],
+    'javascript': ['javascript', 'js', 'ecmascript'],
+    'typescript': ['typescript'],
+    'c++': ['c++', 'cpp'],
+    'c#': ['c#'],
+    'go': ['golang'],
+    'ruby': ['ruby'],
+    'php': ['php'],
+    'scala': ['scala'],
+    'kotlin': ['kotlin'],
+    'swift': ['swift'],
+    'sql': ['sql', 't-sql', 'pl/sql'],
+    'mysql': ['mysql'],
+    'postgresql': ['postgresql', 'postgres'],
+    'mongodb': ['mongodb', 'mongo'],
+    'aws': ['aws', 'amazon web services'],
+    'azure': ['azure'],
+    'gcp': ['gcp', 'google cloud'],
+    'docker': ['docker'],
+    'kubernetes': ['kubernetes', 'k8s'],
+    'terraform': ['terraform'],
+    'ansible': ['ansible'],
+    'jenkins': ['jenkins'],
+    'git': ['git', 'github', 'gitlab'],
+    'linux': ['linux', 'unix'],
+    'devops': ['devops'],
+    'ci/cd': ['ci/cd', 'cicd', 'continuous integration'],
+    'react': ['react', 'react.js', 'reactjs'],
+    'angular': ['angular', 'angularjs'],
+    'vue': ['vue', 'vue.js', 'vuejs'],
+    'node.js': ['node.js', 'nodejs'],
+    'django': ['django'],
+    'flask': ['flask'],
+    'spring': ['spring', 'spring boot'],
+    'html': ['html', 'html5'],
+    'css': ['css', 'css3'],
+    'rest api': ['rest api', 'rest apis', 'restful'],
+    'graphql': ['graphql'],
+    'machine learning': ['machine learning', 'ml'],
+    'deep learning': ['deep learning'],
+    'nlp': ['nlp', 'natural language processing'],
+    'computer vision': ['computer vision', 'opencv'],
+    'tensorflow': ['tensorflow'],
+    'pytorch': ['pytorch'],
+    'scikit-learn': ['scikit-learn', 'sklearn'],
+    'pandas': ['pandas'],
+    'numpy': ['numpy'],
+    'spark': ['spark', 'pyspark', 'apache spark'],
+    'hadoop': ['hadoop'],
+    'kafka': ['kafka'],
+    'airflow': ['airflow'],
+    'tableau': ['tableau'],
+    'power bi': ['power bi', 'powerbi'],
+    'excel': ['excel'],
+    'selenium': ['selenium'],
+    'agile': ['agile', 'scrum'],
+}
+_ALIAS_TO_SKILL = {alias: skill for skill, aliases in SKILL_ALIASES.items() for alias in aliases}
+# Longest spellings first so 'spring boot' wins over 'spring' (and 'pl/sql' over 'sql');
+# a slash may separate two skills, as in 'java/scala'
+SKILL_PATTERN = re.compile(
+    r"(?<![a-z0-9+#.])(" + "|".join(re.escape(alias) for alias in sorted(_ALIAS_TO_SKILL, key=len, reverse=True))
+    + r")(?![a-z0-9+#])")
+
+TITLE_PATTERN = re.compile(
+    r"\b((?:senior|sr\.?|junior|jr\.?|lead|principal|staff|associate)\s+)?"
+    r"(software|data|devops|cloud|machine learning|ml|backend|back-end|frontend|front-end|full[- ]?stack|web"
+    r"|mobile|android|ios|qa|test|site reliability|security|network|systems?|database|business|product|project"
+    r"|engineering)\s+(engineer|developer|scientist|analyst|architect|administrator|manager|intern)s?\b")
+
+# Ordered from least to most senior
+SENIORITY_LEVELS = ('intern', 'junior', 'mid', 'senior', 'lead')
+_TITLE_SENIORITY = [
+    (re.compile(r"\b(principal|staff|lead|head|architect|manager|director)\b"), 'lead'),
+    (re.compile(r"\b(senior|sr\.?)\s"), 'senior'),
+    (re.compile(r"\b(junior|jr\.?|associate)\s"), 'junior'),
+]
+
+EDUCATION_LEVELS = {'none': 0, 'diploma': 1, 'bachelor': 2, 'master': 3, 'phd': 4}
+_EDUCATION_PATTERNS = [
+    ('phd', re.compile(r"\b(ph\.?\s?d|doctorate|doctor of philosophy)\b")),
+    ('master', re.compile(r"\b(master'?s?|m\.\s?tech|mtech|mba|m\.\s?sc|msc|m\.s\.|m\.e\.|mca)\b")),
+    ('bachelor', re.compile(r"\b(bachelor'?s?|b\.\s?tech|btech|b\.e\.|b\.\s?sc|bsc|b\.s\.|b\.a\.|bca|undergraduate)\b")),
+    ('diploma', re.compile(r"\b(diploma|associate degree)\b")),
+]
+# Lines near a date range that mark it as study time rather than work experience
+_EDUCATION_CONTEXT = re.compile(r"\b(university|college|school|institute|vidyapeetham|cgpa|gpa|degree|courses?)\b"
+                                r"|" + "|".join(p.pattern for _, p in _EDUCATION_PATTERNS))
+
+_MONTHS = {m: i for i, m in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1)}
+_MONTH = r"(?:(?P<{0}m>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s*'?|(?P<{0}n>\d{{1,2}})\s*/\s*)?"
+DATE_RANGE_PATTERN = re.compile(
+    _MONTH.format('s') + r"(?P<sy>(?:19|20)\d{2})\s*(?:-|–|—|to|until)\s*"
+    r"(?:" + _MONTH.format('e') + r"(?P<ey>(?:19|20)\d{2})|(?P<now>present|current|now|till date|today|ongoing))")
+# "5+ years", "3-5 years", "2.5 yrs"
+YEARS_PATTERN = re.compile(r"(\d{1,2}(?:\.\d)?)\s*(?:\+|-\s*\d{1,2}\s*\+?)?\s*(?:years?|yrs?)\b")
+_REQUIRED_MARKERS = re.compile(r"\b(required|requires|must|mandatory|minimum|at least|essential)\b")
+_OPTIONAL_MARKERS = re.compile(r"\b(nice to have|preferred|a plus|bonus|desirable|good to have)\b")
+# Text allowed between two skills of one list: "python, java", "react/vue", "aws or gcp", "sql and/or nosql"
+_LIST_SEPARATOR = re.compile(r"^(?:[\s,/&]|\band\b|\bor\b)*$")
+_ALTERNATIVE_SEPARATOR = re.compile(r"\bor\b")
+
+
+def extract_skills(text):
+    """
+    Canonical skills mentioned in `text`, e.g. {'python', 'kubernetes'}.
+    """
+    return {_ALIAS_TO_SKILL[match] for match in SKILL_PATTERN.findall(text.lower())}
+
+
+def _month_index(year, month=None, numeric=None):
+    if month:
+        number = _MONTHS[month]
+    elif numeric and 1 <= int(numeric) <= 12:
+        number = int(numeric)
+    else:
+        number = 1
+    return int(year) * 12 + number - 1
+
+
+def _work_intervals(lines):
+    # (start, end) month indexes of date ranges that don't sit next to education details
+    today = datetime.date.today()
+    now = today.year * 12 + today.month - 1
+    intervals = []
+    for i, line in enumerate(lines):
+        for match in DATE_RANGE_PATTERN.finditer(line):
+            context = ' '.join(lines[max(0, i - 4):i + 1])
+            if _EDUCATION_CONTEXT.search(context):
+                continue
+            start = _month_index(match.group('sy'), match.group('sm'), match.group('sn'))
+            end = now if match.group('now') else _month_index(match.group('ey'), match.group('em'), match.group('en'))
+            if start <= end <= now:
+                intervals.append((start, end))
+    return intervals
+
+
+def _merged_months(intervals):
+    total, current = 0, None
+    for start, end in sorted(intervals):
+        if current is None or start > current[1]:
+            if current is not None:
+                total += current[1] - current[0]
+            current = [start, end]
+        else:
+            current[1] = max(current[1], end)
+    if current is not None:
+        total += current[1] - current[0]
+    return total
+
+
+def _skill_groups(text):
+    """
+    Splits the skills named in `text` into groups of which each must be met; a
+    group of several skills is met by any one of them. "java/scala" and a list
+    joined by "or" ("python, java or go") are one group each, while skills
+    listed with commas or "and" form a group each.
+    """
+    # Skills joined by a slash are alternatives before any list is considered
+    atoms, previous = [], None
+    for match in SKILL_PATTERN.finditer(text):
+        skill = _ALIAS_TO_SKILL[match.group(1)]
+        gap = text[previous.end():match.start()] if previous is not None else None
+        if gap is not None and gap.strip() == '/':
+            atoms[-1][0].add(skill)
+        else:
+            atoms.append(({skill}, gap))
+        previous = match
+
+    groups, chain, alternatives = [], [], False
+    for skills, gap in atoms:
+        if gap is not None and _LIST_SEPARATOR.match(gap) and not re.search(r"\band\b|&", gap.replace('and/or', 'or')):
+            chain.append(skills)
+            alternatives = alternatives or bool(_ALTERNATIVE_SEPARATOR.search(gap))
+            continue
+        groups += [set().union(*chain)] if alternatives else chain
+        chain, alternatives = [skills], False
+    groups += [set().union(*chain)] if alternatives else chain
+    return groups
+
+
+def _year_clauses(text):
+    # (years, clause) for each 'N+ years' figure: the clause is the text right after the number
+    for match in YEARS_PATTERN.finditer(text):
+        yield float(match.group(1)), re.split(r"[.;\n•◦]", text[match.end():match.end() + 80])[0]
+
+
+def _explicit_years(text):
+    """
+    Years stated outright, e.g. '5+ years of experience in Python'. Returns
+    `(overall_years, {skill: years})`; the skills are those named in the same
+    clause right after the number.
+    """
+    overall, per_skill = 0.0, {}
+    for years, clause in _year_clauses(text):
+        skills = extract_skills(clause)
+        for skill in skills:
+            per_skill[skill] = max(per_skill.get(skill, 0.0), years)
+        if not skills and 'experience' in clause:
+            overall = max(overall, years)
+    return overall, per_skill
+
+
+def _seniority(titles, years):
+    if years < 2:
+        level = 'junior'
+    elif years < 5:
+        level = 'mid'
+    elif years < 8:
+        level = 'senior'
+    else:
+        level = 'lead'
+    for title in titles:
+        for pattern, title_level in _TITLE_SENIORITY:
+            if pattern.search(title + ' '):
+                if SENIORITY_LEVELS.index(title_level) > SENIORITY_LEVELS.index(level):
+                    level = title_level
+                break
+    if titles and all(title.endswith('intern') for title in titles) and years < 1:
+        level = 'intern'
+    return level
+
+
+def extract_profile(text):
+    """
+    Rule-based structured profile of a resume: normalized skills with years of
+    use, job titles, total years of experience, highest education and seniority.
+    """
+    lowered = text.lower()
+    lines = [line.strip() for line in lowered.splitlines() if line.strip()]
+    stated_years, stated_skill_years = _explicit_years(lowered)
+    years = round(max(_merged_months(_work_intervals(lines)) / 12, stated_years), 1)
+
+    # A skill without stated years is assumed to span the whole career; this is a
+    # recall-first pre-filter, the model still judges the shortlist
+    skills = {skill: max(stated_skill_years.get(skill, 0.0), years) for skill in extract_skills(lowered)}
+
+    titles = sorted({re.sub(r"\s+", " ", match.group(0)) for match in TITLE_PATTERN.finditer(lowered)})
+    education = 'none'
+    for level, pattern in _EDUCATION_PATTERNS:
+        if pattern.search(lowered):
+            education = level
+            break
+    return {
+        'skills': skills,
+        'titles': titles,
+        'years_experience': years,
+        'education': education,
+        'seniority': _seniority(titles, years),
+    }
+
+
+# --- Hard Requirements ---
+
+class Requirements:
+    """
+    Hard requirements parsed from a job description: minimum total years, minimum
+    years per skill (0 = the skill just has to be present), groups of alternative
+    skills of which any one will do (a sorted tuple of skills -> minimum years)
+    and minimum education.
+    """
+
+    def __init__(self, min_years=0.0, skills=None, education='none', any_of=None):
+        self.min_years = min_years
+        self.skills = dict(skills or {})
+        self.any_of = dict(any_of or {})
+        self.education = education
+
+    def __bool__(self):
+        return bool(self.min_years or self.skills or self.any_of or EDUCATION_LEVELS[self.education])
+
+    def require(self, skills, years=0.0):
+        """
+        Adds a skill requirement; with several `skills`, any one of them meets it.
+        """
+        if len(skills) == 1:
+            skill, = skills
+            self.skills[skill] = max(self.skills.get(skill, 0.0), years)
+        else:
+            key = tuple(sorted(skills))
+            self.any_of[key] = max(self.any_of.get(key, 0.0), years)
+
+    def describe(self):
+        parts = []
+        if self.min_years:
+            parts.append(f"{self.min_years:g}+ years of experience")
+        for skill, years in sorted(self.skills.items()):
+            parts.append(f"{years:g}+ years {skill}" if years else skill)
+        for skills, years in sorted(self.any_of.items()):
+            parts.append(f"{years:g}+ years {' or '.join(skills)}" if years else ' or '.join(skills))
+        if EDUCATION_LEVELS[self.education]:
+            parts.append(f"{self.education} degree or higher")
+        return parts
+
+
+def parse_requirements(job_description):
+    """
+    Picks out the requirements a job description states as hard ones: any
+    'N+ years' figure, plus skills and degrees on lines marked as required or
+    mandatory. Lines marked as nice-to-have or preferred are ignored. Skills
+    offered as alternatives ("python or java", "aws/gcp") are met by any one of
+    them, and so are degrees ("bachelor's or master's" needs a bachelor's).
+    """
+    requirements = Requirements()
+    for line in job_description.lower().splitlines():
+        if _OPTIONAL_MARKERS.search(line):
+            continue
+        for years, clause in _year_clauses(line):
+            groups = _skill_groups(clause)
+            for skills in groups:
+                requirements.require(skills, years)
+            if not groups and 'experience' in clause:
+                requirements.min_years = max(requirements.min_years, years)
+        if _REQUIRED_MARKERS.search(line):
+            for skills in _skill_groups(line):
+                requirements.require(skills)
+            levels = [level for level, pattern in _EDUCATION_PATTERNS if pattern.search(line)]
+            if levels:
+                level = min(levels, key=EDUCATION_LEVELS.get)
+                if EDUCATION_LEVELS[level] > EDUCATION_LEVELS[requirements.education]:
+                    requirements.education = level
+    return requirements
+
+
+# --- Profile Store ---
+
+class ProfileStore:
+    """
+    Candidate profiles in cv.db, keyed by candidate id (the .txt file name).
+    Skills live in their own indexed table so hard requirements become a single
+    SQL query instead of a model call per resume.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+
+    def _connect(self):
+        return get_connection(self.db_path)
+
+    def put(self, txt_name, digest, text, wait=True, pending=None):
+        """
+        Extracts and stores the profile for one resume. Returns the profile dict.
+        With wait=False the writes are only queued; they are appended to the
+        `pending` list, if given, so their `.error` can be checked once flushed.
+        """
+        profile = extract_profile(text)
+        writer = get_writer(self.db_path)
+        writes = [writer.submit('DELETE FROM candidate_skills WHERE txt_name = ?', (txt_name,), wait=False)]
+        for skill, years in profile['skills'].items():
+            writes.append(writer.submit('INSERT INTO candidate_skills (skill, txt_name, years) VALUES (?, ?, ?)',
+                                        (skill, txt_name, years), wait=False))
+        writes.append(writer.submit("""
+            INSERT OR REPLACE INTO candidate_profiles
+                (txt_name, content_hash, profile_version, years_experience, education_level,
+                 seniority, titles_json, profile_json, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (txt_name, digest, PROFILE_VERSION, profile['years_experience'],
+              EDUCATION_LEVELS[profile['education']], profile['seniority'],
+              json.dumps(profile['titles']), json.dumps(profile), time.time()), wait=wait))
+        if pending is not None:
+            pending.extend(writes)
+        return profile
+
+    def delete(self, txt_name, wait=True):
+        """
+        Drops the profile and skills stored for one candidate. Returns the queued writes.
+        """
+        writer = get_writer(self.db_path)
+        return [writer.submit('DELETE FROM candidate_skills WHERE txt_name = ?', (txt_name,), wait=False),
+                writer.submit('DELETE FROM candidate_profiles WHERE txt_name = ?', (txt_name,), wait=wait)]
+
+    def get(self, txt_name):
+        row = self._connect().execute('SELECT profile_json FROM candidate_profiles WHERE txt_name = ?',
+                                      (txt_name,)).fetchone()
+        return json.loads(row['profile_json']) if row is not None else None
+
+    def missing(self, txt_names):
+        """
+        The candidate ids among `txt_names` with no profile from the current rules.
+        """
+        current = {row['txt_name'] for row in self._connect().execute(
+            'SELECT txt_name FROM candidate_profiles WHERE profile_version = ?', (PROFILE_VERSION,))}
+        return [txt_name for txt_name in txt_names if txt_name not in current]
+
+    def ensure(self, txt_names, read_text):
+        """
+        Builds profiles for any of `txt_names` that don't have one yet (resumes
+        added before profiles existed). `read_text(txt_name)` supplies the text.
+        Returns how many were built.
+        """
+        built = 0
+        for txt_name in self.missing(txt_names):
+            try:
+                self.put(txt_name, None, read_text(txt_name), wait=False)
+                built += 1
+            except Exception as e:
+                print(f"Could not build a profile for {txt_name}: {e}")
+        if built:
+            get_writer(self.db_path).flush()
+        return built
+
+    def filter(self, requirements):
+        """
+        Candidate ids that meet every hard requirement.
+        """
+        sql = 'SELECT txt_name FROM candidate_profiles WHERE years_experience >= ? AND education_level >= ?'
+        params = [requirements.min_years, EDUCATION_LEVELS[requirements.education]]
+        for skill, years in sorted(requirements.skills.items()):
+            sql += ' AND txt_name IN (SELECT txt_name FROM candidate_skills WHERE skill = ? AND years >= ?)'
+            params += [skill, years]
+        for skills, years in sorted(requirements.any_of.items()):
+            sql += (f' AND txt_name IN (SELECT txt_name FROM candidate_skills'
+                    f' WHERE skill IN ({", ".join("?" * len(skills))}) AND years >= ?)')
+            params += [*skills, years]
+        return {row['txt_name'] for row in self._connect().execute(sql, params)}
+
+    def skill_overlap(self, skills):
+        """
+        Pre-score: how many of `skills` each candidate has, for candidates with at least one.
+        """
+        skills = sorted(skills)
+        if not skills:
+            return {}
+        rows = self._connect().execute(
+            f"SELECT txt_name, COUNT(*) AS matched FROM candidate_skills "
+            f"WHERE skill IN ({', '.join('?' * len(skills))}) GROUP BY txt_name", skills)
+        return {row['txt_name']: row['matched'] for row in rows}
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_profile_store():
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ProfileStore()
+        return _default_store
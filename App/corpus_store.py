@@ -0,0 +1,271 @@
+import glob
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+# --- Store Defaults ---
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_DIR = os.path.join(APP_DIR, 'corpus_store')
+
+# One fixed-width record per document version. Text and names live in separate
+# append-only blobs; a record points at its bytes with (offset, length).
+DOC_DTYPE = np.dtype([
+    ('name_offset', '<i8'),
+    ('name_length', '<i4'),
+    ('deleted', '?'),
+    ('text_offset', '<i8'),
+    ('text_length', '<i8'),
+    ('content_hash', 'S32'),
+    ('mtime', '<f8'),
+    ('added_at', '<f8'),
+])
+
+
+def _digest(data):
+    return hashlib.sha256(data).digest()
+
+
+class CorpusStore:
+    """
+    Append-only columnar store of the Recruiter corpus: resume text in one blob
+    (text.bin) and one fixed-width record per document version (docs.bin), both
+    read through memory maps. Nothing is rewritten in place: a changed resume
+    gets a new record and text, a removed one a tombstone, and the newest
+    record per name wins. Scores are kept in cv.db by ranking_store.py; the
+    content hashes here tell it which of them still match the current text.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        self.docs_path = os.path.join(store_dir, 'docs.bin')
+        self.text_path = os.path.join(store_dir, 'text.bin')
+        self.names_path = os.path.join(store_dir, 'names.bin')
+        self._lock = threading.RLock()
+        self._loaded_rows = 0
+        self._records = np.zeros(0, dtype=DOC_DTYPE)
+        self._text = None
+        self.rows = {}       # name -> row of its current version
+        self.names = []      # row -> name
+        self.live = np.zeros(0, dtype=bool)
+        self.refresh()
+
+    # --- Loading ---
+
+    def _lock_file(self):
+        # Serializes appends across processes (the app and ranking_jobs.py workers)
+        os.makedirs(self.store_dir, exist_ok=True)
+        handle = open(os.path.join(self.store_dir, '.lock'), 'a+b')
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def refresh(self):
+        """
+        Picks up records appended since the last load, including by other processes.
+        """
+        with self._lock:
+            size = os.path.getsize(self.docs_path) if os.path.exists(self.docs_path) else 0
+            # A record still being written by another process is left for the next refresh
+            row_count = size // DOC_DTYPE.itemsize
+            if row_count == self._loaded_rows:
+                return
+            if row_count < self._loaded_rows:
+                self.rows, self.names, self._loaded_rows = {}, [], 0
+            self._records = np.memmap(self.docs_path, dtype=DOC_DTYPE, mode='r', shape=(row_count,))
+            self._text = None
+            new = self._records[self._loaded_rows:row_count]
+            with open(self.names_path, 'rb') as f:
+                f.seek(int(new['name_offset'][0]))
+                blob = f.read()
+            base = int(new['name_offset'][0])
+            for row, record in enumerate(new, start=self._loaded_rows):
+                start = int(record['name_offset']) - base
+                name = blob[start:start + int(record['name_length'])].decode('utf-8')
+                self.names.append(name)
+                if record['deleted']:
+                    self.rows.pop(name, None)
+                else:
+                    self.rows[name] = row
+            self._loaded_rows = row_count
+            self.live = np.zeros(row_count, dtype=bool)
+            self.live[list(self.rows.values())] = True
+
+    def _text_view(self):
+        if self._text is None and os.path.exists(self.text_path) and os.path.getsize(self.text_path):
+            self._text = np.memmap(self.text_path, dtype=np.uint8, mode='r')
+        return self._text
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    # --- Reading ---
+
+    def text(self, name):
+        """
+        Current text of a document, decoded straight from the memory-mapped blob.
+        """
+        self.refresh()
+        with self._lock:
+            record = self._records[self.rows[name]]
+            text_view = self._text_view()
+        start, length = int(record['text_offset']), int(record['text_length'])
+        return bytes(text_view[start:start + length]).decode('utf-8') if length else ''
+
+    def texts(self, names):
+        """
+        `(name, text)` pairs for the names that are in the store, in the given order.
+        """
+        return [(name, self.text(name)) for name in names if name in self.rows]
+
+    def columns(self, names):
+        """
+        Metadata columns (NumPy arrays) for the current versions of `names`.
+        """
+        self.refresh()
+        with self._lock:
+            records = self._records[[self.rows[name] for name in names]]
+        return {
+            'text_length': records['text_length'],
+            'content_hash': [bytes(value).hex() for value in records['content_hash']],
+            'mtime': records['mtime'],
+            'added_at': records['added_at'],
+        }
+
+    def content_hashes(self):
+        """
+        `{name: content_hash}` for every current document. The hash is the SHA-256
+        of the stored text's UTF-8 bytes, the same as ranking_store.text_hash.
+        """
+        self.refresh()
+        with self._lock:
+            records = self._records
+            return {name: bytes(records[row]['content_hash']).hex() for name, row in self.rows.items()}
+
+    # --- Writing ---
+
+    def _append(self, entries):
+        # entries: [(name, text_bytes or None, digest, mtime, deleted)]; None text reuses the current blob range
+        with self._lock:
+            handle = self._lock_file()
+            try:
+                self.refresh()
+                text_end = os.path.getsize(self.text_path) if os.path.exists(self.text_path) else 0
+                names_end = os.path.getsize(self.names_path) if os.path.exists(self.names_path) else 0
+                records = np.zeros(len(entries), dtype=DOC_DTYPE)
+                text_parts, name_parts = [], []
+                for record, (name, data, digest, mtime, deleted) in zip(records, entries):
+                    encoded_name = name.encode('utf-8')
+                    record['name_offset'], record['name_length'] = names_end, len(encoded_name)
+                    names_end += len(encoded_name)
+                    name_parts.append(encoded_name)
+                    if data is None and name in self.rows:
+                        current = self._records[self.rows[name]]
+                        record['text_offset'], record['text_length'] = current['text_offset'], current['text_length']
+                    elif data is not None:
+                        record['text_offset'], record['text_length'] = text_end, len(data)
+                        text_end += len(data)
+                        text_parts.append(data)
+                    record['content_hash'] = digest or b''
+                    record['mtime'] = mtime or 0.0
+                    record['added_at'] = time.time()
+                    record['deleted'] = deleted
+                # Text and names first: a record is only visible once its bytes are on disk
+                with open(self.text_path, 'ab') as f:
+                    f.write(b''.join(text_parts))
+                with open(self.names_path, 'ab') as f:
+                    f.write(b''.join(name_parts))
+                with open(self.docs_path, 'ab') as f:
+                    f.write(records.tobytes())
+                self.refresh()
+            finally:
+                handle.close()
+
+    def put(self, name, text, mtime=None):
+        """
+        Adds or replaces a document. Unchanged text only gets a new record, not a copy.
+        """
+        self.refresh()
+        data = text.encode('utf-8')
+        digest = _digest(data)
+        current = self.rows.get(name)
+        if current is not None and bytes(self._records[current]['content_hash']) == digest:
+            if float(self._records[current]['mtime']) == (mtime or 0.0):
+                return
+            data = None
+        self._append([(name, data, digest, mtime, False)])
+
+    def remove(self, name):
+        if name in self.rows:
+            self._append([(name, None, None, None, True)])
+
+    def sync_directory(self, resume_dir):
+        """
+        Brings the store in line with the .txt files in `resume_dir`, reading only
+        files that are new or modified since they were stored. Returns how many
+        documents changed.
+        """
+        self.refresh()
+        on_disk = {os.path.basename(path): path for path in glob.glob(os.path.join(resume_dir, '*.txt'))}
+        entries = [(name, None, None, None, True) for name in self.rows if name not in on_disk]
+        for name, path in on_disk.items():
+            mtime = os.path.getmtime(path)
+            row = self.rows.get(name)
+            if row is not None and float(self._records[row]['mtime']) == mtime:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                data.decode('utf-8')
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Could not store {path}: {e}")
+                continue
+            digest = _digest(data)
+            same_text = row is not None and bytes(self._records[row]['content_hash']) == digest
+            entries.append((name, None if same_text else data, digest, mtime, False))
+        if entries:
+            self._append(entries)
+        return len(entries)
+
+    def export_table(self, ranking):
+        """
+        Columns for a CSV of `(score, name)` pairs, in the given order, joined with
+        stored metadata. Names missing from the store get empty metadata.
+        """
+        stored = [name for _, name in ranking if name in self.rows]
+        columns = self.columns(stored) if stored else {}
+        position = {name: i for i, name in enumerate(stored)}
+        table = {'Rank': [], 'Candidate': [], 'Match %': [], 'Size (bytes)': [], 'Content Hash': [], 'Modified': []}
+        for rank, (score, name) in enumerate(ranking, start=1):
+            i = position.get(name)
+            table['Rank'].append(rank)
+            table['Candidate'].append(name)
+            table['Match %'].append(score)
+            table['Size (bytes)'].append(int(columns['text_length'][i]) if i is not None else None)
+            table['Content Hash'].append(columns['content_hash'][i] if i is not None else None)
+            table['Modified'].append(time.strftime('%Y-%m-%d %H:%M', time.localtime(columns['mtime'][i]))
+                                     if i is not None and columns['mtime'][i] else None)
+        return table
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_corpus_store():
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = CorpusStore()
+        return _default_store
@@ -0,0 +1,296 @@
+import os
+import queue
+import sqlite3
+import threading
+
+# --- Database Configuration ---
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cv.db')
+# Seconds a connection waits on a lock held by another writer before giving up
+BUSY_TIMEOUT = 30
+
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version).
+# Only ever append to this list; never edit a migration that has shipped.
+MIGRATIONS = [
+    # 1: feedback form
+    """
+    CREATE TABLE IF NOT EXISTS user_feedback (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        feed_name varchar(50) NOT NULL,
+        feed_email VARCHAR(50) NOT NULL,
+        feed_score VARCHAR(5) NOT NULL,
+        comments VARCHAR(100) NULL,
+        Timestamp VARCHAR(50) NOT NULL
+    );
+    """,
+    # 2: extracted resume text (see extraction_store.py)
+    """
+    CREATE TABLE IF NOT EXISTS resume_extractions (
+        content_hash TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        txt_name TEXT NOT NULL,
+        page_count INTEGER NOT NULL,
+        pages_json TEXT NOT NULL,
+        text TEXT NOT NULL,
+        extracted_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_resume_extractions_txt_name
+        ON resume_extractions (txt_name, extracted_at);
+    """,
+    # 3: per-stage timings (see stage_metrics.py)
+    """
+    CREATE TABLE IF NOT EXISTS stage_metrics (
+        ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id TEXT NOT NULL,
+        flow TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        duration_ms REAL NOT NULL,
+        success INTEGER NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_stage_metrics_flow_stage ON stage_metrics (flow, stage);
+    """,
+    # 4: feedback rating counts kept up to date by triggers (see feedback_analytics.py)
+    """
+    CREATE INDEX IF NOT EXISTS idx_user_feedback_score ON user_feedback (feed_score);
+    CREATE TABLE IF NOT EXISTS feedback_score_counts (
+        feed_score VARCHAR(5) PRIMARY KEY,
+        count INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS app_counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    INSERT OR REPLACE INTO feedback_score_counts (feed_score, count)
+        SELECT feed_score, COUNT(*) FROM user_feedback GROUP BY feed_score;
+    INSERT OR IGNORE INTO app_counters (name, value) VALUES ('feedback_version', 0);
+    CREATE TRIGGER IF NOT EXISTS trg_user_feedback_insert AFTER INSERT ON user_feedback
+    BEGIN
+        INSERT OR IGNORE INTO feedback_score_counts (feed_score, count) VALUES (NEW.feed_score, 0);
+        UPDATE feedback_score_counts SET count = count + 1 WHERE feed_score = NEW.feed_score;
+        UPDATE app_counters SET value = value + 1 WHERE name = 'feedback_version';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_user_feedback_delete AFTER DELETE ON user_feedback
+    BEGIN
+        UPDATE feedback_score_counts SET count = count - 1 WHERE feed_score = OLD.feed_score;
+        UPDATE app_counters SET value = value + 1 WHERE name = 'feedback_version';
+    END;
+    """,
+    # 5: structured candidate profiles (see candidate_profiles.py)
+    """
+    CREATE TABLE IF NOT EXISTS candidate_profiles (
+        txt_name TEXT PRIMARY KEY,
+        content_hash TEXT NULL,
+        profile_version TEXT NOT NULL,
+        years_experience REAL NOT NULL,
+        education_level INTEGER NOT NULL,
+        seniority TEXT NOT NULL,
+        titles_json TEXT NOT NULL,
+        profile_json TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_candidate_profiles_years
+        ON candidate_profiles (years_experience, education_level);
+    CREATE TABLE IF NOT EXISTS candidate_skills (
+        skill TEXT NOT NULL,
+        txt_name TEXT NOT NULL,
+        years REAL NOT NULL,
+        PRIMARY KEY (skill, txt_name)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_candidate_skills_years ON candidate_skills (skill, years, txt_name);
+    CREATE INDEX IF NOT EXISTS idx_candidate_skills_txt_name ON candidate_skills (txt_name);
+    """,
+    # 6: stored rankings per job description fingerprint (see ranking_store.py)
+    """
+    CREATE TABLE IF NOT EXISTS jd_rankings (
+        fingerprint TEXT PRIMARY KEY,
+        normalized_jd TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        run_count INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS jd_ranking_scores (
+        fingerprint TEXT NOT NULL,
+        txt_name TEXT NOT NULL,
+        text_hash TEXT NOT NULL,
+        score INTEGER NOT NULL,
+        scored_at REAL NOT NULL,
+        PRIMARY KEY (fingerprint, txt_name)
+    ) WITHOUT ROWID;
+    """,
+    # 7: background ranking jobs (see ranking_jobs.py)
+    """
+    CREATE TABLE IF NOT EXISTS ranking_jobs (
+        job_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        job_description TEXT NOT NULL,
+        settings_json TEXT NOT NULL,
+        owner TEXT NULL,
+        fingerprint TEXT NULL,
+        worker_id TEXT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NULL,
+        failed INTEGER NOT NULL DEFAULT 0,
+        error TEXT NULL,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        started_at REAL NULL,
+        heartbeat_at REAL NULL,
+        finished_at REAL NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_ranking_jobs_status ON ranking_jobs (status, created_at);
+    CREATE INDEX IF NOT EXISTS idx_ranking_jobs_created ON ranking_jobs (created_at);
+    CREATE TABLE IF NOT EXISTS ranking_job_results (
+        job_id TEXT NOT NULL,
+        txt_name TEXT NOT NULL,
+        score INTEGER NOT NULL,
+        reused INTEGER NOT NULL,
+        scored_at REAL NOT NULL,
+        PRIMARY KEY (job_id, txt_name)
+    ) WITHOUT ROWID;
+    """,
+    # 8: candidates a ranking job could not score, kept apart from real scores (see ranking_jobs.py)
+    """
+    CREATE TABLE IF NOT EXISTS ranking_job_failures (
+        job_id TEXT NOT NULL,
+        txt_name TEXT NOT NULL,
+        error TEXT NOT NULL,
+        failed_at REAL NOT NULL,
+        PRIMARY KEY (job_id, txt_name)
+    ) WITHOUT ROWID;
+    """,
+]
+
+_local = threading.local()
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def _open(db_path):
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    conn.row_factory = sqlite3.Row
+    # WAL lets readers carry on while a single writer commits
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def init_db(db_path=DB_PATH):
+    """
+    Applies any pending migrations. Runs once per database file per process;
+    later calls return immediately.
+    """
+    if db_path in _migrated:
+        return
+    with _migrate_lock:
+        if db_path in _migrated:
+            return
+        conn = _open(db_path)
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+                # executescript commits on its own, so bump the version in the same script
+                conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;")
+        finally:
+            conn.close()
+        _migrated.add(db_path)
+
+
+def get_connection(db_path=DB_PATH):
+    """
+    Connection for the calling thread. SQLite connections can't be shared between
+    threads, so each Streamlit script thread and worker thread gets its own.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        init_db(db_path)
+        conn = connections[db_path] = _open(db_path)
+    return conn
+
+
+# --- Batched Writes ---
+
+class _PendingWrite:
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.done = threading.Event()
+        self.error = None
+
+
+class BatchWriter:
+    """
+    Funnels inserts from every session through one background thread, which commits
+    whatever has queued up in a single transaction (group commit). Callers block only
+    until their own row is durable, and concurrent writers never fight over the lock.
+    """
+
+    def __init__(self, db_path=DB_PATH, max_batch=500):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name='cv-db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params, wait=True, timeout=BUSY_TIMEOUT):
+        """
+        Queues one write. With wait=True, blocks until it is committed and re-raises
+        any database error it caused.
+        """
+        pending = _PendingWrite(sql, params)
+        self._queue.put(pending)
+        if wait:
+            if not pending.done.wait(timeout):
+                raise TimeoutError("Timed out waiting for the database write to commit")
+            if pending.error is not None:
+                raise pending.error
+        return pending
+
+    def flush(self, timeout=BUSY_TIMEOUT):
+        """
+        Blocks until every write queued so far has been committed.
+        """
+        self.submit('SELECT 1', (), wait=True, timeout=timeout)
+
+    def _loop(self):
+        conn = get_connection(self.db_path)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    for pending in batch:
+                        conn.execute(pending.sql, pending.params)
+            except sqlite3.Error:
+                # Retry one by one so a single bad row doesn't fail its neighbours
+                for pending in batch:
+                    try:
+                        with conn:
+                            conn.execute(pending.sql, pending.params)
+                    except sqlite3.Error as e:
+                        pending.error = e
+            for pending in batch:
+                pending.done.set()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path=DB_PATH):
+    """
+    Process-wide BatchWriter for a database file.
+    """
+    with _writers_lock:
+        writer = _writers.get(db_path)
+        if writer is None:
+            init_db(db_path)
+            writer = _writers[db_path] = BatchWriter(db_path)
+        return writer
@@ -0,0 +1,428 @@
+import glob
+import json
+import os
+import threading
+import zlib
+
+import numpy as np
+
+from lexical_index import tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+# --- Index Defaults ---
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_DIR = os.path.join(APP_DIR, 'embedding_index')
+# Words per chunk and overlap between neighbouring chunks
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 30
+MAX_CHUNKS_PER_DOC = 16
+# Dimensions of the hashing embedder
+HASHING_DIM = 256
+# Rewrite the vector file once this share of its rows belongs to removed documents
+COMPACT_DEAD_RATIO = 0.3
+
+
+def chunk_text(text, words=CHUNK_WORDS, overlap=CHUNK_OVERLAP, max_chunks=MAX_CHUNKS_PER_DOC):
+    """
+    Splits text into overlapping windows of `words` words.
+    """
+    tokens = text.split()
+    if not tokens:
+        return []
+    step = max(words - overlap, 1)
+    chunks = []
+    for start in range(0, len(tokens), step):
+        chunks.append(' '.join(tokens[start:start + words]))
+        if start + words >= len(tokens) or len(chunks) == max_chunks:
+            break
+    return chunks
+
+
+# --- Embedders ---
+
+class HashingEmbedder:
+    """
+    CPU-only embedding without a model download: words, word pairs and character
+    4-grams hashed into a fixed number of signed dimensions, with skill aliases
+    (k8s, js, ML, ...) mapped to one spelling first. Character n-grams let
+    'deploying' and 'deployment' or 'PostgreSQL' and 'Postgres' land close together.
+    """
+
+    def __init__(self, dim=HASHING_DIM):
+        self.dim = dim
+        self._word_cache = {}
+
+    @property
+    def identity(self):
+        return f"hashing:{self.dim}:1"
+
+    @staticmethod
+    def _terms(text):
+        from candidate_profiles import _ALIAS_TO_SKILL
+        words = []
+        for token in tokenize(text):
+            words += _ALIAS_TO_SKILL.get(token, token).split()
+        return words
+
+    def _hash(self, feature, weight):
+        hashed = zlib.crc32(feature.encode('utf-8'))
+        return hashed % self.dim, (weight if hashed & 0x80000000 else -weight)
+
+    def _word_features(self, word):
+        # The word itself plus its character 4-grams; cached since vocabularies repeat a lot
+        cached = self._word_cache.get(word)
+        if cached is None:
+            features = [self._hash('w:' + word, 1.0)]
+            padded = f"<{word}>"
+            features += [self._hash('c:' + padded[j:j + 4], 0.25) for j in range(len(padded) - 3)]
+            cached = (tuple(index for index, _ in features), tuple(value for _, value in features))
+            if len(self._word_cache) > 200000:
+                self._word_cache.clear()
+            self._word_cache[word] = cached
+        return cached
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            indexes, values = [], []
+            words = self._terms(text)
+            for i, word in enumerate(words):
+                word_indexes, word_values = self._word_features(word)
+                indexes += word_indexes
+                values += word_values
+                if i:
+                    index, value = self._hash('b:' + words[i - 1] + ' ' + word, 0.5)
+                    indexes.append(index)
+                    values.append(value)
+            if indexes:
+                matrix[row] = np.bincount(indexes, weights=values, minlength=self.dim)
+        # Signed square root damps terms repeated many times, then unit length for cosine
+        matrix = np.sign(matrix) * np.sqrt(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+
+class SentenceTransformerEmbedder:
+    """
+    A local sentence-transformers model (e.g. all-MiniLM-L6-v2), run on the CPU.
+    Used when EMBEDDING_MODEL is set and the package is installed.
+    """
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    @property
+    def identity(self):
+        return f"st:{self.model_name}"
+
+    def embed(self, texts):
+        return np.asarray(self.model.encode(list(texts), normalize_embeddings=True), dtype=np.float32)
+
+
+def get_embedder():
+    from llm_backends import _setting
+    model_name = _setting("EMBEDDING_MODEL")
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            print(f"Could not load embedding model {model_name}, using the hashing embedder: {e}")
+    return HashingEmbedder()
+
+
+# --- Index ---
+
+class EmbeddingIndex:
+    """
+    Chunk embeddings of every resume in one memory-mapped float32 matrix
+    (vectors.f32), with a JSON file mapping each document to its rows. A
+    document's score for a query is its best chunk's cosine similarity.
+
+    Rows are only ever appended; replaced or removed documents leave dead rows
+    behind until the file is compacted. Several processes (the app, ingest.py,
+    ranking_jobs.py workers) may share one index directory: every update
+    re-reads the files under an exclusive lock before it appends, and readers
+    pick up other processes' changes on their next search.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, embedder=None):
+        self.index_dir = index_dir
+        self.embedder = embedder or get_embedder()
+        self.vectors_path = os.path.join(index_dir, 'vectors.f32')
+        self.meta_path = os.path.join(index_dir, 'meta.json')
+        # doc_id -> {'start': row, 'count': rows, 'mtime': float}
+        self.docs = {}
+        self.rows = 0
+        self._meta_stamp = None
+        self._matrix = None
+        self._segments = None
+        self._lock = threading.RLock()
+        self.load()
+
+    @property
+    def dim(self):
+        return self.embedder.dim
+
+    # --- Persistence ---
+
+    def _lock_file(self, shared=False):
+        # Writers hold it exclusively; readers share it so they never load a
+        # document table that doesn't match the vector file
+        os.makedirs(self.index_dir, exist_ok=True)
+        handle = open(os.path.join(self.index_dir, '.lock'), 'a+b')
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        return handle
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.meta_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load(self):
+        self.docs, self.rows = {}, 0
+        self._meta_stamp = self._stamp()
+        if self._meta_stamp is not None:
+            try:
+                with open(self.meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                if meta.get('embedder') == self.embedder.identity:
+                    self.docs = meta['docs']
+                    self.rows = meta['rows'] if self.docs else 0
+                else:
+                    print("Embedding model changed, rebuilding the embedding index")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load embedding index, rebuilding: {e}")
+        self._matrix = None
+        self._segments = None
+
+    def _refresh(self):
+        # Call with the lock file held; reloads only if another writer changed the table
+        if self._stamp() != self._meta_stamp:
+            self._load()
+
+    def load(self):
+        with self._lock:
+            handle = self._lock_file(shared=True)
+            try:
+                self._load()
+            finally:
+                handle.close()
+
+    def refresh(self):
+        """
+        Picks up documents added or removed by other processes since the last load.
+        """
+        with self._lock:
+            handle = self._lock_file(shared=True)
+            try:
+                self._refresh()
+            finally:
+                handle.close()
+
+    def _write_meta(self):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'embedder': self.embedder.identity, 'rows': self.rows,
+                       'docs': self.docs}, f)
+        os.replace(tmp_path, self.meta_path)
+        self._meta_stamp = self._stamp()
+
+    def _matrix_view(self):
+        if self._matrix is None and self.rows:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(self.rows, self.dim))
+        return self._matrix
+
+    # --- Updates ---
+
+    def _update(self, removed=(), placements=(), vectors=None):
+        """
+        Applies removals and appends `vectors` for `(doc_id, rows, mtime)`
+        placements as one locked read-modify-write, so rows and documents other
+        processes added in the meantime are kept rather than overwritten.
+        """
+        with self._lock:
+            handle = self._lock_file()
+            try:
+                self._refresh()
+                if vectors is not None and len(vectors):
+                    with open(self.vectors_path, 'ab') as f:
+                        # Rows past the table's end belong to a writer that died before saving it
+                        f.truncate(self.rows * self.dim * 4)
+                        f.write(vectors.tobytes())
+                    self._matrix = None
+                for doc_id in removed:
+                    self.docs.pop(doc_id, None)
+                for doc_id, count, mtime in placements:
+                    self.docs[doc_id] = {'start': self.rows, 'count': count, 'mtime': mtime}
+                    self.rows += count
+                self._segments = None
+                if self.rows and self._dead_rows() / self.rows > COMPACT_DEAD_RATIO:
+                    self._compact()
+                self._write_meta()
+            finally:
+                handle.close()
+
+    def add_documents(self, documents):
+        """
+        Adds or replaces `(doc_id, text, mtime)` documents, embedding them in one
+        batch and appending their rows to the vector file.
+        """
+        chunk_rows, placements = [], []
+        for doc_id, text, mtime in documents:
+            chunks = chunk_text(text) or ['']
+            placements.append((doc_id, len(chunks), mtime))
+            chunk_rows += chunks
+        if not placements:
+            return
+        vectors = self.embedder.embed(chunk_rows).astype(np.float32, copy=False)
+        self._update(placements=placements, vectors=vectors)
+
+    def add_document(self, doc_id, text, mtime=None):
+        self.add_documents([(doc_id, text, mtime)])
+
+    def remove_document(self, doc_id):
+        self.remove_documents([doc_id])
+
+    def remove_documents(self, doc_ids):
+        if doc_ids:
+            self._update(removed=doc_ids)
+
+    def _dead_rows(self):
+        return self.rows - sum(entry['count'] for entry in self.docs.values())
+
+    def _compact(self):
+        # Call with the lock file held exclusively; the caller writes the table afterwards
+        matrix = self._matrix_view()
+        ordered = sorted(self.docs.items(), key=lambda item: item[1]['start'])
+        tmp_path = self.vectors_path + '.tmp'
+        row = 0
+        with open(tmp_path, 'wb') as f:
+            for doc_id, entry in ordered:
+                f.write(np.ascontiguousarray(matrix[entry['start']:entry['start'] + entry['count']]).tobytes())
+                entry['start'] = row
+                row += entry['count']
+        self._matrix = None
+        os.replace(tmp_path, self.vectors_path)
+        self.rows = row
+        self._segments = None
+
+    def compact(self):
+        """
+        Rewrites the vector file with only the rows of current documents.
+        """
+        with self._lock:
+            handle = self._lock_file()
+            try:
+                self._refresh()
+                self._compact()
+                self._write_meta()
+            finally:
+                handle.close()
+
+    def sync_directory(self, resume_dir, batch_size=256):
+        """
+        Embeds .txt files in `resume_dir` that are new or changed since they were
+        indexed and drops documents whose file is gone. Returns how many changed.
+        """
+        with self._lock:
+            self.refresh()
+            on_disk = {os.path.basename(path): path for path in glob.glob(os.path.join(resume_dir, '*.txt'))}
+            removed = [doc_id for doc_id in self.docs if doc_id not in on_disk]
+            self.remove_documents(removed)
+            changed = len(removed)
+            pending = []
+            for doc_id, path in on_disk.items():
+                mtime = os.path.getmtime(path)
+                entry = self.docs.get(doc_id)
+                if entry is not None and entry.get('mtime') == mtime:
+                    continue
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        pending.append((doc_id, f.read(), mtime))
+                except OSError as e:
+                    print(f"Could not embed {path}: {e}")
+                if len(pending) >= batch_size:
+                    self.add_documents(pending)
+                    changed += len(pending)
+                    pending = []
+            if pending:
+                self.add_documents(pending)
+                changed += len(pending)
+        return changed
+
+    # --- Search ---
+
+    def _build_segments(self):
+        # Row ranges of live documents in file order, for a per-document max via reduceat
+        ordered = sorted(self.docs.items(), key=lambda item: item[1]['start'])
+        doc_ids = [doc_id for doc_id, _ in ordered]
+        starts = np.array([entry['start'] for _, entry in ordered], dtype=np.int64)
+        live = np.zeros(self.rows, dtype=bool)
+        for _, entry in ordered:
+            live[entry['start']:entry['start'] + entry['count']] = True
+        self._segments = (doc_ids, starts, live)
+        return self._segments
+
+    def embed_query(self, text):
+        vectors = self.embedder.embed(chunk_text(text) or [''])
+        query = vectors.mean(axis=0)
+        norm = np.linalg.norm(query)
+        return query / norm if norm else query
+
+    def search(self, query, top_k=20, min_score_ratio=0.0, candidates=None):
+        """
+        Returns up to `top_k` `(similarity, doc_id)` tuples, best first, with the
+        same cutoff and `candidates` filter as LexicalIndex.search.
+        """
+        with self._lock:
+            handle = self._lock_file(shared=True)
+            try:
+                self._refresh()
+                # The memory map keeps this version of the file readable even if it is compacted meanwhile
+                matrix = self._matrix_view()
+                doc_ids, starts, live = self._segments or self._build_segments()
+            finally:
+                handle.close()
+        if matrix is None or not doc_ids:
+            return []
+        scores = matrix @ self.embed_query(query)
+        scores[~live] = -np.inf
+        doc_scores = np.maximum.reduceat(scores, starts)
+        if candidates is not None:
+            allowed = np.fromiter((doc_id in candidates for doc_id in doc_ids), dtype=bool, count=len(doc_ids))
+            doc_scores[~allowed] = -np.inf
+        k = len(doc_ids) if not top_k else min(top_k, len(doc_ids))
+        # argpartition finds the top k in linear time; only those get sorted
+        top = np.argpartition(-doc_scores, k - 1)[:k] if k < len(doc_ids) else np.arange(len(doc_ids))
+        top = top[np.argsort(-doc_scores[top])]
+        results = [(float(doc_scores[i]), doc_ids[i]) for i in top if np.isfinite(doc_scores[i])]
+        if results and min_score_ratio > 0:
+            cutoff = results[0][0] * min_score_ratio
+            results = [(s, d) for s, d in results if s >= cutoff]
+        return results
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_embedding_index():
+    """
+    Process-wide index instance shared by every Streamlit session.
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = EmbeddingIndex()
+        return _default_index
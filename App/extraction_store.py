@@ -0,0 +1,135 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+from db import DB_PATH, get_connection, get_writer
+
+# --- Store Defaults ---
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = DB_PATH
+DEFAULT_RESUME_DIR = os.path.join(APP_DIR, 'Uploaded_Resumes')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def txt_name_for(file_name):
+    """
+    Name of the .txt sidecar the Recruiter page indexes for an uploaded file.
+    """
+    return os.path.splitext(file_name)[0] + ".txt"
+
+
+class ExtractionStore:
+    """
+    Content-hash keyed store of extracted resume text. A given PDF (or .txt upload)
+    is parsed exactly once; its text and per-page metadata are kept in cv.db so that
+    re-uploads and reruns can read them back without pdfminer3. The Recruiter
+    ranking reads the .txt sidecars written from these records (see write_sidecar).
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+
+    def _connect(self):
+        return get_connection(self.db_path)
+
+    @staticmethod
+    def _to_record(row):
+        record = dict(row)
+        record['pages'] = json.loads(record.pop('pages_json'))
+        return record
+
+    def get(self, digest):
+        row = self._connect().execute('SELECT * FROM resume_extractions WHERE content_hash = ?',
+                                      (digest,)).fetchone()
+        return self._to_record(row) if row is not None else None
+
+    def has(self, digest):
+        return self._connect().execute('SELECT 1 FROM resume_extractions WHERE content_hash = ?',
+                                       (digest,)).fetchone() is not None
+
+    def put(self, digest, file_name, text, pages, wait=True, pending=None):
+        """
+        Stores a record. Bulk callers can pass wait=False and flush the writer later;
+        the queued write is appended to the `pending` list, if given, so its `.error`
+        can be checked once it is flushed.
+        """
+        record = {
+            'content_hash': digest,
+            'file_name': file_name,
+            'txt_name': txt_name_for(file_name),
+            'page_count': len(pages),
+            'pages': pages,
+            'text': text,
+            'extracted_at': time.time(),
+        }
+        write = get_writer(self.db_path).submit("""
+            INSERT OR REPLACE INTO resume_extractions
+                (content_hash, file_name, txt_name, page_count, pages_json, text, extracted_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (digest, file_name, record['txt_name'], record['page_count'],
+              json.dumps(pages), text, record['extracted_at']), wait=wait)
+        if pending is not None:
+            pending.append(write)
+        return record
+
+    def delete(self, digest, wait=True):
+        """
+        Drops the record for `digest`, e.g. when the rest of its ingest failed.
+        Returns the queued write.
+        """
+        return get_writer(self.db_path).submit('DELETE FROM resume_extractions WHERE content_hash = ?',
+                                               (digest,), wait=wait)
+
+    def extract(self, data, file_name):
+        """
+        Returns the stored record for these file bytes, parsing them only if this
+        exact content has never been seen before.
+        """
+        digest = content_hash(data)
+        record = self.get(digest)
+        if record is not None:
+            if record['file_name'] != file_name:
+                # Same document uploaded under a new name: remember the new name too
+                record = self.put(digest, file_name, record['text'], record['pages'])
+            return record
+        if file_name.lower().endswith('.txt'):
+            text, pages = data.decode('utf-8', errors='replace'), []
+        else:
+            # pdfminer3 is only loaded when a new PDF actually needs parsing
+            from resume_parser import extract_pdf
+            text, pages = extract_pdf(io.BytesIO(data))
+        return self.put(digest, file_name, text, pages)
+
+
+def write_sidecar(record, resume_dir=DEFAULT_RESUME_DIR):
+    """
+    Writes the record's text to its .txt sidecar unless the file already holds it.
+    Returns the sidecar path.
+    """
+    txt_path = os.path.join(resume_dir, record['txt_name'])
+    if os.path.exists(txt_path):
+        with open(txt_path, 'r', encoding='utf-8', errors='replace') as f:
+            if f.read() == record['text']:
+                return txt_path
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        f.write(record['text'])
+    return txt_path
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_extraction_store():
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ExtractionStore()
+        return _default_store
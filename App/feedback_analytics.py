@@ -0,0 +1,45 @@
+import threading
+
+from db import DB_PATH, get_connection
+
+# Comments shown per page on the Feedback page
+COMMENTS_PAGE_SIZE = 20
+
+_summary_cache = {}
+_summary_lock = threading.Lock()
+
+
+def _feedback_version(conn):
+    row = conn.execute("SELECT value FROM app_counters WHERE name = 'feedback_version'").fetchone()
+    return row[0] if row is not None else 0
+
+
+def rating_summary(db_path=DB_PATH):
+    """
+    Returns `(version, {feed_score: count})` for the ratings pie chart.
+
+    The counts come from feedback_score_counts, which triggers keep current on every
+    insert, and the result is cached in-process until the feedback version changes,
+    so the cost stays constant however large user_feedback grows.
+    """
+    conn = get_connection(db_path)
+    version = _feedback_version(conn)
+    with _summary_lock:
+        cached = _summary_cache.get(db_path)
+        if cached is not None and cached[0] == version:
+            return cached
+    counts = {feed_score: count for feed_score, count in conn.execute(
+        'SELECT feed_score, count FROM feedback_score_counts WHERE count > 0 ORDER BY feed_score')}
+    with _summary_lock:
+        _summary_cache[db_path] = (version, counts)
+    return version, counts
+
+
+def comments_page(page, page_size=COMMENTS_PAGE_SIZE, db_path=DB_PATH):
+    """
+    One page of `(feed_name, comments)` rows, newest first. Page numbers start at 1.
+    """
+    offset = max(page - 1, 0) * page_size
+    return get_connection(db_path).execute(
+        'SELECT feed_name, comments FROM user_feedback ORDER BY ID DESC LIMIT ? OFFSET ?',
+        (page_size, offset)).fetchall()
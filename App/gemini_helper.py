@@ -1,17 +1,40 @@
-import streamlit as st
-import google.generativeai as genai
-import json
 import re
-
-# Configure the Gemini API key from Streamlit secrets
-try:
-    genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-except (AttributeError, KeyError):
-    st.error("GEMINI_API_KEY not found in Streamlit secrets. Please add it to your .streamlit/secrets.toml file.")
-    st.stop()
+from analysis_cache import AnalysisCache, make_cache_key
+from json_stream import find_json, scan_stream
+from llm_backends import get_backend
+from rate_limiter import get_scheduler, RequestCancelled
+from prompt_compaction import (compact_resume, compact_job_description, record_savings, estimate_tokens,
+                               COMPACTION_VERSION, RESUME_TOKEN_BUDGET, JD_TOKEN_BUDGET)
+from stage_metrics import stage
 
 # --- AI Model Configuration ---
 
+# Which model answers each task is decided in llm_backends.py (Gemini by default,
+# or the offline "local" engine); the prompts and generation settings live here.
+
+# Bump a prompt's version whenever its wording changes so that cached answers
+# produced by the old prompt are no longer reused
+PROMPT_VERSIONS = {
+    "job_match": "1",
+    "recruiter_score": "1",
+    "tailored_bullets": "1",
+    "batch_score": "1",
+}
+
+# Keys the job seeker analysis must contain, with the value a repair may fall
+# back to when one is lost (None: the key can't be made up, the call fails)
+JOB_MATCH_SCHEMA = {
+    "match_score": None,
+    "strengths": [],
+    "gaps": [],
+    "suggestions": [],
+}
+
+# Batched recruiter scoring: the approximate input-token budget for one request
+# and the most resumes packed into it
+BATCH_TOKEN_BUDGET = 30000
+BATCH_MAX_RESUMES = 20
+
 # Generation settings for the "Job Seeker" function
 generation_config = {
     "temperature": 0.5,
@@ -29,13 +52,21 @@ generation_config_recruiter = {
     "max_output_tokens": 50,
 }
 
-# Safety settings (set to be permissive for the hackathon)
-safety_settings = [
-    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-]
+# Generation settings for batched recruiter scoring (a short JSON array per request)
+generation_config_batch = {
+    "temperature": 0.2,
+    "top_p": 1,
+    "top_k": 1,
+    "max_output_tokens": 1024,
+}
+
+# Generation settings for the one-off request that fixes a malformed JSON answer
+generation_config_repair = {
+    "temperature": 0.0,
+    "top_p": 1,
+    "top_k": 1,
+    "max_output_tokens": 512,
+}
 
 # --- Helper function to extract JSON ---
 def extract_json_from_text(text):
@@ -43,42 +74,120 @@ def extract_json_from_text(text):
     Finds and extracts the first valid JSON object (starting with { and ending with })
     from a block of text.
     """
-    # This regex finds the first occurrence of a JSON object
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match:
-        json_string = match.group(0)
-        try:
-            # Try to parse the found string
-            return json.loads(json_string)
-        except json.JSONDecodeError as e:
-            print(f"Failed to decode extracted JSON: {e}")
-            return None
-    else:
+    found = find_json(text)
+    if found is None:
         print("No JSON object found in the text.")
-        return None
+    return found
+
+def extract_json_array_from_text(text):
+    """
+    Finds and extracts the first JSON array (starting with [ and ending with ])
+    from a block of text.
+    """
+    found = find_json(text, '[')
+    if found is None:
+        print("No JSON array found in the text.")
+    return found
+
+def validate_job_match(data):
+    """
+    Checks a job match answer against JOB_MATCH_SCHEMA and normalizes it: the
+    score becomes an integer from 0 to 100 and each list a list of strings.
+    Raises ValueError describing what is wrong.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("response is not a JSON object")
+    missing = [key for key in JOB_MATCH_SCHEMA if key not in data]
+    if missing:
+        raise ValueError(f"missing keys: {', '.join(missing)}")
+    try:
+        score = int(float(str(data["match_score"]).strip().rstrip('%')))
+    except ValueError:
+        raise ValueError(f"match_score is not a number: {data['match_score']!r}")
+    result = {"match_score": max(0, min(100, score))}
+    for key in ("strengths", "gaps", "suggestions"):
+        value = data[key]
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list):
+            raise ValueError(f"{key} is not a list")
+        result[key] = [str(item) for item in value]
+    return result
+
+def _cache_key(task, config, *parts):
+    # The backend identity keeps answers from different models apart, and the
+    # compaction settings decide what the model actually saw of the raw texts
+    compaction = [COMPACTION_VERSION, RESUME_TOKEN_BUDGET, JD_TOKEN_BUDGET]
+    return make_cache_key(task, PROMPT_VERSIONS[task],
+                          [get_backend(task).cache_identity, config, compaction], *parts)
+
+def _compact(task, resume_text, job_description):
+    """
+    Normalizes both texts and trims the resume to the sections that matter most
+    for this job description, logging the tokens saved.
+    """
+    compact_jd, jd_report = compact_job_description(job_description)
+    compact_text, resume_report = compact_resume(resume_text, compact_jd)
+    record_savings(task, resume_report, jd_report)
+    return compact_text, compact_jd
 
-# Initialize the Generative Model for Job Seeker
-model = genai.GenerativeModel(
-    model_name="gemini-2.5-pro",
-    generation_config=generation_config,
-    safety_settings=safety_settings
-)
+def _request_tokens(prompt_parts, config):
+    # What a request counts against the tokens-per-minute quota: prompt plus the most it may generate
+    return sum(estimate_tokens(part) for part in prompt_parts) + config.get("max_output_tokens", 0)
 
-# Initialize the Generative Model for Recruiter
-model_recruiter = genai.GenerativeModel(
-    model_name="gemini-2.5-pro",
+def _generate(task, prompt_parts, config, **inputs):
+    """
+    Sends a prompt to whichever backend serves `task` and returns the response text.
+    Every request goes through the backend's rate-limit scheduler.
+    """
+    backend = get_backend(task)
+    return get_scheduler(backend).run(lambda: backend.generate(task, prompt_parts, config, inputs),
+                                      tokens=_request_tokens(prompt_parts, config))
+
+def _generate_json(task, prompt_parts, config, opener='{', **inputs):
+    """
+    Streams the response for `task` and stops reading as soon as the first JSON
+    object (or array, with opener='[') closes. Returns `(value, text_read)`.
+    """
+    backend = get_backend(task)
+    return get_scheduler(backend).run(
+        lambda: scan_stream(backend.stream(task, prompt_parts, config, inputs), opener),
+        tokens=_request_tokens(prompt_parts, config))
+
+def _repair_json(response_text, schema):
+    """
+    One cheap follow-up request that turns a malformed answer into a JSON object
+    with the keys in `schema`. Only the broken answer is sent, not the resume.
+    """
+    prompt_parts = [
+        "The following text was meant to be a single JSON object but is malformed or incomplete.",
+        f"Return ONLY a corrected JSON object with exactly these keys: {', '.join(schema)}.",
+        "Keep every value that is present; do not add any other text or markdown.",
+        "\n--- TEXT ---\n", response_text,
+    ]
+    response_text = _generate("json_repair", prompt_parts, generation_config_repair,
+                              response_text=response_text, schema=schema)
+    return find_json(response_text)
 
-    generation_config=generation_config_recruiter,
-    safety_settings=safety_settings
-)
+# Shared on-disk cache of model answers, keyed by the prompt inputs and model settings
+analysis_cache = AnalysisCache()
 
 # --- Function 1: Job Seeker Analysis ---
 
-def get_job_match_analysis(resume_text, job_description):
+def get_job_match_analysis(resume_text, job_description, raise_errors=False, recorder=None):
     """
     Analyzes a resume against a job description and returns a detailed JSON analysis.
+    With raise_errors=True failures are re-raised instead of returning the fallback
+    response, so callers such as the ranking engine can retry them. An optional
+    StageRecorder times the cache lookup, model call and JSON parsing.
     """
-    
+    cache_key = _cache_key("job_match", generation_config, resume_text, job_description)
+    with stage(recorder, "cache_lookup"):
+        cached = analysis_cache.get(cache_key, "job_match")
+    if cached is not None:
+        return cached
+
+    resume_text, job_description = _compact("job_match", resume_text, job_description)
     prompt_parts = [
         "You are an expert ATS (Applicant Tracking System) and professional career coach.",
         "Analyze the provided resume against the provided job description.",
@@ -94,17 +203,25 @@ def get_job_match_analysis(resume_text, job_description):
     ]
 
     try:
-        response = model.generate_content(prompt_parts)
-        # NEW: Use our helper function to find the JSON in the response text
-        response_json = extract_json_from_text(response.text)
-        
-        if response_json is None:
-            raise ValueError("No valid JSON found in AI response.")
-            
+        with stage(recorder, "model_call"):
+            response_json, response_text = _generate_json("job_match", prompt_parts, generation_config,
+                                                          resume_text=resume_text, job_description=job_description)
+        try:
+            with stage(recorder, "json_parse"):
+                response_json = validate_job_match(response_json)
+        except ValueError as e:
+            # A single repair attempt is much cheaper than re-running the analysis
+            print(f"Invalid job match response ({e}), requesting a repair")
+            with stage(recorder, "json_repair"):
+                response_json = validate_job_match(_repair_json(response_text, JOB_MATCH_SCHEMA))
+
+        analysis_cache.set(cache_key, response_json, "job_match")
         return response_json
         
     except Exception as e:
         print(f"Error in get_job_match_analysis: {e}")
+        if raise_errors:
+            raise
         # Provide a fallback error response
         return {
             "match_score": 0,
@@ -118,8 +235,15 @@ def get_job_match_analysis(resume_text, job_description):
 def get_recruiter_match_score(resume_text, job_description):
     """
     Quickly returns just the match percentage for the recruiter's ranked list.
+    Raises on failure (including an answer without a number), so callers can
+    retry instead of ranking the candidate with a made-up 0.
     """
-    
+    cache_key = _cache_key("recruiter_score", generation_config_recruiter, resume_text, job_description)
+    cached = analysis_cache.get(cache_key, "recruiter_score")
+    if cached is not None:
+        return cached
+
+    resume_text, job_description = _compact("recruiter_score", resume_text, job_description)
     prompt_parts = [
         "You are a recruiter's ATS assistant.",
         "How well does this resume match this job description?",
@@ -129,18 +253,143 @@ def get_recruiter_match_score(resume_text, job_description):
         "Respond with ONLY the integer percentage (e.g., '85'). Do not add the '%' sign, any text, or any markdown."
     ]
 
+    response_text = _generate("recruiter_score", prompt_parts, generation_config_recruiter,
+                              resume_text=resume_text, job_description=job_description)
+    # Clean up the response to get only the number
+    score_text = re.findall(r'\d+', response_text)
+    if not score_text:
+        raise ValueError(f"No score in the recruiter response: {response_text[:80]!r}")
+    score = int(score_text[0])
+    analysis_cache.set(cache_key, score, "recruiter_score")
+    return score
+
+# --- Function 2b: Recruiter Batched Scores ---
+
+def pack_batches(resumes, job_description, token_budget=BATCH_TOKEN_BUDGET, max_resumes=BATCH_MAX_RESUMES):
+    """
+    Greedily groups `(candidate_id, resume_text)` pairs into batches whose prompt
+    (job description + resumes) stays under `token_budget`. A resume that doesn't
+    fit alongside the job description ends up in a batch of its own.
+    """
+    jd_tokens = estimate_tokens(job_description) + 200  # instructions and separators
+    batches, current, current_tokens = [], [], jd_tokens
+    for candidate_id, resume_text in resumes:
+        tokens = estimate_tokens(resume_text) + 20
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_resumes):
+            batches.append(current)
+            current, current_tokens = [], jd_tokens
+        current.append((candidate_id, resume_text))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _batch_cache_key(resume_text, job_description):
+    return _cache_key("batch_score", generation_config_batch, resume_text, job_description)
+
+def _score_batch(resumes, job_description, token_budget):
+    """
+    Scores a batch in a single request. Batches that are over budget or whose
+    request fails are split in half and retried; candidates missing from the
+    model's answer fall back to get_recruiter_match_score one by one.
+
+    Returns `(scores, answered)` where `answered` holds the candidate ids the
+    batched request itself scored. Candidates whose fallback failed too are
+    left out of `scores`.
+    """
+    if len(resumes) == 1:
+        return _score_singles(resumes, job_description), set()
+
+    def split():
+        middle = len(resumes) // 2
+        scores, answered = _score_batch(resumes[:middle], job_description, token_budget)
+        more_scores, more_answered = _score_batch(resumes[middle:], job_description, token_budget)
+        scores.update(more_scores)
+        return scores, answered | more_answered
+
+    prompt_tokens = estimate_tokens(job_description) + 200 + sum(estimate_tokens(t) + 20 for _, t in resumes)
+    if prompt_tokens > token_budget:
+        return split()
+
+    # Short ids keep the answer compact and file names out of the prompt
+    ids = {f"C{i + 1}": candidate_id for i, (candidate_id, _) in enumerate(resumes)}
+    prompt_parts = [
+        "You are a recruiter's ATS assistant.",
+        "Score how well EACH of the following resumes matches the job description.",
+        "\n--- JOB DESCRIPTION ---\n", job_description,
+    ]
+    for short_id, (_, resume_text) in zip(ids, resumes):
+        prompt_parts += [f"\n--- RESUME {short_id} ---\n", resume_text]
+    prompt_parts += [
+        "\n--- SCORES ---\n",
+        "Respond with ONLY a JSON array containing one object per resume, in the form "
+        '[{"id": "C1", "match_score": 85}, ...]. match_score is an integer from 0 to 100. '
+        "Do not add any other text or markdown.",
+    ]
+
     try:
-        response = model_recruiter.generate_content(prompt_parts)
-        # Clean up the response to get only the number
-        score_text = re.findall(r'\d+', response.text)
-        if score_text:
-            return int(score_text[0])
-        else:
-            return 0 # No number found
-            
+        parsed, _ = _generate_json("batch_score", prompt_parts, generation_config_batch, opener='[',
+                                   resumes=[(short_id, text) for short_id, (_, text) in zip(ids, resumes)],
+                                   job_description=job_description)
+        parsed = parsed or []
+    except RequestCancelled:
+        # The caller gave up on this call; splitting would only queue more requests
+        raise
     except Exception as e:
-        print(f"Error getting recruiter score: {e}")
-        return 0 # Return a 0 score on error
+        print(f"Error in batched recruiter scoring ({len(resumes)} resumes), splitting: {e}")
+        return split()
+
+    answered = {}
+    for item in parsed:
+        try:
+            answered[ids[item["id"]]] = max(0, min(100, int(item["match_score"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    # Per-item fallback for anything the model skipped or garbled
+    scores = _score_singles([pair for pair in resumes if pair[0] not in answered], job_description)
+    scores.update(answered)
+    return scores, set(answered)
+
+def _score_singles(resumes, job_description):
+    # One request per resume; a failure leaves the candidate out for the caller to retry
+    scores = {}
+    for candidate_id, resume_text in resumes:
+        try:
+            scores[candidate_id] = get_recruiter_match_score(resume_text, job_description)
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            print(f"Error getting recruiter score for {candidate_id}: {e}")
+    return scores
+
+def get_recruiter_match_scores_batch(resumes, job_description, token_budget=BATCH_TOKEN_BUDGET):
+    """
+    Scores several `(candidate_id, resume_text)` pairs against one job description,
+    packing them into as few requests as the token budget allows. Returns a dict of
+    candidate_id -> integer match percentage; candidates that could not be scored
+    are left out, so the ScoringEngine retries them rather than storing a 0.
+    """
+    scores, uncached, originals = {}, [], {}
+    compact_jd, jd_report = compact_job_description(job_description)
+    for candidate_id, resume_text in resumes:
+        cached = analysis_cache.get(_batch_cache_key(resume_text, job_description), "batch_score")
+        if cached is not None:
+            scores[candidate_id] = cached
+        else:
+            compact_text, report = compact_resume(resume_text, compact_jd)
+            record_savings("batch_score", report)
+            uncached.append((candidate_id, compact_text))
+            originals[candidate_id] = resume_text
+    if uncached:
+        record_savings("batch_score", jd_report)
+    for batch in pack_batches(uncached, compact_jd, token_budget):
+        batch_scores, answered = _score_batch(batch, compact_jd, token_budget)
+        scores.update(batch_scores)
+        for candidate_id in answered:
+            analysis_cache.set(_batch_cache_key(originals[candidate_id], job_description),
+                               batch_scores[candidate_id], "batch_score")
+    return scores
 
 # --- Function 3: Tailored Bullet Point Generator ---
 
@@ -148,7 +397,13 @@ def generate_tailored_bullets(resume_text, job_description, strengths, gaps):
     """
     Generates tailored resume bullet points based on the analysis.
     """
-    
+    cache_key = _cache_key("tailored_bullets", generation_config_recruiter,
+                           resume_text, job_description, strengths, gaps)
+    cached = analysis_cache.get(cache_key, "tailored_bullets")
+    if cached is not None:
+        return cached
+
+    resume_text, job_description = _compact("tailored_bullets", resume_text, job_description)
     prompt_parts = [
         "You are an expert resume writer and career coach.",
         "A candidate has just received an analysis of their resume against a job description.",
@@ -169,9 +424,12 @@ def generate_tailored_bullets(resume_text, job_description, strengths, gaps):
     ]
 
     try:
-        # We can use the simple recruiter model for this text-only generation
-        response = model_recruiter.generate_content(prompt_parts)
-        return response.text
+        # We can use the simple recruiter settings for this text-only generation
+        response_text = _generate("tailored_bullets", prompt_parts, generation_config_recruiter,
+                                  resume_text=resume_text, job_description=job_description,
+                                  strengths=strengths, gaps=gaps)
+        analysis_cache.set(cache_key, response_text, "tailored_bullets")
+        return response_text
         
     except Exception as e:
         print(f"Error generating tailored bullets: {e}")
@@ -0,0 +1,297 @@
+"""
+Bulk resume ingestion from the command line.
+
+    python ingest.py /path/to/resumes            # a directory (searched recursively)
+    python ingest.py backlog.zip --workers 8      # or a zip archive
+
+Each PDF/TXT is parsed with the same pdfminer3 pipeline as the upload page, in a
+process pool. Text goes into the extraction store in cv.db plus a .txt sidecar in
+Uploaded_Resumes/, which is what the Recruiter page ranks, and a structured
+candidate profile used for hard-requirement filters. New resumes are then
+embedded for the Recruiter's semantic search (skip with --no-embed). Documents whose content
+hash is already stored are skipped, and a checkpoint file lets an interrupted run
+pick up where it stopped; files that failed are retried on the next run.
+
+With a --resume-dir other than the app's Uploaded_Resumes/, the keyword and
+semantic indexes are kept inside that directory rather than the app's own.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from candidate_profiles import ProfileStore
+from db import get_writer
+from embedding_index import EmbeddingIndex, get_embedding_index
+from extraction_store import (ExtractionStore, content_hash, txt_name_for,
+                              DEFAULT_DB_PATH, DEFAULT_RESUME_DIR)
+from lexical_index import LexicalIndex, get_lexical_index
+from resume_parser import extract_pdf
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt')
+
+
+# --- Sources ---
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def iter_directory(path):
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                full_path = os.path.join(root, name)
+                yield full_path, name, lambda p=full_path: _read_file(p)
+
+
+def iter_zip(path):
+    archive = zipfile.ZipFile(path)
+    for info in archive.infolist():
+        if info.is_dir() or not info.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            continue
+        source_key = f"{path}!{info.filename}"
+        yield source_key, os.path.basename(info.filename), lambda i=info: archive.read(i)
+
+
+# --- Checkpoint ---
+
+class Checkpoint:
+    """
+    Append-only log of source keys that have been fully handled (ingested, skipped
+    or failed), so a crashed run can skip them on restart. Failed files are logged
+    for the record but not skipped, so a rerun tries them again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a torn last line from a crash
+                    if 'source' in entry and entry.get('status') != 'failed':
+                        self.done.add(entry['source'])
+        self._fh = open(path, 'a', encoding='utf-8') if path else None
+
+    def mark(self, source_key, status):
+        if status != 'failed':
+            self.done.add(source_key)
+        if self._fh:
+            self._fh.write(json.dumps({'source': source_key, 'status': status}) + '\n')
+
+    def flush(self):
+        if self._fh:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def close(self):
+        if self._fh:
+            self.flush()
+            self._fh.close()
+
+
+# --- Worker ---
+
+def _extract_worker(file_name, data):
+    started = time.perf_counter()
+    if file_name.lower().endswith('.txt'):
+        text, pages = data.decode('utf-8', errors='replace'), []
+    else:
+        # Files are already spread over the process pool, so each one stays in its worker
+        text, pages = extract_pdf(io.BytesIO(data), workers=1)
+    return text, pages, time.perf_counter() - started
+
+
+def _unique_file_name(resume_dir, file_name, digest):
+    # Different resumes sharing a file name get the content hash appended
+    txt_path = os.path.join(resume_dir, txt_name_for(file_name))
+    if not os.path.exists(txt_path):
+        return file_name
+    stem, ext = os.path.splitext(file_name)
+    return f"{stem}_{digest[:8]}{ext}"
+
+
+def _indexes_for(resume_dir):
+    # The app's indexes only cover its own upload folder; any other folder gets
+    # indexes of its own so the app never lists resumes it has no files for
+    if os.path.abspath(resume_dir) == os.path.abspath(DEFAULT_RESUME_DIR):
+        return get_lexical_index(), get_embedding_index
+    return (LexicalIndex(os.path.join(resume_dir, 'lexical_index.json')),
+            lambda: EmbeddingIndex(os.path.join(resume_dir, 'embedding_index')))
+
+
+def ingest(source, workers=None, db_path=DEFAULT_DB_PATH, resume_dir=DEFAULT_RESUME_DIR,
+           checkpoint_path=None, max_pending=None, report_every=500, embed=True):
+    """
+    Ingests every resume in `source` and returns a summary dict with counts,
+    throughput and the list of per-file failures.
+    """
+    store = ExtractionStore(db_path)
+    profiles = ProfileStore(db_path)
+    lexical_index, embedding_index = _indexes_for(resume_dir)
+    checkpoint = Checkpoint(checkpoint_path)
+    os.makedirs(resume_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+
+    sources = iter_zip(source) if zipfile.is_zipfile(source) else iter_directory(source)
+    summary = {'ingested': 0, 'skipped': 0, 'failed': 0, 'bytes': 0, 'failures': []}
+    seen_hashes = set()
+    pending = {}
+    # Files whose database writes are queued but not yet known to have committed
+    unconfirmed = []
+    started = time.perf_counter()
+
+    def fail(source_key, error):
+        summary['failed'] += 1
+        summary['failures'].append({'source': source_key, 'error': f"{type(error).__name__}: {error}"})
+        checkpoint.mark(source_key, 'failed')
+
+    def discard(digest, txt_name, written_paths):
+        # Take the rows and files back out, so a rerun ingests this resume afresh
+        # instead of taking it for a duplicate. Queued behind the file's own writes.
+        store.delete(digest, wait=False)
+        profiles.delete(txt_name, wait=False)
+        lexical_index.remove_document(txt_name, save=False)
+        for path in written_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def confirm():
+        # Rows must be committed before the checkpoint claims them as done
+        writer = get_writer(db_path)
+        writer.flush()
+        rolled_back = False
+        for source_key, digest, writes, written_paths, txt_name, size in unconfirmed:
+            error = next((write.error for write in writes if write.error is not None), None)
+            if error is None:
+                summary['ingested'] += 1
+                summary['bytes'] += size
+                checkpoint.mark(source_key, 'ingested')
+                continue
+            # Some of the file's rows may have committed without the rest
+            fail(source_key, error)
+            discard(digest, txt_name, written_paths)
+            rolled_back = True
+        unconfirmed.clear()
+        if rolled_back:
+            writer.flush()
+        checkpoint.flush()
+        lexical_index.save()
+
+    def collect(done):
+        for future in done:
+            source_key, file_name, digest, data = pending.pop(future)
+            writes, written_paths, record = [], [], None
+            try:
+                text, pages, _ = future.result()
+                file_name = _unique_file_name(resume_dir, file_name, digest)
+                record = store.put(digest, file_name, text, pages, wait=False, pending=writes)
+                profiles.put(record['txt_name'], digest, text, wait=False, pending=writes)
+                if file_name.lower().endswith('.pdf'):
+                    written_paths.append(os.path.join(resume_dir, file_name))
+                    with open(written_paths[-1], 'wb') as f:
+                        f.write(data)
+                txt_path = os.path.join(resume_dir, record['txt_name'])
+                written_paths.append(txt_path)
+                with open(txt_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                lexical_index.add_document(record['txt_name'], text,
+                                           mtime=os.path.getmtime(txt_path), save=False)
+                unconfirmed.append((source_key, digest, writes, written_paths, record['txt_name'], len(data)))
+            except Exception as e:
+                fail(source_key, e)
+                if record is not None:
+                    discard(digest, record['txt_name'], written_paths)
+            if len(unconfirmed) >= report_every:
+                confirm()
+                _print_progress(summary, started)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for source_key, file_name, read in sources:
+            if source_key in checkpoint.done:
+                summary['skipped'] += 1
+                continue
+            try:
+                data = read()
+            except OSError as e:
+                summary['failed'] += 1
+                summary['failures'].append({'source': source_key, 'error': str(e)})
+                checkpoint.mark(source_key, 'failed')
+                continue
+            digest = content_hash(data)
+            if digest in seen_hashes or store.has(digest):
+                summary['skipped'] += 1
+                checkpoint.mark(source_key, 'duplicate')
+                continue
+            seen_hashes.add(digest)
+            pending[pool.submit(_extract_worker, file_name, data)] = (source_key, file_name, digest, data)
+            # Keep memory flat on huge backlogs by bounding the number of queued files
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    confirm()
+    checkpoint.close()
+    # Fold the run's log entries into the snapshot so the app loads it in one read
+    lexical_index.compact()
+    if embed:
+        # One batched pass over the new .txt files rather than one embedding call per resume
+        summary['embedded'] = embedding_index().sync_directory(resume_dir)
+    summary['elapsed'] = time.perf_counter() - started
+    summary['files_per_sec'] = summary['ingested'] / summary['elapsed'] if summary['elapsed'] else 0.0
+    summary['mb_per_sec'] = summary['bytes'] / 1e6 / summary['elapsed'] if summary['elapsed'] else 0.0
+    return summary
+
+
+def _print_progress(summary, started):
+    elapsed = time.perf_counter() - started
+    rate = summary['ingested'] / elapsed if elapsed else 0.0
+    print(f"[{elapsed:7.1f}s] ingested={summary['ingested']} skipped={summary['skipped']} "
+          f"failed={summary['failed']} ({rate:.1f} files/s)", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-ingest resumes for the Recruiter page.")
+    parser.add_argument('source', help="directory or .zip archive of PDF/TXT resumes")
+    parser.add_argument('--workers', type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="SQLite database holding the extraction store")
+    parser.add_argument('--resume-dir', default=DEFAULT_RESUME_DIR, help="where .txt sidecars and PDFs are written")
+    parser.add_argument('--checkpoint', default=None,
+                        help="checkpoint file (default: <source>.ingest-checkpoint.jsonl)")
+    parser.add_argument('--no-embed', action='store_true',
+                        help="skip embedding (semantic search then embeds new resumes on first use)")
+    parser.add_argument('--failures', default=None, help="write per-file failures to this JSON file")
+    args = parser.parse_args(argv)
+
+    checkpoint_path = args.checkpoint or os.path.abspath(args.source).rstrip(os.sep) + '.ingest-checkpoint.jsonl'
+    summary = ingest(args.source, workers=args.workers, db_path=args.db,
+                     resume_dir=args.resume_dir, checkpoint_path=checkpoint_path, embed=not args.no_embed)
+
+    print(f"Ingested {summary['ingested']} resumes, skipped {summary['skipped']}, "
+          f"failed {summary['failed']} in {summary['elapsed']:.1f}s "
+          f"({summary['files_per_sec']:.1f} files/s, {summary['mb_per_sec']:.2f} MB/s)")
+    for failure in summary['failures']:
+        print(f"  FAILED {failure['source']}: {failure['error']}")
+    if args.failures:
+        with open(args.failures, 'w', encoding='utf-8') as f:
+            json.dump(summary['failures'], f, indent=2)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
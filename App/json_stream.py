@@ -0,0 +1,93 @@
+import json
+
+# --- Incremental JSON Scanner ---
+
+
+class JSONStreamScanner:
+    """
+    Finds the first complete JSON value (an object, or an array with
+    opener='[') in text that arrives in chunks, e.g. a streamed model response.
+
+    Brackets inside strings and escaped quotes are tracked, so prose or braces
+    around the JSON don't confuse it. `feed` returns the parsed value as soon as
+    its closing bracket arrives, which lets the caller stop the stream there.
+    Candidates that close but fail to parse are skipped and scanning resumes
+    after their opening bracket.
+    """
+
+    def __init__(self, opener='{'):
+        self.opener = opener
+        self.closer = '}' if opener == '{' else ']'
+        self.buffer = ''
+        self.result = None
+        self.done = False
+        self._pos = 0        # next character to scan
+        self._start = None   # index of the candidate's opening bracket
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk):
+        """
+        Adds a chunk of text. Returns the parsed value once one is complete,
+        otherwise None.
+        """
+        if self.done:
+            return self.result
+        self.buffer += chunk
+        while self._pos < len(self.buffer):
+            char = self.buffer[self._pos]
+            self._pos += 1
+            if self._start is None:
+                if char == self.opener:
+                    self._start, self._depth = self._pos - 1, 1
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = self.buffer[self._start:self._pos]
+                    try:
+                        self.result = json.loads(candidate)
+                        self.done = True
+                        return self.result
+                    except ValueError:
+                        # Not valid JSON after all; try the next opening bracket
+                        self._pos = self._start + 1
+                        self._start = None
+        return None
+
+
+def find_json(text, opener='{'):
+    """
+    Returns the first complete JSON object (or array, with opener='[') in
+    `text`, or None if there isn't one.
+    """
+    return JSONStreamScanner(opener).feed(text)
+
+
+def scan_stream(chunks, opener='{'):
+    """
+    Reads chunks until the first JSON value closes and stops consuming the
+    stream there. Returns `(value, text_read)`; value is None if the stream
+    ended without a complete one.
+    """
+    scanner = JSONStreamScanner(opener)
+    for chunk in chunks:
+        if scanner.feed(chunk) is not None:
+            break
+    close = getattr(chunks, 'close', None)
+    if close is not None:
+        # Ends a generator early, which in turn stops the underlying response
+        close()
+    return scanner.result, scanner.buffer
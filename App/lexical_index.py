@@ -0,0 +1,457 @@
+import glob
+import json
+import math
+import os
+import re
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+# --- Index Defaults ---
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_PATH = os.path.join(APP_DIR, 'lexical_index.json')
+# NLTK corpora shipped with the app (python -m nltk.downloader -d App/nltk_data stopwords)
+BUNDLED_NLTK_DATA = os.path.join(APP_DIR, 'nltk_data')
+# How many of the best keyword matches are sent on to the AI model
+DEFAULT_TOP_K = 20
+# Candidates scoring below this fraction of the best keyword score are dropped
+DEFAULT_MIN_SCORE_RATIO = 0.0
+
+# Standard BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Updates are appended to <index>.log; the snapshot is rewritten in the background
+# once the log holds more than this many entries, or more than this share of the
+# indexed documents, whichever is larger
+COMPACT_MIN_LOG_ENTRIES = 1000
+COMPACT_LOG_RATIO = 0.5
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+# Copy of NLTK's English list, used when no corpus is installed so startup never
+# has to reach the network
+FALLBACK_STOPWORDS = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself
+yourselves he him his himself she she's her hers herself it it's its itself they them their
+theirs themselves what which who whom this that that'll these those am is are was were be
+been being have has had having do does did doing a an the and but if or because as until
+while of at by for with about against between into through during before after above below
+to from up down in out on off over under again further then once here there when where why
+how all any both each few more most other some such no nor not only own same so than too
+very s t can will just don don't should should've now d ll m o re ve y ain aren aren't
+couldn couldn't didn didn't doesn doesn't hadn hadn't hasn hasn't haven haven't isn isn't
+ma mightn mightn't mustn mustn't needn needn't shan shan't shouldn shouldn't wasn wasn't
+weren weren't won won't wouldn wouldn't
+""".split())
+
+_stopwords = None
+
+
+def get_stopwords():
+    """
+    English stopwords from the bundled NLTK corpus (or any installed one), falling
+    back to a built-in copy of the same list. Never downloads anything.
+    """
+    global _stopwords
+    if _stopwords is None:
+        try:
+            import nltk
+            from nltk.corpus import stopwords
+            if os.path.isdir(BUNDLED_NLTK_DATA) and BUNDLED_NLTK_DATA not in nltk.data.path:
+                nltk.data.path.insert(0, BUNDLED_NLTK_DATA)
+            _stopwords = frozenset(stopwords.words('english'))
+        except (ImportError, LookupError):
+            _stopwords = FALLBACK_STOPWORDS
+    return _stopwords
+
+
+def tokenize(text):
+    stop = get_stopwords()
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in stop]
+
+
+class _Postings:
+    """
+    Inverted index in NumPy arrays (term -> document slots and term frequencies)
+    that is updated in place. A document keeps its slot for as long as it is
+    indexed; removing or replacing it only marks the slot dead, and dead slots
+    are left out of scoring until the index is rebuilt.
+    """
+
+    def __init__(self, docs):
+        self.doc_ids = list(docs)
+        self.slots = {doc_id: slot for slot, doc_id in enumerate(self.doc_ids)}
+        capacity = max(len(self.doc_ids), 16)
+        self.lengths = np.zeros(capacity, dtype=np.float64)
+        self.lengths[:len(self.doc_ids)] = [docs[d]['length'] for d in self.doc_ids]
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.alive[:len(self.doc_ids)] = True
+        self.total_length = float(self.lengths.sum())
+        self.dead = 0
+        collected = {}
+        for slot, doc_id in enumerate(self.doc_ids):
+            for term, tf in docs[doc_id]['terms'].items():
+                collected.setdefault(term, ([], []))
+                collected[term][0].append(slot)
+                collected[term][1].append(tf)
+        # term -> [slots, term frequencies, used length]; the arrays grow by doubling
+        self.terms = {term: [np.array(idx, dtype=np.int64), np.array(tfs, dtype=np.float64), len(idx)]
+                      for term, (idx, tfs) in collected.items()}
+
+    @property
+    def needs_rebuild(self):
+        return self.dead > len(self.slots)
+
+    def add(self, doc_id, entry):
+        self.remove(doc_id)
+        slot = len(self.doc_ids)
+        if slot == len(self.lengths):
+            self.lengths = np.concatenate([self.lengths, np.zeros_like(self.lengths)])
+            self.alive = np.concatenate([self.alive, np.zeros_like(self.alive)])
+        self.doc_ids.append(doc_id)
+        self.slots[doc_id] = slot
+        self.lengths[slot] = entry['length']
+        self.alive[slot] = True
+        self.total_length += entry['length']
+        for term, tf in entry['terms'].items():
+            posting = self.terms.get(term)
+            if posting is None:
+                posting = self.terms[term] = [np.empty(4, dtype=np.int64), np.empty(4, dtype=np.float64), 0]
+            idx, tfs, used = posting
+            if used == len(idx):
+                posting[0] = idx = np.concatenate([idx, np.empty_like(idx)])
+                posting[1] = tfs = np.concatenate([tfs, np.empty_like(tfs)])
+            idx[used] = slot
+            tfs[used] = tf
+            posting[2] = used + 1
+
+    def remove(self, doc_id):
+        slot = self.slots.pop(doc_id, None)
+        if slot is not None:
+            self.alive[slot] = False
+            self.total_length -= self.lengths[slot]
+            self.dead += 1
+
+    def score(self, terms):
+        n_docs = len(self.slots)
+        if not n_docs:
+            return {}
+        n_slots = len(self.doc_ids)
+        lengths, alive = self.lengths[:n_slots], self.alive[:n_slots]
+        avg_length = self.total_length / n_docs or 1.0
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length)
+        scores = np.zeros(n_slots, dtype=np.float64)
+        for term in terms:
+            posting = self.terms.get(term)
+            if posting is None:
+                continue
+            idx, tf = posting[0][:posting[2]], posting[1][:posting[2]]
+            live = alive[idx]
+            df = np.count_nonzero(live)
+            if not df:
+                continue
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores[idx] += live * (idf * tf * (BM25_K1 + 1) / (tf + length_norm[idx]))
+        live_slots = np.flatnonzero(alive)
+        return dict(zip([self.doc_ids[i] for i in live_slots], scores[live_slots].tolist()))
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the extracted resume texts, persisted as a JSON
+    snapshot plus an append-only log of the changes made since (`<path>.log`).
+
+    Documents are keyed by their file name (e.g. 'MJ_Resume.txt'), which is also
+    the candidate id used on the Recruiter page. Several processes (the app,
+    ingest.py, ranking_jobs.py workers) may share one index: log appends and
+    compaction hold an exclusive lock on `<path>.lock`, and a compaction first
+    reloads whatever other processes logged.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.log_path = path + '.log'
+        # doc_id -> {'mtime': float, 'length': int, 'terms': {term: tf}}
+        self.docs = {}
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._postings = None
+        # Changes not yet in the log: doc_id -> entry, or None for a removal
+        self._unsaved = {}
+        self._log_entries = 0
+        self._compacting = False
+        # What the snapshot and log looked like when this process last caught up with them
+        self._disk_stamp = None
+        self.load()
+
+    # --- Persistence ---
+
+    def _lock_file(self):
+        # Exclusive even for loading, since replaying the log may cut off a torn tail
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        handle = open(self.path + '.lock', 'a+b')
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _stamp(self):
+        stamp = []
+        for path in (self.path, self.log_path):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def load(self):
+        with self._lock:
+            handle = self._lock_file()
+            try:
+                self._load()
+            finally:
+                handle.close()
+
+    def _load(self):
+        # Called with both locks held
+        self.docs = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.docs = json.load(f).get('docs', {})
+            except (OSError, ValueError) as e:
+                print(f"Could not load lexical index, rebuilding: {e}")
+        self._log_entries = self._replay_log()
+        self._unsaved = {}
+        self._postings = None
+        self._disk_stamp = self._stamp()
+
+    def _replay_log(self):
+        # Applies the log on top of the snapshot; returns how many entries it holds
+        if not os.path.exists(self.log_path):
+            return 0
+        entries, good_size = 0, 0
+        with open(self.log_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    break
+                if change['doc'] is None:
+                    self.docs.pop(change['id'], None)
+                else:
+                    self.docs[change['id']] = change['doc']
+                entries += 1
+                good_size += len(line)
+        if good_size < os.path.getsize(self.log_path):
+            # A torn last line from a crash; cut it off so the next append starts clean
+            print(f"Dropping a torn entry at the end of {self.log_path}")
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(good_size)
+        return entries
+
+    def _append_log(self):
+        # Called with both locks held
+        if not self._unsaved:
+            return
+        in_step = self._stamp() == self._disk_stamp
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps({'id': doc_id, 'doc': entry}) + '\n'
+                            for doc_id, entry in self._unsaved.items()))
+        self._log_entries += len(self._unsaved)
+        self._unsaved = {}
+        if in_step:
+            self._disk_stamp = self._stamp()
+
+    def save(self):
+        """
+        Appends the changes made since the last save to the log. Once the log has
+        grown large enough the snapshot is rewritten in a background thread.
+        """
+        with self._lock:
+            if self._unsaved:
+                handle = self._lock_file()
+                try:
+                    self._append_log()
+                finally:
+                    handle.close()
+            if (self._log_entries > max(COMPACT_MIN_LOG_ENTRIES, len(self.docs) * COMPACT_LOG_RATIO)
+                    and not self._compacting):
+                self._compacting = True
+                threading.Thread(target=self._compact_in_background, name='lexical-index-compact',
+                                 daemon=True).start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except OSError as e:
+            print(f"Could not compact the lexical index: {e}")
+        finally:
+            self._compacting = False
+
+    def compact(self):
+        """
+        Rewrites the snapshot with every change so far and empties the log. The
+        snapshot is written without holding either lock, so searches and updates
+        (in this process or others) carry on meanwhile; changes logged in the
+        meantime are kept.
+        """
+        with self._compact_lock:
+            with self._lock:
+                handle = self._lock_file()
+                try:
+                    self._append_log()
+                    if self._stamp() != self._disk_stamp:
+                        # Another process logged changes or compacted since we last
+                        # caught up; the snapshot must not drop them
+                        self._load()
+                    # Entries are replaced, never modified, so a shallow copy is a consistent view
+                    docs = dict(self.docs)
+                    snapshot_stamp = self._disk_stamp[0]
+                    log_offset = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+                finally:
+                    handle.close()
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'docs': docs}, f)
+            with self._lock:
+                handle = self._lock_file()
+                try:
+                    if self._stamp()[0] != snapshot_stamp:
+                        # Another process compacted in the meantime, so the log offset no longer applies
+                        os.remove(tmp_path)
+                        return
+                    self._append_log()
+                    in_step = self._stamp() == self._disk_stamp
+                    tail = b''
+                    if os.path.exists(self.log_path):
+                        with open(self.log_path, 'rb') as f:
+                            f.seek(log_offset)
+                            tail = f.read()
+                    os.replace(tmp_path, self.path)
+                    with open(self.log_path + '.tmp', 'wb') as f:
+                        f.write(tail)
+                    os.replace(self.log_path + '.tmp', self.log_path)
+                    self._log_entries = tail.count(b'\n')
+                    # If other processes logged during the write, their entries are in
+                    # the tail but not in self.docs, so the next compaction reloads
+                    self._disk_stamp = self._stamp() if in_step else None
+                finally:
+                    handle.close()
+
+    # --- Updates ---
+
+    def _set(self, doc_id, entry):
+        # Called with the lock held; None removes the document
+        if entry is None:
+            self.docs.pop(doc_id, None)
+        else:
+            self.docs[doc_id] = entry
+        if self._postings is not None:
+            if entry is None:
+                self._postings.remove(doc_id)
+            else:
+                self._postings.add(doc_id, entry)
+        self._unsaved[doc_id] = entry
+
+    def add_document(self, doc_id, text, mtime=None, save=True):
+        """
+        Adds or replaces a single document, e.g. right after an upload writes its .txt.
+        With save=True the change is appended to the log straight away.
+        """
+        tokens = tokenize(text)
+        terms = {}
+        for token in tokens:
+            terms[token] = terms.get(token, 0) + 1
+        with self._lock:
+            self._set(doc_id, {'mtime': mtime, 'length': len(tokens), 'terms': terms})
+            if save:
+                self.save()
+
+    def remove_document(self, doc_id, save=True):
+        with self._lock:
+            if doc_id in self.docs:
+                self._set(doc_id, None)
+                if save:
+                    self.save()
+
+    def sync_directory(self, resume_dir):
+        """
+        Brings the index in line with the .txt files in `resume_dir`, re-reading only
+        files that are new or modified since they were indexed. Returns how many
+        documents changed.
+        """
+        changed = 0
+        with self._lock:
+            on_disk = {}
+            for path in glob.glob(os.path.join(resume_dir, '*.txt')):
+                on_disk[os.path.basename(path)] = path
+            for doc_id in list(self.docs):
+                if doc_id not in on_disk:
+                    self.remove_document(doc_id, save=False)
+                    changed += 1
+            for doc_id, path in on_disk.items():
+                mtime = os.path.getmtime(path)
+                entry = self.docs.get(doc_id)
+                if entry is not None and entry.get('mtime') == mtime:
+                    continue
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        self.add_document(doc_id, f.read(), mtime=mtime, save=False)
+                    changed += 1
+                except OSError as e:
+                    print(f"Could not index {path}: {e}")
+            if changed:
+                self.save()
+        return changed
+
+    # --- Scoring ---
+
+    def score(self, query):
+        """
+        Returns a dict of doc_id -> BM25 score for every indexed document.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            # Built once, then kept up to date by every add and remove
+            if self._postings is None or self._postings.needs_rebuild:
+                self._postings = _Postings(self.docs)
+            return self._postings.score(terms)
+
+    def search(self, query, top_k=DEFAULT_TOP_K, min_score_ratio=DEFAULT_MIN_SCORE_RATIO, candidates=None):
+        """
+        Returns up to `top_k` `(score, doc_id)` tuples, best first. Documents scoring
+        below `min_score_ratio` times the best score are left out. A `top_k` of 0 or
+        None keeps every document above the cutoff. `candidates`, if given, limits
+        the search to those doc ids.
+        """
+        scored = sorted(((s, d) for d, s in self.score(query).items()
+                         if candidates is None or d in candidates), reverse=True)
+        if scored and min_score_ratio > 0:
+            cutoff = scored[0][0] * min_score_ratio
+            scored = [(s, d) for s, d in scored if s >= cutoff]
+        return scored[:top_k] if top_k else scored
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_lexical_index():
+    """
+    Process-wide index instance shared by every Streamlit session.
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = LexicalIndex()
+        return _default_index
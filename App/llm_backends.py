@@ -0,0 +1,311 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+
+# --- Backend Routing ---
+
+# Backend used when nothing else is configured
+DEFAULT_BACKEND = "gemini"
+
+# Tasks the helper functions in gemini_helper.py send to a backend
+TASKS = ("job_match", "recruiter_score", "batch_score", "tailored_bullets", "json_repair")
+# Seconds one model request may take before the client gives up (LLM_REQUEST_TIMEOUT setting)
+DEFAULT_REQUEST_TIMEOUT = 120
+
+_request_timeout = contextvars.ContextVar('request_timeout', default=None)
+
+
+class BackendUnavailableError(RuntimeError):
+    """
+    Raised when a backend can't serve requests, e.g. because its API key is missing.
+    """
+
+
+def _setting(name):
+    """
+    Reads a setting from the environment first, then from Streamlit secrets.
+    """
+    value = os.environ.get(name)
+    if value:
+        return value
+    try:
+        import streamlit as st
+        return st.secrets.get(name)
+    except Exception:
+        # No secrets file, or not running under Streamlit
+        return None
+
+
+@contextlib.contextmanager
+def request_timeout(seconds):
+    """
+    Caps every model request made inside the block at `seconds`, e.g. the
+    ScoringEngine's per-call timeout. Applies to the current thread only.
+    """
+    token = _request_timeout.set(seconds)
+    try:
+        yield
+    finally:
+        _request_timeout.reset(token)
+
+
+def current_request_timeout():
+    return _request_timeout.get() or float(_setting("LLM_REQUEST_TIMEOUT") or DEFAULT_REQUEST_TIMEOUT)
+
+
+def backend_name_for(task):
+    """
+    Which backend serves `task`. LLM_BACKEND_<TASK> (e.g. LLM_BACKEND_BATCH_SCORE=local)
+    routes one kind of traffic; LLM_BACKEND sets the default for everything else.
+    """
+    return (_setting(f"LLM_BACKEND_{task.upper()}") or _setting("LLM_BACKEND") or DEFAULT_BACKEND).lower()
+
+
+class LLMBackend:
+    """
+    Interface every backend implements.
+
+    `generate` receives the task name, the prompt parts built by gemini_helper.py,
+    the generation config for that task and the raw `inputs` the prompt was built
+    from, and returns the response text. Backends that call a real model use the
+    prompt; offline backends can work from the inputs instead.
+    """
+
+    name = "base"
+    # Default quotas for rate_limiter.py; None means unlimited
+    requests_per_minute = None
+    tokens_per_minute = None
+
+    @property
+    def cache_identity(self):
+        # Part of every cache key, so answers from different backends never mix
+        return self.name
+
+    def check(self):
+        """
+        Returns a message describing why the backend can't be used, or None if it can.
+        """
+        return None
+
+    def generate(self, task, prompt_parts, generation_config, inputs):
+        raise NotImplementedError
+
+    def stream(self, task, prompt_parts, generation_config, inputs):
+        """
+        Yields the response text in chunks as it is produced. Closing the generator
+        early stops the request. Backends without streaming yield a single chunk.
+        """
+        yield self.generate(task, prompt_parts, generation_config, inputs)
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini through google.generativeai. Nothing is configured until the first
+    request, so importing this module never needs an API key or the network.
+    """
+
+    name = "gemini"
+    model_name = "gemini-2.5-pro"
+    # Paid tier 1 quota for this model; set GEMINI_RPM / GEMINI_TPM to match your project
+    requests_per_minute = 150
+    tokens_per_minute = 2000000
+
+    # Safety settings (set to be permissive for the hackathon)
+    safety_settings = [
+        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+    ]
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self._configured = False
+
+    @property
+    def cache_identity(self):
+        return f"{self.name}:{self.model_name}"
+
+    def check(self):
+        if not _setting("GEMINI_API_KEY"):
+            return ("GEMINI_API_KEY not found in Streamlit secrets. "
+                    "Please add it to your .streamlit/secrets.toml file.")
+        return None
+
+    def _model(self, generation_config):
+        key = json.dumps(generation_config, sort_keys=True)
+        with self._lock:
+            if not self._configured:
+                problem = self.check()
+                if problem:
+                    raise BackendUnavailableError(problem)
+                import google.generativeai as genai
+                genai.configure(api_key=_setting("GEMINI_API_KEY"))
+                self._configured = True
+            model = self._models.get(key)
+            if model is None:
+                import google.generativeai as genai
+                model = self._models[key] = genai.GenerativeModel(
+                    model_name=self.model_name,
+                    generation_config=generation_config,
+                    safety_settings=self.safety_settings
+                )
+            return model
+
+    def generate(self, task, prompt_parts, generation_config, inputs):
+        # A request that hangs would otherwise hold its thread long after the caller gave up
+        return self._model(generation_config).generate_content(
+            prompt_parts, request_options={'timeout': current_request_timeout()}).text
+
+    def stream(self, task, prompt_parts, generation_config, inputs):
+        response = self._model(generation_config).generate_content(
+            prompt_parts, stream=True, request_options={'timeout': current_request_timeout()})
+        for chunk in response:
+            yield chunk.text
+
+
+class LocalLexicalBackend(LLMBackend):
+    """
+    Deterministic offline engine: scores by how much of the job description's
+    vocabulary the resume covers and answers in the same formats the prompts ask
+    Gemini for, so the whole parsing path is exercised. Needs no network, which
+    makes it suitable for load tests and for routing cheap traffic.
+
+    `latency` (seconds, or LOCAL_LLM_LATENCY) adds an artificial delay per call to
+    simulate a remote model.
+    """
+
+    name = "local"
+    version = "1"
+
+    def __init__(self, latency=None):
+        self.latency = float(latency if latency is not None else (_setting("LOCAL_LLM_LATENCY") or 0))
+
+    @property
+    def cache_identity(self):
+        return f"{self.name}:{self.version}"
+
+    @staticmethod
+    def _terms(text):
+        from lexical_index import tokenize
+        counts = {}
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0) + 1
+        return counts
+
+    def _match(self, resume_text, job_description):
+        jd_terms = self._terms(job_description)
+        resume_terms = self._terms(resume_text)
+        total = sum(jd_terms.values())
+        if not total:
+            return 0, [], []
+        covered = sum(count for term, count in jd_terms.items() if term in resume_terms)
+        by_weight = sorted(jd_terms, key=lambda term: (-jd_terms[term], term))
+        matched = [term for term in by_weight if term in resume_terms]
+        missing = [term for term in by_weight if term not in resume_terms]
+        return round(100 * covered / total), matched, missing
+
+    def generate(self, task, prompt_parts, generation_config, inputs):
+        if self.latency:
+            time.sleep(self.latency)
+        if task == "json_repair":
+            return self._repair(inputs["response_text"], inputs["schema"])
+        job_description = inputs["job_description"]
+
+        if task == "batch_score":
+            return json.dumps([{"id": short_id, "match_score": self._match(text, job_description)[0]}
+                               for short_id, text in inputs["resumes"]])
+
+        score, matched, missing = self._match(inputs["resume_text"], job_description)
+        if task == "recruiter_score":
+            return str(score)
+        if task == "job_match":
+            return json.dumps({
+                "match_score": score,
+                "strengths": [f"Experience with {term}" for term in matched[:3]],
+                "gaps": [f"No mention of {term}" for term in missing[:3]],
+                "suggestions": [f"Add a bullet showing hands-on {term} work" for term in missing[:3]],
+            })
+        if task == "tailored_bullets":
+            return "\n".join(f"• Applied {term} to deliver measurable results aligned with the role"
+                             for term in (matched[:2] + missing[:2]))
+        raise ValueError(f"Unknown task: {task}")
+
+    def stream(self, task, prompt_parts, generation_config, inputs):
+        # Chunked like a remote streaming response so early stopping is exercised
+        text = self.generate(task, prompt_parts, generation_config, inputs)
+        for start in range(0, len(text), 64):
+            yield text[start:start + 64]
+
+    @staticmethod
+    def _repair(response_text, schema):
+        # Drop a truncated trailing field, keep whatever survived and fill in the
+        # other lists; keys without a default (None) can't be invented
+        from json_stream import find_json
+        text = response_text[response_text.find('{'):]
+        found = find_json(text)
+        while found is None and ',' in text:
+            text = text[:text.rfind(',')]
+            found = find_json(text + '}')
+        found = found if isinstance(found, dict) else {}
+        return json.dumps({key: found.get(key, default) for key, default in schema.items()
+                           if key in found or default is not None})
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "local": LocalLexicalBackend,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def register_backend(name, factory):
+    """
+    Adds (or replaces) a backend, e.g. a stub in a test or a benchmark.
+    """
+    with _instances_lock:
+        BACKENDS[name] = factory
+        _instances.pop(name, None)
+
+
+def get_backend(task):
+    """
+    The backend instance that serves `task`, created on first use.
+    """
+    name = backend_name_for(task)
+    with _instances_lock:
+        backend = _instances.get(name)
+        if backend is None:
+            if name not in BACKENDS:
+                raise BackendUnavailableError(f"Unknown LLM backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+            backend = _instances[name] = BACKENDS[name]()
+        return backend
+
+
+def backend_problems():
+    """
+    Configuration problems for the backends currently routed to, one message each.
+    """
+    problems = []
+    for name in sorted({backend_name_for(task) for task in TASKS}):
+        if name not in BACKENDS:
+            problems.append(f"Unknown LLM backend '{name}'.")
+            continue
+        problem = get_backend_by_name(name).check()
+        if problem:
+            problems.append(problem)
+    return problems
+
+
+def get_backend_by_name(name):
+    with _instances_lock:
+        backend = _instances.get(name)
+        if backend is None:
+            backend = _instances[name] = BACKENDS[name]()
+        return backend
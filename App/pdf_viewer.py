@@ -0,0 +1,159 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+
+import streamlit as st
+
+# --- Viewer Settings ---
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Served by Streamlit at app/static/ when server.enableStaticServing is on (.streamlit/config.toml)
+STATIC_DIR = os.path.join(APP_DIR, 'static')
+STATIC_PDF_DIR = os.path.join(STATIC_DIR, 'resumes')
+# Published copies are public for as long as they exist, so they are deleted this
+# long after publishing (seconds); a later view publishes the file again
+PUBLISHED_MAX_AGE = 3600
+# How often publishing sweeps the folder for expired copies (seconds)
+PRUNE_INTERVAL = 300
+# Rendered page images, used when static serving is off
+THUMBNAIL_DIR = os.path.join(APP_DIR, 'pdf_thumbnails')
+THUMBNAIL_SCALE = 1.5
+VIEWER_WIDTH = 700
+VIEWER_HEIGHT = 1000
+
+_published = {}
+_published_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def _file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _digest_for(file_path):
+    # Hashing is done once per file version, not on every rerun
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime, stat.st_size)
+    with _published_lock:
+        digest = _published.get(key)
+    if digest is None:
+        digest = _file_digest(file_path)
+        with _published_lock:
+            _published[key] = digest
+    return digest
+
+
+def prune_published(max_age=PUBLISHED_MAX_AGE):
+    """
+    Deletes published PDFs older than `max_age` seconds. Returns how many were removed.
+    """
+    removed = 0
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(STATIC_PDF_DIR))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            # ctime, not mtime: a hard link shares the original's mtime but its
+            # creation updates the inode's ctime
+            if entry.is_file() and entry.stat().st_ctime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def publish_pdf(file_path):
+    """
+    Makes the PDF available under Streamlit's static route and returns its URL.
+    Files are named by content hash, so the URL can't be guessed from the
+    candidate's file name and each version is copied only once. The route has
+    no login, so anyone holding the URL can fetch the file until it is pruned
+    (PUBLISHED_MAX_AGE after publishing).
+    """
+    global _last_prune
+    with _published_lock:
+        prune = time.monotonic() - _last_prune >= PRUNE_INTERVAL
+        if prune:
+            _last_prune = time.monotonic()
+    if prune:
+        prune_published()
+    name = _digest_for(file_path) + '.pdf'
+    target = os.path.join(STATIC_PDF_DIR, name)
+    if not os.path.exists(target):
+        os.makedirs(STATIC_PDF_DIR, exist_ok=True)
+        try:
+            os.link(file_path, target)
+        except OSError:
+            # Different filesystem or no hard links: copy, then move into place atomically
+            tmp_path = target + '.tmp'
+            shutil.copyfile(file_path, tmp_path)
+            os.replace(tmp_path, target)
+    return f"app/static/resumes/{name}"
+
+
+def static_serving_enabled():
+    try:
+        return bool(st.get_option('server.enableStaticServing'))
+    except Exception:
+        return False
+
+
+def render_page(file_path, page_index, scale=THUMBNAIL_SCALE):
+    """
+    Renders one page to a PNG (cached on disk by content hash) and returns
+    `(png_path, page_count)`. Needs pypdfium2.
+    """
+    import pypdfium2 as pdfium
+    digest = _digest_for(file_path)
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        page_count = len(pdf)
+        page_index = max(0, min(page_index, page_count - 1))
+        png_path = os.path.join(THUMBNAIL_DIR, f"{digest}-{page_index}-{scale:g}.png")
+        if not os.path.exists(png_path):
+            os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+            image = pdf[page_index].render(scale=scale).to_pil()
+            image.save(png_path + '.tmp', format='PNG')
+            os.replace(png_path + '.tmp', png_path)
+    finally:
+        pdf.close()
+    return png_path, page_count
+
+
+def show_pdf(file_path, key=None):
+    """
+    Displays a PDF without pushing it through the websocket. By default one page
+    at a time is rendered to a cached image, if pypdfium2 is installed, or the
+    file is offered for download. With static serving turned on, the browser
+    streams the file from app/static/ instead, which makes it public for a while
+    (see publish_pdf).
+    """
+    if static_serving_enabled():
+        url = publish_pdf(file_path)
+        st.markdown(f'<iframe src="{url}" width="{VIEWER_WIDTH}" height="{VIEWER_HEIGHT}" '
+                    f'type="application/pdf"></iframe>', unsafe_allow_html=True)
+        return
+
+    key = key or os.path.basename(file_path)
+    try:
+        page = st.session_state.get(f"pdf_page_{key}", 1)
+        png_path, page_count = render_page(file_path, page - 1)
+        if page_count > 1:
+            st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count,
+                            key=f"pdf_page_{key}")
+        st.image(png_path, width=VIEWER_WIDTH)
+    except ImportError:
+        st.info("Install pypdfium2 (or turn on server.enableStaticServing, see .streamlit/config.toml) "
+                "to preview resumes here.")
+        with open(file_path, 'rb') as f:
+            st.download_button("Download PDF", f, file_name=os.path.basename(file_path),
+                               mime="application/pdf", key=f"pdf_download_{key}")
@@ -0,0 +1,196 @@
+import re
+import threading
+
+# --- Compaction Settings ---
+
+# Bump when the rules below change, so cached answers for old prompts aren't reused
+COMPACTION_VERSION = "2"
+# Approximate token budgets for the resume and the job description in one prompt
+RESUME_TOKEN_BUDGET = 3000
+JD_TOKEN_BUDGET = 1500
+# Lines this close to the top or bottom of a page may be running headers and footers
+PAGE_MARGIN_LINES = 2
+
+# Lines that start a new resume section
+SECTION_HEADINGS = re.compile(
+    r"^(professional\s+)?(summary|profile|objective|about me|experience|work experience|employment"
+    r"|employment history|professional experience|internships?|education|academic|skills|technical skills"
+    r"|key skills|core competencies|projects|academic projects|personal projects|certifications?"
+    r"|achievements|awards|accomplishments|publications|languages|interests|hobbies|activities"
+    r"|extra[- ]curricular activities|volunteer(ing)?|references|courses|coursework|training)\s*:?$",
+    re.IGNORECASE)
+# Layout leftovers from pdfminer3: bare bullets, page numbers, separators
+BOILERPLATE = re.compile(r"^([•◦▪●○■□\-–—*·|_=~.]+|page\s*\d+(\s*(of|/)\s*\d+)?|\d{1,3}|references available upon request)$",
+                         re.IGNORECASE)
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (about 4 characters per token) used for request budgeting.
+    """
+    return len(text) // 4 + 1
+
+
+def normalize_lines(text, drop_boilerplate=True):
+    """
+    Collapses layout whitespace and returns the non-empty lines. With
+    drop_boilerplate, layout leftovers (bare bullets, page numbers) are dropped
+    too, and so are running headers and footers: lines at the top (or bottom) of
+    a page, pages being separated by pdfminer's form feeds, that were already at
+    the top (or bottom) of an earlier page. Lines repeated anywhere else are kept.
+    """
+    lines, seen = [], {'top': set(), 'bottom': set()}
+    for page in text.replace('\r', '\n').split('\x0c'):
+        page_lines = [line for line in (re.sub(r'[ \t ]+', ' ', raw).strip() for raw in page.split('\n')) if line]
+        if not drop_boilerplate:
+            lines += page_lines
+            continue
+        margins = {'top': set(), 'bottom': set()}
+        for i, line in enumerate(page_lines):
+            if BOILERPLATE.match(line):
+                continue
+            key = line.lower()
+            regions = [region for region, in_region in (('top', i < PAGE_MARGIN_LINES),
+                                                        ('bottom', i >= len(page_lines) - PAGE_MARGIN_LINES))
+                       if in_region]
+            if any(key in seen[region] for region in regions):
+                continue
+            for region in regions:
+                margins[region].add(key)
+            lines.append(line)
+        for region in seen:
+            seen[region] |= margins[region]
+    return lines
+
+
+def segment_sections(lines):
+    """
+    Splits resume lines into `(heading, lines)` sections. Text before the first
+    recognised heading (usually name and contact details) gets the heading 'header'.
+    """
+    sections = [('header', [])]
+    for line in lines:
+        if len(line) <= 40 and SECTION_HEADINGS.match(line):
+            sections.append((line, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(heading, body) for heading, body in sections if body]
+
+
+def _relevance(lines, jd_terms):
+    from lexical_index import tokenize
+    tokens = tokenize(' '.join(lines))
+    if not tokens:
+        return 0.0
+    return sum(1 for token in tokens if token in jd_terms) / len(tokens) ** 0.5
+
+
+def _trim(lines, budget):
+    # Keep whole lines from the top of the text until the budget is spent
+    kept, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return kept
+
+
+class CompactionReport:
+    def __init__(self, original_tokens, compacted_tokens, dropped_sections=()):
+        self.original_tokens = original_tokens
+        self.compacted_tokens = compacted_tokens
+        self.dropped_sections = list(dropped_sections)
+
+    @property
+    def tokens_saved(self):
+        return max(self.original_tokens - self.compacted_tokens, 0)
+
+
+def compact_resume(resume_text, job_description, token_budget=RESUME_TOKEN_BUDGET):
+    """
+    Normalizes the resume's whitespace and, only if it is over `token_budget`,
+    drops boilerplate and running headers/footers, then keeps the sections most
+    relevant to the job description (the header always stays), in their
+    original order. Returns `(text, CompactionReport)`.
+    """
+    from lexical_index import tokenize
+    original_tokens = estimate_tokens(resume_text)
+    sections = segment_sections(normalize_lines(resume_text, drop_boilerplate=False))
+    costs = [sum(estimate_tokens(line) for line in body) for _, body in sections]
+    if sum(costs) > token_budget:
+        sections = segment_sections(normalize_lines(resume_text))
+        costs = [sum(estimate_tokens(line) for line in body) for _, body in sections]
+
+    dropped = []
+    if sum(costs) > token_budget:
+        jd_terms = set(tokenize(job_description))
+        ranked = sorted(range(len(sections)),
+                        key=lambda i: (sections[i][0] != 'header', -_relevance(sections[i][1], jd_terms)))
+        keep, used = {}, 0
+        for i in ranked:
+            heading, body = sections[i]
+            if used + costs[i] <= token_budget:
+                keep[i] = body
+                used += costs[i]
+            elif token_budget - used > 50:
+                # Partially fits: keep the top of the section
+                keep[i] = _trim(body, token_budget - used)
+                used += sum(estimate_tokens(line) for line in keep[i])
+            else:
+                dropped.append(heading)
+        sections = [(heading, keep[i]) for i, (heading, _) in enumerate(sections) if i in keep]
+
+    text = '\n'.join(line for _, body in sections for line in body)
+    return text, CompactionReport(original_tokens, estimate_tokens(text), dropped)
+
+
+def compact_job_description(job_description, token_budget=JD_TOKEN_BUDGET):
+    """
+    Normalizes the job description's whitespace and, only if it is over
+    `token_budget`, drops boilerplate and trims it from the top.
+    Returns `(text, CompactionReport)`.
+    """
+    original_tokens = estimate_tokens(job_description)
+    lines = normalize_lines(job_description, drop_boilerplate=False)
+    if sum(estimate_tokens(line) for line in lines) > token_budget:
+        lines = _trim(normalize_lines(job_description), token_budget)
+    text = '\n'.join(lines)
+    return text, CompactionReport(original_tokens, estimate_tokens(text))
+
+
+# --- Savings Accounting ---
+
+_totals = {'calls': 0, 'original_tokens': 0, 'compacted_tokens': 0}
+# task -> the same counters for that task alone
+_task_totals = {}
+_totals_lock = threading.Lock()
+
+
+def record_savings(task, *reports):
+    """
+    Adds the tokens saved for one model call to the process totals. Nothing is
+    logged per call, since a bulk ranking makes one per resume; the totals are
+    shown in the Recruiter settings (see compaction_stats).
+    """
+    original = sum(report.original_tokens for report in reports)
+    compacted = sum(report.compacted_tokens for report in reports)
+    with _totals_lock:
+        for totals in (_totals, _task_totals.setdefault(task, dict.fromkeys(_totals, 0))):
+            totals['calls'] += 1
+            totals['original_tokens'] += original
+            totals['compacted_tokens'] += compacted
+
+
+def compaction_stats():
+    """
+    Calls and tokens before/after compaction since the process started, overall
+    and per task under 'tasks'.
+    """
+    with _totals_lock:
+        stats = dict(_totals)
+        stats['tasks'] = {task: dict(totals) for task, totals in _task_totals.items()}
+    for totals in [stats, *stats['tasks'].values()]:
+        totals['tokens_saved'] = max(totals['original_tokens'] - totals['compacted_tokens'], 0)
+    return stats
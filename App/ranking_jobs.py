@@ -0,0 +1,361 @@
+"""
+Background ranking jobs for the Recruiter page.
+
+    python ranking_jobs.py                 # run a worker until interrupted
+    python ranking_jobs.py --once          # finish the queued jobs, then exit
+
+A ranking is submitted as a row in cv.db and picked up by a worker, either one
+of these processes or the worker thread the app starts itself (turn that off
+with RANKING_APP_WORKER = "0" when dedicated workers run). Every score is
+written as soon as it is known, so the page can show progress and partial
+results, a job outlives the Streamlit session that submitted it, and a job whose
+worker died is picked up again without re-scoring what was already done.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from db import DB_PATH, get_connection, get_writer
+from extraction_store import DEFAULT_RESUME_DIR
+from lexical_index import DEFAULT_TOP_K, DEFAULT_MIN_SCORE_RATIO
+from scoring_engine import DEFAULT_MAX_WORKERS, DEFAULT_TIMEOUT, DEFAULT_MAX_RETRIES
+
+# --- Job Settings ---
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+# Seconds between a running job's heartbeats (and cancel checks)
+HEARTBEAT_SECONDS = 5
+# A running job whose worker has been silent this long is handed to another worker
+STALE_AFTER_SECONDS = 120
+# Seconds an idle worker waits before looking for new jobs
+POLL_SECONDS = 2
+
+DEFAULT_JOB_SETTINGS = {
+    'resume_dir': DEFAULT_RESUME_DIR,
+    'top_k': DEFAULT_TOP_K,
+    'min_score_ratio': DEFAULT_MIN_SCORE_RATIO,
+    'apply_requirements': True,
+    'method': 'keyword',
+    'batched': False,
+    'max_workers': DEFAULT_MAX_WORKERS,
+    'timeout': DEFAULT_TIMEOUT,
+    'max_retries': DEFAULT_MAX_RETRIES,
+}
+
+
+class JobQueue:
+    """
+    Ranking jobs and their per-candidate results in cv.db. Claiming a job is one
+    transaction, so any number of worker threads and processes can share the queue.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+
+    def _connect(self):
+        return get_connection(self.db_path)
+
+    # --- Submitting and watching ---
+
+    def submit(self, job_description, owner=None, **settings):
+        """
+        Queues a ranking and returns its job id. `settings` override DEFAULT_JOB_SETTINGS.
+        """
+        unknown = set(settings) - set(DEFAULT_JOB_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown ranking job settings: {', '.join(sorted(unknown))}")
+        settings = {**DEFAULT_JOB_SETTINGS, **settings}
+        # Workers may run from another directory
+        settings['resume_dir'] = os.path.abspath(settings['resume_dir'])
+        job_id = uuid.uuid4().hex
+        get_writer(self.db_path).submit("""
+            INSERT INTO ranking_jobs (job_id, status, job_description, settings_json, owner, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (job_id, QUEUED, job_description, json.dumps(settings), owner, time.time()))
+        return job_id
+
+    @staticmethod
+    def _to_job(row):
+        job = dict(row)
+        job['settings'] = json.loads(job.pop('settings_json'))
+        return job
+
+    def get(self, job_id):
+        row = self._connect().execute("""
+            SELECT j.*, (SELECT COUNT(*) FROM ranking_job_results r WHERE r.job_id = j.job_id) AS done,
+                (SELECT COUNT(*) FROM ranking_job_failures f WHERE f.job_id = j.job_id) AS unscored
+            FROM ranking_jobs j WHERE j.job_id = ?
+        """, (job_id,)).fetchone()
+        return self._to_job(row) if row is not None else None
+
+    def recent(self, limit=20, owner=None):
+        """
+        Newest jobs first, with a `done` count of candidates scored so far and an
+        `unscored` count of candidates that failed.
+        """
+        rows = self._connect().execute("""
+            SELECT j.*, (SELECT COUNT(*) FROM ranking_job_results r WHERE r.job_id = j.job_id) AS done,
+                (SELECT COUNT(*) FROM ranking_job_failures f WHERE f.job_id = j.job_id) AS unscored
+            FROM ranking_jobs j WHERE (? IS NULL OR j.owner = ?)
+            ORDER BY j.created_at DESC LIMIT ?
+        """, (owner, owner, limit)).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def results(self, job_id):
+        """
+        `(score, candidate_id)` pairs recorded so far, best first.
+        """
+        rows = self._connect().execute(
+            'SELECT score, txt_name FROM ranking_job_results WHERE job_id = ? ORDER BY score DESC, txt_name',
+            (job_id,))
+        return [(row['score'], row['txt_name']) for row in rows]
+
+    def failures(self, job_id):
+        """
+        Candidates the job gave up on. They have no score and are never reused.
+        """
+        rows = self._connect().execute(
+            'SELECT txt_name FROM ranking_job_failures WHERE job_id = ? ORDER BY txt_name', (job_id,))
+        return [row['txt_name'] for row in rows]
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued job at once; a running one stops at its next heartbeat.
+        """
+        get_writer(self.db_path).submit("""
+            UPDATE ranking_jobs
+            SET status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                finished_at = CASE WHEN status = 'queued' THEN ? ELSE finished_at END,
+                cancel_requested = 1
+            WHERE job_id = ? AND status IN ('queued', 'running')
+        """, (time.time(), job_id))
+
+    # --- Worker side ---
+
+    def claim(self, worker_id):
+        """
+        Marks the oldest queued job (or a running one whose worker went silent)
+        as running under `worker_id` and returns it, or None if there is none.
+        """
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            # IMMEDIATE takes the write lock up front, so two workers can't claim the same job
+            conn.execute('BEGIN IMMEDIATE')
+            # A cancelled job whose worker died has nobody left to mark it finished
+            conn.execute("""
+                UPDATE ranking_jobs SET status = 'cancelled', finished_at = ?
+                WHERE status = 'running' AND cancel_requested = 1 AND heartbeat_at < ?
+            """, (now, now - STALE_AFTER_SECONDS))
+            row = conn.execute("""
+                SELECT job_id FROM ranking_jobs
+                WHERE status = 'queued' OR (status = 'running' AND heartbeat_at < ?)
+                ORDER BY created_at LIMIT 1
+            """, (now - STALE_AFTER_SECONDS,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("""
+                UPDATE ranking_jobs
+                SET status = 'running', worker_id = ?, attempts = attempts + 1,
+                    started_at = COALESCE(started_at, ?), heartbeat_at = ?
+                WHERE job_id = ?
+            """, (worker_id, now, now, row['job_id']))
+        return self.get(row['job_id'])
+
+    def heartbeat(self, job_id, worker_id):
+        """
+        Records that the worker is alive. Returns True if the job was cancelled
+        or taken over by another worker and should stop.
+        """
+        get_writer(self.db_path).submit(
+            'UPDATE ranking_jobs SET heartbeat_at = ? WHERE job_id = ? AND worker_id = ?',
+            (time.time(), job_id, worker_id))
+        row = self._connect().execute('SELECT cancel_requested, worker_id FROM ranking_jobs WHERE job_id = ?',
+                                      (job_id,)).fetchone()
+        return row is None or bool(row['cancel_requested']) or row['worker_id'] != worker_id
+
+    def set_total(self, job_id, total, fingerprint):
+        get_writer(self.db_path).submit('UPDATE ranking_jobs SET total = ?, fingerprint = ? WHERE job_id = ?',
+                                        (total, fingerprint, job_id))
+
+    def record(self, job_id, candidate_id, score, reused=False):
+        writer = get_writer(self.db_path)
+        writer.submit("""
+            INSERT OR REPLACE INTO ranking_job_results (job_id, txt_name, score, reused, scored_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (job_id, candidate_id, score, int(reused), time.time()), wait=False)
+        # A candidate that failed on an earlier attempt of the job has a score now
+        writer.submit('DELETE FROM ranking_job_failures WHERE job_id = ? AND txt_name = ?',
+                      (job_id, candidate_id), wait=False)
+
+    def record_failure(self, job_id, candidate_id, message):
+        """
+        Records a candidate that used up its retries. Failures stay out of the
+        results, so they neither rank last nor get reused by a later job.
+        """
+        writer = get_writer(self.db_path)
+        writer.submit("""
+            INSERT OR REPLACE INTO ranking_job_failures (job_id, txt_name, error, failed_at)
+            VALUES (?, ?, ?, ?)
+        """, (job_id, candidate_id, message, time.time()), wait=False)
+        self.record_error(job_id, message)
+
+    def record_error(self, job_id, message):
+        get_writer(self.db_path).submit(
+            'UPDATE ranking_jobs SET failed = failed + 1, error = ? WHERE job_id = ?',
+            (message, job_id), wait=False)
+
+    def finish(self, job_id, worker_id, status, error=None):
+        writer = get_writer(self.db_path)
+        # Results go in before the status says they are complete
+        writer.flush()
+        writer.submit("""
+            UPDATE ranking_jobs SET status = ?, error = COALESCE(?, error), finished_at = ?
+            WHERE job_id = ? AND worker_id = ?
+        """, (status, error, time.time(), job_id, worker_id))
+
+
+# --- Worker ---
+
+def run_job(job_queue, job, worker_id):
+    """
+    Runs one claimed job through the Recruiter ranking pipeline, recording each
+    score as it arrives. Scores stored by an earlier attempt are reused.
+    """
+    from candidate_profiles import ProfileStore
+    from ranking_pipeline import build_shortlist, ranking_fingerprint, score_resumes
+    from ranking_store import RankingStore
+
+    job_id, settings, job_description = job['job_id'], job['settings'], job['job_description']
+    # Profiles and stored scores live in the queue's database, which need not be the default cv.db
+    shortlist = build_shortlist(job_description, settings['resume_dir'], top_k=settings['top_k'],
+                                min_score_ratio=settings['min_score_ratio'],
+                                apply_requirements=settings['apply_requirements'], method=settings['method'],
+                                profile_store=ProfileStore(job_queue.db_path))
+    for candidate_id, e in shortlist.read_errors:
+        job_queue.record_error(job_id, f"Error reading {candidate_id}: {e}")
+
+    ranking_store = RankingStore(job_queue.db_path)
+    fingerprint = ranking_fingerprint(job_description, settings['batched'])
+    reused, resumes = ranking_store.split(fingerprint, shortlist.resumes)
+    resume_texts = dict(resumes)
+    job_queue.set_total(job_id, len(shortlist.resumes), fingerprint)
+    ranking_store.start_run(fingerprint, job_description)
+    for score, candidate_id in reused:
+        job_queue.record(job_id, candidate_id, score, reused=True)
+
+    cancel_event = threading.Event()
+    stopped = threading.Event()
+
+    def keep_alive():
+        while not stopped.wait(HEARTBEAT_SECONDS):
+            try:
+                if job_queue.heartbeat(job_id, worker_id):
+                    cancel_event.set()
+            except Exception as e:
+                print(f"Heartbeat for ranking job {job_id} failed: {e}")
+
+    def on_result(score, candidate_id, failed):
+        if failed:
+            # Recorded by on_error; no score is stored, so the next job scores the candidate again
+            return
+        ranking_store.record(fingerprint, candidate_id, resume_texts[candidate_id], score)
+        job_queue.record(job_id, candidate_id, score)
+
+    def on_error(candidate_id, error):
+        job_queue.record_failure(job_id, candidate_id, f"Error analyzing {candidate_id}: {error}")
+
+    heartbeat_thread = threading.Thread(target=keep_alive, name=f'ranking-job-{job_id[:8]}', daemon=True)
+    heartbeat_thread.start()
+    try:
+        score_resumes(resumes, job_description, batched=settings['batched'], max_workers=settings['max_workers'],
+                      timeout=settings['timeout'], max_retries=settings['max_retries'],
+                      on_result=on_result, on_error=on_error, cancel_event=cancel_event)
+    finally:
+        stopped.set()
+        heartbeat_thread.join()
+    return CANCELLED if cancel_event.is_set() else DONE
+
+
+def work(job_queue=None, worker_id=None, once=False, stop_event=None):
+    """
+    Claims and runs jobs until `stop_event` is set (or, with once=True, until
+    the queue is empty).
+    """
+    job_queue = job_queue or JobQueue()
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            job = job_queue.claim(worker_id)
+        except Exception as e:
+            print(f"Could not claim a ranking job: {e}")
+            job = None
+        if job is None:
+            if once:
+                return
+            stop_event.wait(POLL_SECONDS)
+            continue
+        try:
+            status = run_job(job_queue, job, worker_id)
+            job_queue.finish(job['job_id'], worker_id, status)
+        except Exception as e:
+            print(f"Ranking job {job['job_id']} failed: {e}")
+            job_queue.finish(job['job_id'], worker_id, FAILED, error=f"{type(e).__name__}: {e}")
+
+
+_app_worker = None
+_app_worker_lock = threading.Lock()
+
+
+def start_app_worker():
+    """
+    Starts one worker thread inside the Streamlit server process (once per
+    process), unless RANKING_APP_WORKER is "0". It keeps running across reruns
+    and sessions.
+    """
+    global _app_worker
+    from llm_backends import _setting
+    if str(_setting("RANKING_APP_WORKER") or "1") == "0":
+        return None
+    with _app_worker_lock:
+        if _app_worker is None or not _app_worker.is_alive():
+            _app_worker = threading.Thread(target=work, name='ranking-app-worker', daemon=True)
+            _app_worker.start()
+        return _app_worker
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue()
+        return _default_queue
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Recruiter ranking jobs queued in cv.db.")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database holding the job queue")
+    parser.add_argument('--once', action='store_true', help="exit when no job is waiting")
+    args = parser.parse_args(argv)
+    stop_event = threading.Event()
+    try:
+        work(JobQueue(args.db), once=args.once, stop_event=stop_event)
+    except KeyboardInterrupt:
+        # An interrupted job is picked up again once its heartbeat goes stale
+        stop_event.set()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import functools
+import os
+import threading
+import weakref
+
+from candidate_profiles import get_profile_store, parse_requirements
+from corpus_store import get_corpus_store
+from embedding_index import get_embedding_index
+from lexical_index import get_lexical_index, DEFAULT_TOP_K, DEFAULT_MIN_SCORE_RATIO
+from ranking_store import jd_fingerprint
+from scoring_engine import ScoringEngine, DEFAULT_MAX_WORKERS, DEFAULT_TIMEOUT, DEFAULT_MAX_RETRIES
+
+# --- Recruiter Ranking Pipeline ---
+
+# The non-UI steps behind the Recruiter page's "Rank Candidates" button, shared
+# with the benchmarks so they measure exactly what the page runs.
+
+# Pre-ranking methods for the shortlist: BM25 keywords or local embeddings
+SHORTLIST_METHODS = ('keyword', 'semantic')
+
+
+# Directory mtime per index and resume folder at its last sync
+_synced = weakref.WeakKeyDictionary()
+_synced_lock = threading.Lock()
+
+
+def _sync_if_changed(index, resume_dir):
+    # A full sync stats every file, so it only runs when a file was added, removed
+    # or renamed since this index last synced the folder. Uploads update the
+    # indexes themselves; a file edited in place by hand is picked up on the
+    # folder's next change or the next process start.
+    try:
+        stamp = os.stat(resume_dir).st_mtime_ns
+    except OSError:
+        stamp = None
+    resume_dir = os.path.abspath(resume_dir)
+    with _synced_lock:
+        if stamp is not None and _synced.get(index, {}).get(resume_dir) == stamp:
+            return
+    index.sync_directory(resume_dir)
+    with _synced_lock:
+        _synced.setdefault(index, {})[resume_dir] = stamp
+
+
+class Shortlist:
+    """
+    The candidates chosen for AI scoring, plus what the pre-filters did.
+    """
+
+    def __init__(self, resumes, corpus_size, requirements=None, qualified=None, read_errors=(), scores=None):
+        self.resumes = resumes              # [(candidate_id, resume_text)], best match first
+        self.scores = scores or {}          # candidate_id -> pre-ranking score (BM25 or cosine similarity)
+        self.corpus_size = corpus_size
+        self.requirements = requirements    # Requirements applied, or None
+        self.qualified = qualified          # how many resumes met them, or None
+        self.read_errors = list(read_errors)
+
+
+def build_shortlist(job_description, resume_dir, top_k=DEFAULT_TOP_K, min_score_ratio=DEFAULT_MIN_SCORE_RATIO,
+                    apply_requirements=True, method='keyword', lexical_index=None, corpus_store=None,
+                    profile_store=None, embedding_index=None):
+    """
+    Narrows the resumes in `resume_dir` down to the ones worth sending to the
+    model: hard requirements from the job description are checked in SQL, then
+    the survivors are ranked by BM25 (method='keyword') or by cosine similarity
+    of local embeddings (method='semantic') and cut to `top_k`.
+    """
+    if method not in SHORTLIST_METHODS:
+        raise ValueError(f"Unknown shortlist method: {method}")
+    lexical_index = lexical_index or get_lexical_index()
+    # Not `or`: an empty CorpusStore is falsy and would be swapped for the app's own
+    corpus_store = corpus_store if corpus_store is not None else get_corpus_store()
+    _sync_if_changed(lexical_index, resume_dir)
+    # Texts are read from the columnar store rather than one file open per resume
+    _sync_if_changed(corpus_store, resume_dir)
+    corpus = set(lexical_index.docs)
+
+    qualified, applied = None, None
+    requirements = parse_requirements(job_description)
+    if apply_requirements and requirements:
+        profile_store = profile_store or get_profile_store()
+        profile_store.ensure(sorted(corpus), corpus_store.text)
+        qualified = profile_store.filter(requirements) & corpus
+        applied = requirements
+
+    if method == 'semantic':
+        embedding_index = embedding_index or get_embedding_index()
+        _sync_if_changed(embedding_index, resume_dir)
+        search = embedding_index.search
+    else:
+        search = lexical_index.search
+    shortlist = search(job_description, top_k=top_k, min_score_ratio=min_score_ratio, candidates=qualified)
+    resumes, read_errors = [], []
+    for _, candidate_id in shortlist:
+        try:
+            resumes.append((candidate_id, corpus_store.text(candidate_id)))
+        except Exception as e:
+            read_errors.append((candidate_id, e))
+    return Shortlist(resumes, len(corpus), applied, None if qualified is None else len(qualified), read_errors,
+                     scores={candidate_id: score for score, candidate_id in shortlist})
+
+
+def scoring_task(batched):
+    return "batch_score" if batched else "job_match"
+
+
+def ranking_fingerprint(job_description, batched):
+    """
+    Fingerprint under which this ranking's scores are stored (see ranking_store.py).
+    """
+    from gemini_helper import PROMPT_VERSIONS
+    from llm_backends import get_backend
+    task = scoring_task(batched)
+    return jd_fingerprint(job_description, task, PROMPT_VERSIONS[task], get_backend(task).cache_identity)
+
+
+def score_resumes(resumes, job_description, batched=False, max_workers=DEFAULT_MAX_WORKERS,
+                  timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES, on_result=None, on_error=None,
+                  cancel_event=None, on_tick=None):
+    """
+    Scores `(candidate_id, resume_text)` pairs with the ScoringEngine, either one
+    detailed analysis per resume or batched quick scores. Returns the sorted
+    `(score, candidate_id)` list. The callbacks and `cancel_event` are passed on
+    to ScoringEngine.rank.
+    """
+    from gemini_helper import get_job_match_analysis, get_recruiter_match_scores_batch, pack_batches
+    engine = ScoringEngine(functools.partial(get_job_match_analysis, raise_errors=True),
+                           max_workers=max_workers, timeout=timeout, max_retries=max_retries)
+    if batched:
+        return engine.rank_batched(pack_batches(resumes, job_description), job_description,
+                                   get_recruiter_match_scores_batch, on_result=on_result, on_error=on_error,
+                                   cancel_event=cancel_event, on_tick=on_tick)
+    return engine.rank(resumes, job_description, on_result=on_result, on_error=on_error,
+                       cancel_event=cancel_event, on_tick=on_tick)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import re
+import threading
+import time
+
+from db import DB_PATH, get_connection, get_writer
+
+# --- Job Description Fingerprints ---
+
+# Bullets and separators that differ between copies of the same posting
+_DECORATION = re.compile(r"^[\s•◦▪●○■□\-–—*·>#|_=~.]+|[\s|_=~]+$")
+
+
+def normalize_job_description(job_description):
+    """
+    Canonical form of a job description: lower case, one space between words,
+    no bullets or blank lines. Re-pasting a posting with different spacing,
+    bullets or capitalisation gives the same text.
+    """
+    lines = []
+    for line in job_description.lower().splitlines():
+        line = _DECORATION.sub('', re.sub(r"\s+", " ", line))
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def jd_fingerprint(job_description, *settings):
+    """
+    Hash of the normalized job description plus whatever else decides the scores
+    (scoring task, prompt version, model), so rankings are only reused like-for-like.
+    """
+    payload = json.dumps([normalize_job_description(job_description), list(settings)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# --- Stored Rankings ---
+
+class RankingStore:
+    """
+    Completed ranking scores per job description fingerprint, kept in cv.db.
+    Each score remembers the hash of the resume text it was computed from, so a
+    resume that was re-uploaded with changes is scored again.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+
+    def scores(self, fingerprint):
+        """
+        Returns `{candidate_id: (text_hash, score)}` for everything stored so far.
+        """
+        rows = get_connection(self.db_path).execute(
+            'SELECT txt_name, text_hash, score FROM jd_ranking_scores WHERE fingerprint = ?', (fingerprint,))
+        return {row['txt_name']: (row['text_hash'], row['score']) for row in rows}
+
+    def split(self, fingerprint, resumes):
+        """
+        Splits `(candidate_id, resume_text)` pairs into stored `(score, candidate_id)`
+        results that can be reused and pairs that still need scoring.
+        """
+        stored = self.scores(fingerprint)
+        reused, to_score = [], []
+        for candidate_id, resume_text in resumes:
+            previous = stored.get(candidate_id)
+            if previous is not None and previous[0] == text_hash(resume_text):
+                reused.append((previous[1], candidate_id))
+            else:
+                to_score.append((candidate_id, resume_text))
+        return reused, to_score
+
+    def ranking(self, fingerprint, current_hashes):
+        """
+        `(score, candidate_id)` pairs stored for a fingerprint, best first, for the
+        candidates whose current text hash (from `current_hashes`) was the one scored.
+        """
+        ranking = [(score, candidate_id) for candidate_id, (scored_hash, score) in self.scores(fingerprint).items()
+                   if current_hashes.get(candidate_id) == scored_hash]
+        return sorted(ranking, key=lambda item: (-item[0], item[1]))
+
+    def start_run(self, fingerprint, job_description):
+        get_writer(self.db_path).submit("""
+            INSERT INTO jd_rankings (fingerprint, normalized_jd, created_at, updated_at, run_count)
+            VALUES (?, ?, ?, ?, 1)
+            ON CONFLICT (fingerprint) DO UPDATE SET updated_at = excluded.updated_at, run_count = run_count + 1
+        """, (fingerprint, normalize_job_description(job_description), time.time(), time.time()), wait=False)
+
+    def record(self, fingerprint, candidate_id, resume_text, score):
+        """
+        Stores one score as soon as it is known, so a stopped run keeps its progress.
+        """
+        get_writer(self.db_path).submit("""
+            INSERT OR REPLACE INTO jd_ranking_scores (fingerprint, txt_name, text_hash, score, scored_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (fingerprint, candidate_id, text_hash(resume_text), score, time.time()), wait=False)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_ranking_store():
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = RankingStore()
+        return _default_store
@@ -0,0 +1,285 @@
+import contextlib
+import contextvars
+import heapq
+import itertools
+import re
+import threading
+import time
+
+# --- Scheduler Settings ---
+
+# Request priorities: lower runs first
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+
+# How often one request is retried after the API answers 429 Too Many Requests
+MAX_RATE_LIMIT_RETRIES = 5
+# Longest pause after a 429 that carried no retry hint, in seconds
+MAX_BACKOFF = 60
+# How often a queued request checks whether its caller has given up on it, in seconds
+CANCEL_POLL_INTERVAL = 0.25
+
+# Requests run as bulk unless the calling code says otherwise (see request_priority)
+_priority = contextvars.ContextVar('request_priority', default=BULK)
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """
+    Runs the model calls made inside the block at `priority`, e.g. INTERACTIVE for
+    an analysis a user is waiting on. Applies to the current thread only.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RequestCancelled(Exception):
+    """
+    Raised instead of sending a queued request whose RequestControl was cancelled.
+    """
+
+
+class RequestControl:
+    """
+    Lets the code behind a model call follow its requests through the scheduler
+    queue and withdraw them. `queued()` is called when a request has to wait for
+    its turn and `admitted()` when it is let through after waiting; both run with
+    the scheduler locked, so they must be quick. After `cancel()`, requests still
+    waiting (or made later) raise RequestCancelled and are never sent.
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def queued(self):
+        pass
+
+    def admitted(self):
+        pass
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+# Requests follow the control set by the calling code, if any (see request_control)
+_control = contextvars.ContextVar('request_control', default=None)
+
+
+@contextlib.contextmanager
+def request_control(control):
+    """
+    Attaches `control` (a RequestControl) to the model calls made inside the
+    block. Applies to the current thread only.
+    """
+    token = _control.set(control)
+    try:
+        yield
+    finally:
+        _control.reset(token)
+
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute` units per minute, holding at most one
+    minute's worth.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount, now):
+        """
+        Seconds until `amount` units are available (0 if they are now).
+        """
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return max(amount - self.available, 0.0) / self.rate
+
+    def take(self, amount):
+        self.available -= min(amount, self.capacity)
+
+
+def is_rate_limited(error):
+    """
+    True for a 429 / quota-exhausted error from the model API.
+    """
+    if getattr(error, 'code', None) == 429 or getattr(error, 'status_code', None) == 429:
+        return True
+    if type(error).__name__ in ('ResourceExhausted', 'TooManyRequests', 'RateLimitError'):
+        return True
+    return '429' in str(error) or 'quota' in str(error).lower()
+
+
+def retry_hint(error):
+    """
+    Seconds the API asked us to wait before retrying, if the error says.
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('Retry-After'):
+            return float(headers['Retry-After'])
+    except (TypeError, ValueError):
+        pass
+    # Gemini puts a RetryInfo in the message: "retry_delay { seconds: 17 }" or "Please retry in 17.2s"
+    match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", str(error)) or \
+        re.search(r"retry in ([\d.]+)\s*s", str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+
+class RequestScheduler:
+    """
+    Admits model requests within a requests-per-minute and a tokens-per-minute
+    budget (token buckets; None means unlimited). Waiting requests are served by
+    priority, then in arrival order, so a user's analysis overtakes a bulk ranking.
+    A 429 pauses every request for the time the API asks for (or an exponential
+    backoff) and the request is retried instead of failing.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None,
+                 max_rate_limit_retries=MAX_RATE_LIMIT_RETRIES):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, arrival number)
+        self._arrivals = itertools.count()
+        self._cooldown_until = 0.0
+        self.in_flight = 0
+        self.completed = 0
+        self.rate_limited = 0
+
+    def _wait_time(self, tokens):
+        now = time.monotonic()
+        wait = self._cooldown_until - now
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.wait_time(1, now))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.wait_time(tokens, now))
+        return max(wait, 0.0)
+
+    def _acquire(self, ticket, tokens, control=None):
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self._cond.notify_all()
+            queued = False
+            try:
+                while True:
+                    if control is not None and control.cancelled.is_set():
+                        raise RequestCancelled("The request was cancelled while waiting for the rate limiter")
+                    wait = self._wait_time(tokens) if self._waiting[0] == ticket else None
+                    if wait == 0:
+                        if self.request_bucket is not None:
+                            self.request_bucket.take(1)
+                        if self.token_bucket is not None:
+                            self.token_bucket.take(tokens)
+                        self.in_flight += 1
+                        if queued:
+                            control.admitted()
+                        return
+                    if control is not None:
+                        if not queued:
+                            control.queued()
+                            queued = True
+                        # Wake up regularly so a cancelled request leaves the queue promptly
+                        wait = min(wait, CANCEL_POLL_INTERVAL) if wait is not None else CANCEL_POLL_INTERVAL
+                    self._cond.wait(wait)
+            finally:
+                # Admitted or abandoned, the next request in line gets to check its budget
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def _release(self, succeeded):
+        with self._cond:
+            self.in_flight -= 1
+            if succeeded:
+                self.completed += 1
+            self._cond.notify_all()
+
+    def run(self, fn, tokens=0, priority=None):
+        """
+        Calls `fn()` once the budgets allow a request of about `tokens` tokens, and
+        returns its result. Rate-limit errors are retried; anything else is raised.
+        A request whose RequestControl (see request_control) is cancelled before it
+        is admitted raises RequestCancelled without calling `fn`.
+        """
+        priority = _priority.get() if priority is None else priority
+        control = _control.get()
+        # Keep the arrival number across retries so a throttled request keeps its place
+        ticket = (priority, next(self._arrivals))
+        attempt = 0
+        while True:
+            self._acquire(ticket, tokens, control)
+            try:
+                result = fn()
+            except Exception as e:
+                self._release(False)
+                if not is_rate_limited(e) or attempt >= self.max_rate_limit_retries:
+                    raise
+                attempt += 1
+                delay = retry_hint(e) or min(2 ** attempt, MAX_BACKOFF)
+                with self._cond:
+                    self.rate_limited += 1
+                    self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+                print(f"Model API rate limit hit, pausing requests for {delay:.1f}s (retry {attempt})")
+                continue
+            self._release(True)
+            return result
+
+    def stats(self):
+        """
+        Queue depth per priority and throttling state, for the operator.
+        """
+        with self._cond:
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiting:
+                queued[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            return {
+                'queued': queued,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rate_limited': self.rate_limited,
+                'cooldown_seconds': max(self._cooldown_until - time.monotonic(), 0.0),
+            }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(backend):
+    """
+    The scheduler shared by every request to `backend`. Limits come from
+    <NAME>_RPM / <NAME>_TPM settings (e.g. GEMINI_RPM) or the backend's defaults.
+    """
+    from llm_backends import _setting
+    with _schedulers_lock:
+        scheduler = _schedulers.get(backend.name)
+        if scheduler is None:
+            prefix = backend.name.upper()
+            rpm = _setting(f"{prefix}_RPM") or backend.requests_per_minute
+            tpm = _setting(f"{prefix}_TPM") or backend.tokens_per_minute
+            scheduler = _schedulers[backend.name] = RequestScheduler(
+                float(rpm) if rpm else None, float(tpm) if tpm else None)
+        return scheduler
+
+
+def scheduler_stats():
+    """
+    stats() of every scheduler created so far, keyed by backend name.
+    """
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {name: scheduler.stats() for name, scheduler in schedulers.items()}
@@ -0,0 +1,196 @@
+import io
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# libraries used to parse the pdf files
+from pdfminer3.layout import LAParams
+from pdfminer3.pdfdocument import PDFDocument
+from pdfminer3.pdfpage import PDFPage, PDFTextExtractionNotAllowed
+from pdfminer3.pdfparser import PDFParser
+from pdfminer3.pdfinterp import PDFResourceManager
+from pdfminer3.pdfinterp import PDFPageInterpreter
+from pdfminer3.converter import TextConverter
+
+# --- Extraction Settings ---
+
+# Layout analysis presets. 'full' is pdfminer's default, which every stored text
+# was extracted with; the others are faster but may order or join lines
+# differently, so they are opt-in (PDF_LAYOUT setting) for plain, single-column PDFs.
+LAYOUT_PRESETS = {
+    'full': {},
+    # boxes_flow outside [-1, 1] skips grouping text boxes into reading order,
+    # the quadratic part of the layout pass
+    'fast': {'boxes_flow': 2.0},
+    # No layout analysis: text in content-stream order
+    'none': None,
+}
+DEFAULT_LAYOUT = 'full'
+# 'pdfminer' or 'pymupdf' (faster, needs the PyMuPDF package; text is close but not identical)
+DEFAULT_BACKEND = 'pdfminer'
+# Documents with at least this many pages are split across processes
+PARALLEL_MIN_PAGES = 4
+PAGES_PER_WORKER = 2
+
+
+def _option(name, default):
+    from llm_backends import _setting
+    return (_setting(name) or default).lower()
+
+
+def _laparams(layout):
+    if layout not in LAYOUT_PRESETS:
+        raise ValueError(f"Unknown PDF layout preset: {layout}")
+    preset = LAYOUT_PRESETS[layout]
+    return None if preset is None else LAParams(**preset)
+
+
+# --- pdfminer3 ---
+
+def _load_pages(fh):
+    # Parses the document structure once; the same page objects serve counting and extraction
+    document = PDFDocument(PDFParser(fh), caching=True)
+    if not document.is_extractable:
+        raise PDFTextExtractionNotAllowed(f"Text extraction is not allowed: {fh!r}")
+    return list(PDFPage.create_pages(document))
+
+
+def _extract_pages(document_pages, layout, first_page=0):
+    """
+    Runs pdfminer3 over the given pages (numbered from `first_page`, 0-based)
+    and returns one dict per page with its text and how long it took.
+    """
+    resource_manager = PDFResourceManager()
+    fake_file_handle = io.StringIO()
+    converter = TextConverter(resource_manager, fake_file_handle, laparams=_laparams(layout))
+    page_interpreter = PDFPageInterpreter(resource_manager, converter)
+    pages, spans = [], []
+    try:
+        for page_number, page in enumerate(document_pages, start=first_page + 1):
+            started = time.perf_counter()
+            start = fake_file_handle.tell()
+            page_interpreter.process_page(page)
+            spans.append((start, fake_file_handle.tell()))
+            x0, y0, x1, y1 = page.mediabox
+            pages.append({
+                'page_number': page_number,
+                'width': float(x1 - x0),
+                'height': float(y1 - y0),
+                'extract_ms': (time.perf_counter() - started) * 1000,
+            })
+        text = fake_file_handle.getvalue()
+        for page, (start, end) in zip(pages, spans):
+            page['text'] = text[start:end]
+    finally:
+        ## close open handles
+        converter.close()
+        fake_file_handle.close()
+    return pages
+
+
+def _extract_range(data, layout, first_page, last_page):
+    # Runs in a worker process; each worker parses its own copy of the document
+    return _extract_pages(_load_pages(io.BytesIO(data))[first_page:last_page], layout, first_page)
+
+
+# --- PyMuPDF ---
+
+def _extract_pages_pymupdf(data):
+    import fitz
+    pages = []
+    with fitz.open(stream=data, filetype='pdf') as document:
+        for page_number, page in enumerate(document, start=1):
+            started = time.perf_counter()
+            # pdfminer ends every page with a form feed; keep the same page separators
+            text = page.get_text() + '\x0c'
+            pages.append({
+                'page_number': page_number,
+                'width': float(page.rect.width),
+                'height': float(page.rect.height),
+                'text': text,
+                'extract_ms': (time.perf_counter() - started) * 1000,
+            })
+    return pages
+
+
+# --- Engine ---
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forking the multithreaded app server could copy a lock held by another
+            # thread into the child; workers start from a clean interpreter instead
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                        mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _parallel_workers(page_count, workers):
+    if workers is None:
+        if page_count < PARALLEL_MIN_PAGES:
+            return 1
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, math.ceil(page_count / PAGES_PER_WORKER)))
+
+
+# Extracts the text of a PDF together with per-page metadata
+def extract_pdf(fh, layout=None, workers=None, backend=None):
+    """
+    Extracts the text of an open binary PDF file object.
+
+    Returns `(text, pages)` where `pages` is a list of dicts with the page number,
+    its size in points, the slice of `text` that came from that page and the
+    milliseconds spent on it. Long documents are split into page ranges parsed
+    in parallel processes (`workers`: None picks by page count, 1 stays in this
+    process); the text is the same as a single pass, page by page.
+    """
+    layout = layout or _option("PDF_LAYOUT", DEFAULT_LAYOUT)
+    backend = backend or _option("PDF_BACKEND", DEFAULT_BACKEND)
+    if backend == 'pymupdf':
+        try:
+            page_results = _extract_pages_pymupdf(fh.read())
+        except ImportError:
+            print("PyMuPDF is not installed, extracting with pdfminer3")
+            fh.seek(0)
+            backend = 'pdfminer'
+    if backend == 'pdfminer':
+        document_pages = _load_pages(fh)
+        page_count = len(document_pages)
+        workers = _parallel_workers(page_count, workers)
+        if workers == 1:
+            page_results = _extract_pages(document_pages, layout)
+        else:
+            fh.seek(0)
+            data = fh.read()
+            step = math.ceil(page_count / workers)
+            futures = [_get_pool().submit(_extract_range, data, layout, first, min(first + step, page_count))
+                       for first in range(0, page_count, step)]
+            page_results = [page for future in futures for page in future.result()]
+    elif backend != 'pymupdf':
+        raise ValueError(f"Unknown PDF backend: {backend}")
+
+    texts, pages, offset = [], [], 0
+    for page in page_results:
+        page_text = page.pop('text')
+        page['char_offset'] = offset
+        page['char_count'] = len(page_text)
+        offset += len(page_text)
+        texts.append(page_text)
+        pages.append(page)
+    return ''.join(texts), pages
+
+
+# Reads Pdf file and check_extractable
+def pdf_reader(file):
+    with open(file, 'rb') as fh:
+        text, _ = extract_pdf(fh)
+    return text
@@ -0,0 +1,338 @@
+import time
+import random
+import heapq
+import threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+from llm_backends import request_timeout
+from rate_limiter import RequestControl, request_control
+
+# --- Engine Defaults ---
+
+# How many model calls may be in flight at once
+DEFAULT_MAX_WORKERS = 8
+# Seconds a single scoring call may run before it is abandoned and retried, not
+# counting time its requests spend queued for the rate limiter; model requests
+# made by the call are given the same timeout, so they end too
+DEFAULT_TIMEOUT = 90
+# Extra attempts after the first failure (so 2 means up to 3 calls per resume)
+DEFAULT_MAX_RETRIES = 2
+# Base delay for exponential backoff between attempts, in seconds
+DEFAULT_BACKOFF = 1.0
+# Longest the engine waits between on_tick calls and cancel checks, in seconds
+TICK_INTERVAL = 0.25
+
+
+class Leaderboard:
+    """
+    Live top-N view of a ranking in progress. Scores are kept in a min-heap of size N,
+    so each new result costs O(log N) no matter how large the candidate pool is.
+    """
+
+    def __init__(self, total, top_n=10):
+        self.total = total
+        self.top_n = top_n
+        self.done = 0
+        self.started_at = time.monotonic()
+        self._heap = []
+        self._counter = 0
+
+    def add(self, score, candidate_id, counted=True):
+        """
+        Adds a result. Pass counted=False for results that were known before the
+        run started (e.g. reused scores), so progress and ETA only cover new work.
+        """
+        if counted:
+            self.done += 1
+        self._counter += 1
+        # The counter breaks ties so candidate ids never need to be compared
+        entry = (score, -self._counter, candidate_id)
+        if len(self._heap) < self.top_n:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def skip(self):
+        """
+        Counts a candidate that finished without a score, so progress still adds up.
+        """
+        self.done += 1
+
+    def top(self):
+        """
+        Current best `(score, candidate_id)` tuples, best first.
+        """
+        return [(score, candidate_id) for score, _, candidate_id in sorted(self._heap, reverse=True)]
+
+    @property
+    def fraction_done(self):
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def eta_seconds(self):
+        """
+        Estimated seconds left at the current average rate, or None before the first result.
+        """
+        if not self.done:
+            return None
+        return self.elapsed / self.done * (self.total - self.done)
+
+
+class ScoringJob:
+    """
+    One resume waiting to be (re)scored.
+    """
+
+    def __init__(self, candidate_id, resume_text):
+        self.candidate_id = candidate_id
+        self.resume_text = resume_text
+        self.attempt = 0
+        self.call = None
+        self.not_before = 0.0
+        self.last_error = None
+
+
+class ScoringCall(RequestControl):
+    """
+    One attempt at a job. Its clock is paused while its model requests wait in the
+    rate limiter's queue, so only time spent on the requests themselves counts
+    towards the engine's timeout. Each attempt has its own, so a call that was
+    abandoned can't touch the clock of the retry that replaced it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.started_at = time.monotonic()
+        self.paused_at = None
+
+    def queued(self):
+        self.paused_at = time.monotonic()
+
+    def admitted(self):
+        self.started_at += time.monotonic() - self.paused_at
+        self.paused_at = None
+
+    def running_for(self, now):
+        """
+        Seconds the call has run, or None while it is queued.
+        """
+        if self.paused_at is not None:
+            return None
+        return now - self.started_at
+
+
+class ScoringEngine:
+    """
+    Scores many resumes against one job description with a bounded number of
+    concurrent model calls, a per-call timeout and retry with exponential backoff.
+
+    `score_fn(resume_text, job_description)` is any callable returning either an
+    analysis dict (with a 'match_score' key) or a bare number. It should raise on
+    failure so that the engine can retry; a local stand-in works just as well as
+    the Gemini helper.
+    """
+
+    def __init__(self, score_fn, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.score_fn = score_fn
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def _backoff_delay(self, attempt):
+        # Exponential backoff with a little jitter so retries don't line up
+        delay = self.backoff * (2 ** (attempt - 1))
+        return delay + random.uniform(0, delay * 0.1)
+
+    def _run_job(self, score_fn, call, resume_text, job_description):
+        with request_timeout(self.timeout), request_control(call):
+            return score_fn(resume_text, job_description)
+
+    def _start(self, score_fn, job, job_description):
+        # Each attempt runs on a thread of its own instead of a fixed pool, so a call
+        # abandoned after its timeout never holds a slot that a retry is waiting for
+        future = Future()
+        call = job.call = ScoringCall()
+        resume_text = job.resume_text
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(self._run_job(score_fn, call, resume_text, job_description))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name=f'scoring-{job.candidate_id}', daemon=True).start()
+        return future
+
+    @staticmethod
+    def _extract_score(result):
+        if isinstance(result, dict):
+            return result.get('match_score', 0)
+        return result
+
+    def rank(self, resumes, job_description, on_result=None, on_error=None, cancel_event=None, on_tick=None):
+        """
+        Scores every `(candidate_id, resume_text)` pair in `resumes`.
+
+        `on_result(score, candidate_id, failed)` is called from the calling thread as
+        soon as each candidate finishes, which makes it safe to update Streamlit state
+        from it. `on_error(candidate_id, exception)` is called once a candidate has
+        used up all of its retries; that candidate is then reported to `on_result`
+        with failed=True and a score of None, and left out of the result, so a
+        failure is never mistaken for (or stored as) a real score of 0.
+        Setting `cancel_event` (a threading.Event) stops the ranking early; candidates
+        not yet scored are left out of the result. `on_tick()` is called from the
+        calling thread at least every TICK_INTERVAL seconds while the engine waits;
+        an exception it raises stops the ranking the same way (see _run).
+
+        Returns the list of `(score, candidate_id)` tuples sorted best match first.
+        """
+        results = []
+
+        def report(candidate_id, score, failed=False):
+            if not failed:
+                results.append((score, candidate_id))
+            if on_result is not None:
+                on_result(score, candidate_id, failed)
+
+        def finish(job, result):
+            report(job.candidate_id, self._extract_score(result))
+
+        def give_up(job, error):
+            if on_error is not None:
+                on_error(job.candidate_id, error)
+            report(job.candidate_id, None, failed=True)
+
+        jobs = [ScoringJob(candidate_id, text) for candidate_id, text in resumes]
+        self._run(jobs, job_description, self.score_fn, finish, give_up, cancel_event, on_tick)
+        results.sort(key=lambda item: item[0], reverse=True)
+        return results
+
+    def rank_batched(self, batches, job_description, batch_score_fn, on_result=None, on_error=None,
+                     cancel_event=None, on_tick=None):
+        """
+        Like `rank`, but each unit of work is a whole batch of `(candidate_id, resume_text)`
+        pairs scored by one call to `batch_score_fn(batch, job_description)`, which must
+        return a dict of candidate_id -> score. Results are still reported per candidate;
+        candidates missing from that dict are retried in a smaller batch, then reported
+        as failed like in `rank`.
+        """
+        results = []
+
+        def report(candidate_id, score, failed=False):
+            if not failed:
+                results.append((score, candidate_id))
+            if on_result is not None:
+                on_result(score, candidate_id, failed)
+
+        def finish(job, scores):
+            missing = []
+            for candidate_id, resume_text in job.resume_text:
+                if candidate_id in scores:
+                    report(candidate_id, scores[candidate_id])
+                else:
+                    missing.append((candidate_id, resume_text))
+            if missing:
+                # Only the candidates without a score go round again
+                job.resume_text = missing
+                return ValueError(f"{len(missing)} candidates in the batch were not scored")
+            return None
+
+        def give_up(job, error):
+            for candidate_id, _ in job.resume_text:
+                if on_error is not None:
+                    on_error(candidate_id, error)
+                report(candidate_id, None, failed=True)
+
+        jobs = [ScoringJob(f"batch {i + 1}", batch) for i, batch in enumerate(batches)]
+        self._run(jobs, job_description, batch_score_fn, finish, give_up, cancel_event, on_tick)
+        results.sort(key=lambda item: item[0], reverse=True)
+        return results
+
+    def _run(self, jobs, job_description, score_fn, finish, give_up, cancel_event=None, on_tick=None):
+        queue = list(reversed(jobs))  # pop() from the end keeps the original order
+        in_flight = {}
+
+        def fail(job, error):
+            job.last_error = error
+            if job.attempt <= self.max_retries:
+                job.call = None
+                job.not_before = time.monotonic() + self._backoff_delay(job.attempt)
+                queue.insert(0, job)
+            else:
+                give_up(job, error)
+
+        try:
+            while queue or in_flight:
+                if cancel_event is not None and cancel_event.is_set():
+                    print(f"Ranking cancelled with {len(queue) + len(in_flight)} jobs left")
+                    break
+                if on_tick is not None:
+                    on_tick()
+                # Fill free slots with jobs whose backoff has expired
+                now = time.monotonic()
+                waiting = []
+                while queue and len(in_flight) < self.max_workers:
+                    job = queue.pop()
+                    if job.not_before > now:
+                        waiting.append(job)
+                        continue
+                    job.attempt += 1
+                    in_flight[self._start(score_fn, job, job_description)] = job
+                queue.extend(reversed(waiting))
+
+                # Sleep until something finishes, a call times out or a backoff expires
+                wake_up = [job.not_before - now for job in waiting]
+                for job in in_flight.values():
+                    running_for = job.call.running_for(now)
+                    # A queued call has no deadline yet; look again soon in case it is let through
+                    wake_up.append(TICK_INTERVAL if running_for is None else self.timeout - running_for)
+                wait_for = max(min(wake_up), 0.01) if wake_up else None
+                if cancel_event is not None or on_tick is not None:
+                    # Wake up regularly so a cancel request is noticed promptly
+                    wait_for = min(wait_for, TICK_INTERVAL) if wait_for is not None else TICK_INTERVAL
+                if not in_flight:
+                    time.sleep(wait_for or 0.01)
+                    continue
+                done, _ = wait(in_flight, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    job = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Scoring attempt {job.attempt} failed for {job.candidate_id}: {e}")
+                        fail(job, e)
+                        continue
+                    # finish() returns an error when part of the job still needs another attempt
+                    error = finish(job, result)
+                    if error is not None:
+                        print(f"Scoring attempt {job.attempt} incomplete for {job.candidate_id}: {error}")
+                        fail(job, error)
+
+                # Abandon calls that ran past their deadline and count them out of the
+                # in-flight slots; the thread ends when its request times out, and its
+                # result is ignored. Requests it still had queued are withdrawn.
+                now = time.monotonic()
+                for future, job in list(in_flight.items()):
+                    running_for = job.call.running_for(now)
+                    if running_for is not None and running_for > self.timeout:
+                        future.cancel()
+                        job.call.cancel()
+                        del in_flight[future]
+                        print(f"Scoring attempt {job.attempt} timed out for {job.candidate_id}")
+                        fail(job, TimeoutError(f"Timed out after {self.timeout}s"))
+        finally:
+            # Calls still running when the ranking ends (cancelled, or interrupted by an
+            # exception from a callback) send no further requests; ones already sent
+            # finish on their own
+            for job in in_flight.values():
+                job.call.cancel()
@@ -0,0 +1,179 @@
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# --- Budget Settings ---
+
+# Soft cap on what one session keeps in st.session_state (SESSION_BUDGET_KB setting)
+DEFAULT_BUDGET_BYTES = 512 * 1024
+# Candidates shown per page of the Recruiter results
+RESULTS_PAGE_SIZE = 25
+# Sessions not seen for this long drop out of the monitoring totals
+SESSION_STATS_TTL = 3600
+
+# Session state key holding details paged in from the stores, least recently used first
+PAGED_KEY = '_paged_details'
+SESSION_ID_KEY = '_session_id'
+
+
+class CompactRanking:
+    """
+    A ranking kept as an int16 score array plus candidate ids packed into one
+    string with an offsets array, best first. Iterates as `(score, candidate_id)`
+    pairs like the list of tuples it replaces, at a fraction of the memory.
+    """
+
+    def __init__(self, scores, packed_ids, offsets):
+        self.scores = scores
+        self._packed_ids = packed_ids
+        self._offsets = offsets
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        # NumPy is only loaded once a ranking exists, keeping it off the startup path
+        import numpy as np
+        pairs = sorted(pairs, reverse=True)
+        scores = np.array([score for score, _ in pairs], dtype=np.int16)
+        ids = [candidate_id for _, candidate_id in pairs]
+        offsets = np.zeros(len(ids) + 1, dtype=np.int32)
+        np.cumsum([len(candidate_id) for candidate_id in ids], out=offsets[1:])
+        return cls(scores, ''.join(ids), offsets)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def _id(self, i):
+        return self._packed_ids[self._offsets[i]:self._offsets[i + 1]]
+
+    def __getitem__(self, i):
+        return int(self.scores[i]), self._id(i)
+
+    def __iter__(self):
+        return self.page(0, len(self))
+
+    def page(self, start, stop):
+        """
+        `(score, candidate_id)` pairs for ranks [start, stop).
+        """
+        for i in range(start, min(stop, len(self))):
+            yield self[i]
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + self.scores.nbytes + sys.getsizeof(self._packed_ids) + self._offsets.nbytes
+
+
+def compact_ranking(state, key='ranked_candidates'):
+    """
+    Replaces a list of `(score, candidate_id)` pairs in session state with a
+    CompactRanking and returns it. A ranking that is already compact is returned as is.
+    """
+    ranking = state.get(key)
+    if ranking is not None and not isinstance(ranking, CompactRanking):
+        ranking = state[key] = CompactRanking.from_pairs(ranking)
+    return ranking
+
+
+# --- Paged Details ---
+
+def page_in(state, key, loader):
+    """
+    Returns a detail (resume text, an AI analysis, ...) for this session,
+    calling `loader()` to fetch it from its persistent store if it isn't held.
+    Held details are the first to go when the session is over budget.
+    """
+    paged = state.get(PAGED_KEY)
+    if paged is None:
+        paged = state[PAGED_KEY] = OrderedDict()
+    if key in paged:
+        paged.move_to_end(key)
+        return paged[key]
+    value = paged[key] = loader()
+    return value
+
+
+# --- Footprint ---
+
+def _deep_size(value, seen):
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value, 0)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen) for item in value)
+    return size
+
+
+def footprint(state):
+    """
+    Approximate bytes held per session state key. Objects are measured through
+    containers but not through their attributes, so the figure is a lower bound.
+    """
+    seen = set()
+    sizes = {}
+    for key in list(state.keys()):
+        try:
+            sizes[key] = _deep_size(state[key], seen)
+        except Exception:
+            sizes[key] = 0
+    return sizes
+
+
+# --- Budget ---
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def budget_bytes():
+    from llm_backends import _setting
+    budget_kb = _setting("SESSION_BUDGET_KB")
+    return int(float(budget_kb) * 1024) if budget_kb else DEFAULT_BUDGET_BYTES
+
+
+def enforce_budget(state, budget=None):
+    """
+    Evicts paged-in details, least recently used first, until the session is
+    within `budget` bytes, then records its footprint for session_stats().
+    Returns the session's footprint in bytes.
+    """
+    budget = budget or budget_bytes()
+    session_id = state.get(SESSION_ID_KEY)
+    if session_id is None:
+        session_id = state[SESSION_ID_KEY] = uuid.uuid4().hex
+    sizes = footprint(state)
+    total = sum(sizes.values())
+    evicted = 0
+    paged = state.get(PAGED_KEY)
+    while total > budget and paged:
+        _, value = paged.popitem(last=False)
+        total -= _deep_size(value, set())
+        evicted += 1
+    with _sessions_lock:
+        entry = _sessions.setdefault(session_id, {'evictions': 0})
+        entry.update(bytes=total, budget=budget, over_budget=total > budget, updated_at=time.time(),
+                     largest=max(sizes, key=sizes.get) if sizes else None)
+        entry['evictions'] += evicted
+    return total
+
+
+def session_stats():
+    """
+    Footprint of every session seen within SESSION_STATS_TTL, for monitoring.
+    """
+    cutoff = time.time() - SESSION_STATS_TTL
+    with _sessions_lock:
+        for session_id in [s for s, entry in _sessions.items() if entry['updated_at'] < cutoff]:
+            del _sessions[session_id]
+        sessions = {session_id: dict(entry) for session_id, entry in _sessions.items()}
+    return {
+        'sessions': len(sessions),
+        'total_bytes': sum(entry['bytes'] for entry in sessions.values()),
+        'max_bytes': max((entry['bytes'] for entry in sessions.values()), default=0),
+        'over_budget': sum(entry['over_budget'] for entry in sessions.values()),
+        'evictions': sum(entry['evictions'] for entry in sessions.values()),
+        'per_session': sessions,
+    }
@@ -0,0 +1,149 @@
+import os
+import platform
+import socket
+import threading
+import time
+
+# --- Lookup Settings ---
+
+# Seconds the location lookup may take before it is given up on
+LOOKUP_TIMEOUT = 3
+# Seconds a successful location lookup is reused across sessions
+LOCATION_CACHE_TTL = 3600
+
+NOT_FOUND = 'Not Found'
+
+
+class LocationProvider:
+    """
+    Interface for looking up an approximate location. Implementations return a
+    dict with 'city', 'state', 'country' and 'latlong' and may raise on failure.
+    """
+
+    def locate(self, timeout):
+        raise NotImplementedError
+
+
+class GeocoderLocationProvider(LocationProvider):
+    """
+    IP-based lookup with geocoder, reverse-geocoded through Nominatim.
+    """
+
+    def locate(self, timeout):
+        # Imported here so the network libraries only load when a lookup runs
+        import geocoder
+        from geopy.geocoders import Nominatim
+
+        latlong = geocoder.ip('me', timeout=timeout).latlng
+        location = {'city': NOT_FOUND, 'state': NOT_FOUND, 'country': NOT_FOUND, 'latlong': latlong}
+        if latlong:
+            geolocator = Nominatim(user_agent="http", timeout=timeout)
+            found = geolocator.reverse(latlong, language='en')
+            if found and 'address' in found.raw:
+                address = found.raw['address']
+                location.update(city=address.get('city', ''), state=address.get('state', ''),
+                                country=address.get('country', ''))
+        return location
+
+
+class StaticLocationProvider(LocationProvider):
+    """
+    Returns a fixed location after an optional delay; for tests and offline runs.
+    """
+
+    def __init__(self, location=None, delay=0.0):
+        self.location = location or {'city': NOT_FOUND, 'state': NOT_FOUND,
+                                     'country': NOT_FOUND, 'latlong': None}
+        self.delay = delay
+
+    def locate(self, timeout):
+        if self.delay:
+            time.sleep(self.delay)
+        return dict(self.location)
+
+
+def default_metadata():
+    return {
+        'host_name': NOT_FOUND,
+        'ip_add': NOT_FOUND,
+        'dev_user': NOT_FOUND,
+        'os_name_ver': platform.system() + " " + platform.release(),
+        'city': NOT_FOUND,
+        'state': NOT_FOUND,
+        'country': NOT_FOUND,
+        'latlong': None,
+    }
+
+
+_location_cache = {}
+_location_cache_lock = threading.Lock()
+
+
+class SessionMetadataCollector:
+    """
+    Collects device and location details for one session on a background thread.
+    Nothing here ever blocks the page: `snapshot()` returns whatever is known so far,
+    and a lookup that fails or runs past its timeout just leaves the defaults.
+    """
+
+    def __init__(self, provider=None, timeout=LOOKUP_TIMEOUT, cache_ttl=LOCATION_CACHE_TTL):
+        self.provider = provider or GeocoderLocationProvider()
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self._data = default_metadata()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.done = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._collect, name='session-metadata', daemon=True)
+            self._thread.start()
+        return self
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._data)
+
+    def _update(self, **values):
+        with self._lock:
+            self._data.update(values)
+
+    def _collect(self):
+        try:
+            host_name = socket.gethostname()
+            self._update(host_name=host_name)
+            self._update(ip_add=socket.gethostbyname(host_name))
+        except OSError as e:
+            print(f"Could not resolve host address: {e}")
+        try:
+            self._update(dev_user=os.getlogin())
+        except OSError:
+            pass  # no controlling terminal, e.g. when running as a service
+        self._update(**self._lookup_location())
+        self.done.set()
+
+    def _lookup_location(self):
+        cache_key = type(self.provider).__name__
+        with _location_cache_lock:
+            cached = _location_cache.get(cache_key)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_ttl:
+            return cached[1]
+
+        # Run the provider on its own thread so a hung network call can be abandoned
+        result = {}
+
+        def call():
+            try:
+                result.update(self.provider.locate(self.timeout))
+            except Exception as e:
+                print(f"Location lookup failed: {e}")
+
+        worker = threading.Thread(target=call, name='location-lookup', daemon=True)
+        worker.start()
+        worker.join(self.timeout)
+        if worker.is_alive() or not result:
+            return {}
+        with _location_cache_lock:
+            _location_cache[cache_key] = (time.monotonic(), result)
+        return result
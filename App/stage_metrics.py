@@ -0,0 +1,70 @@
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+from db import DB_PATH, get_connection, get_writer
+
+
+class StageRecorder:
+    """
+    Times the named stages of one run (e.g. one resume analysis) and saves them to
+    the stage_metrics table. `on_stage(name)` is called as each stage starts, which
+    is what drives the progress bars in App.py.
+    """
+
+    def __init__(self, flow, on_stage=None):
+        self.flow = flow
+        self.run_id = uuid.uuid4().hex
+        self.on_stage = on_stage
+        self.timings = []  # (stage, seconds, success)
+
+    @contextmanager
+    def stage(self, name):
+        if self.on_stage is not None:
+            self.on_stage(name)
+        started = time.perf_counter()
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            self.timings.append((name, time.perf_counter() - started, success))
+
+    def save(self, db_path=DB_PATH):
+        now = time.time()
+        try:
+            writer = get_writer(db_path)
+            # Metrics don't need to be durable before the page moves on
+            for stage_name, seconds, success in self.timings:
+                writer.submit("""
+                    INSERT INTO stage_metrics (run_id, flow, stage, duration_ms, success, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (self.run_id, self.flow, stage_name, seconds * 1000, int(success), now), wait=False)
+        except sqlite3.Error as e:
+            # Metrics are best effort and must never break the page
+            print(f"Could not save stage metrics: {e}")
+
+
+def stage(recorder, name):
+    """
+    `recorder.stage(name)`, or a no-op context when no recorder was passed in.
+    """
+    return recorder.stage(name) if recorder is not None else nullcontext()
+
+
+def stage_summary(db_path=DB_PATH, since=None):
+    """
+    Per flow and stage: run count, mean and max duration in milliseconds and the
+    failure count, slowest stages first.
+    """
+    rows = get_connection(db_path).execute("""
+        SELECT flow, stage, COUNT(*), AVG(duration_ms), MAX(duration_ms), SUM(1 - success)
+        FROM stage_metrics
+        WHERE created_at >= ?
+        GROUP BY flow, stage
+        ORDER BY AVG(duration_ms) DESC
+    """, (since or 0,)).fetchall()
+    return [{'flow': flow, 'stage': stage_name, 'count': count, 'avg_ms': avg_ms,
+             'max_ms': max_ms, 'failures': failures}
+            for flow, stage_name, count, avg_ms, max_ms, failures in rows]
@@ -0,0 +1,78 @@
+"""
+Regression tests for bulk ingestion (ingest.py).
+
+    python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest  # noqa: E402
+from db import get_connection  # noqa: E402
+
+RESUMES = {
+    'alice.txt': "Alice\nPython developer, 5 years of Django and PostgreSQL.\n",
+    'bob.txt': "Bob\nData engineer working with Spark, Kafka and Airflow.\n",
+    'carol.txt': "Carol\nFrontend engineer: React, TypeScript and CSS.\n",
+}
+
+
+class IngestFailureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp, 'source')
+        self.resume_dir = os.path.join(self.tmp, 'resumes')
+        self.db_path = os.path.join(self.tmp, 'cv.db')
+        self.checkpoint = os.path.join(self.tmp, 'checkpoint.jsonl')
+        os.makedirs(self.source)
+        for name, text in RESUMES.items():
+            with open(os.path.join(self.source, name), 'w', encoding='utf-8') as f:
+                f.write(text)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _ingest(self):
+        return ingest.ingest(self.source, workers=1, db_path=self.db_path, resume_dir=self.resume_dir,
+                             checkpoint_path=self.checkpoint, embed=False)
+
+    def test_failed_profile_write_is_retried_on_rerun(self):
+        conn = get_connection(self.db_path)
+        # The extraction row for carol commits; only her profile row is rejected
+        conn.execute("""
+            CREATE TRIGGER reject_carol BEFORE INSERT ON candidate_profiles
+            WHEN NEW.txt_name = 'carol.txt'
+            BEGIN SELECT RAISE(ABORT, 'rejected by test'); END
+        """)
+        conn.commit()
+
+        summary = self._ingest()
+        self.assertEqual((summary['ingested'], summary['failed']), (2, 1))
+        self.assertIsNone(conn.execute(
+            "SELECT 1 FROM resume_extractions WHERE txt_name = 'carol.txt'").fetchone())
+        self.assertIsNone(conn.execute(
+            "SELECT 1 FROM candidate_skills WHERE txt_name = 'carol.txt'").fetchone())
+        self.assertFalse(os.path.exists(os.path.join(self.resume_dir, 'carol.txt')))
+
+        conn.execute('DROP TRIGGER reject_carol')
+        conn.commit()
+        summary = self._ingest()
+        self.assertEqual((summary['ingested'], summary['skipped'], summary['failed']), (1, 2, 0))
+        self.assertIsNotNone(conn.execute(
+            "SELECT 1 FROM candidate_profiles WHERE txt_name = 'carol.txt'").fetchone())
+        self.assertTrue(os.path.exists(os.path.join(self.resume_dir, 'carol.txt')))
+
+    def test_non_default_resume_dir_leaves_app_index_alone(self):
+        self._ingest()
+        index = ingest.LexicalIndex(os.path.join(self.resume_dir, 'lexical_index.json'))
+        self.assertEqual(set(index.docs), set(RESUMES))
+        self.assertFalse(set(RESUMES) & set(ingest.get_lexical_index().docs))
+
+
+if __name__ == '__main__':
+    unittest.main()